@@ -1,39 +1,48 @@
 import streamlit as st
 from datetime import datetime, timedelta  # AQUI JÁ IMPORTAMOS O TIMEDELTA
 import pytz
-import base64
+import os
 import src.ui.dashboards as dashboards
 
 # Seus módulos
-from src.controllers.Sensor import Sensor
+from src.controllers.Reservatorios import get_reservatorios
+from src.services.Alertas import get_motor_alertas
+from src.services.Comandos import (
+    CONFIRMADO,
+    ENVIANDO,
+    FALHOU,
+    PENDENTE,
+    get_fila_comandos,
+)
 from src.ui.components import (
+    get_img_as_base64,
     load_css,
     render_card_reservatorio_topo,
     render_header_telemetria,
 )
+from src.utils.metricas import iniciar_servidor_metricas, metricas
 
 
 # --- CONFIGURAÇÃO INICIAL ---
 st.set_page_config(page_title="Telemetria", page_icon="💧", layout="wide")
 BRAZIL_TZ = pytz.timezone("America/Sao_Paulo")
 INTERVALO_ATUALIZACAO_SEG = 240  # 4 minutos
-
-# Instancia sensor e carrega CSS
-sensor = Sensor()
+# Painel de bombas: enquanto há comando em andamento, redesenha assim para mostrar
+# a confirmação (só lê o estado da fila de comandos, sem ir à rede)
+INTERVALO_PAINEL_BOMBAS_SEG = 2
+LIMITE_DESATUALIZADO_SEG = 180  # Sem contato com o servidor há mais que isso = aviso
+CARDS_POR_LINHA = 3
+# Painel de métricas no fim da página (também com ?debug=1 na URL)
+MOSTRAR_DEBUG = os.getenv("TELEMETRIA_DEBUG", "0") == "1"
+
+# Sensores do cadastro (criados uma vez por processo) e CSS
+reservatorios = get_reservatorios()
 load_css()
+# Endpoint /metrics (Prometheus), se TELEMETRIA_PORTA_METRICAS estiver definida
+iniciar_servidor_metricas()
 
 
-# 2. FUNÇÃO AUXILIAR PARA LER SUA LOGO LOCAL (SVG)
-def get_img_as_base64(file_path):
-    try:
-        with open(file_path, "rb") as f:
-            data = f.read()
-        return base64.b64encode(data).decode()
-    except Exception as e:
-        return None
-
-
-# Carrega sua logo específica
+# Carrega sua logo específica (lida e codificada uma vez por processo)
 logo_b64 = get_img_as_base64("assets/img/logo-dark-rancharia.svg")
 # Se der erro na leitura, usa um placeholder transparente
 img_tag = (
@@ -88,13 +97,8 @@ st.markdown(
 )
 
 # --- ESTADOS GLOBAIS ---
-if "config_bombas" not in st.session_state:
-    st.session_state["config_bombas"] = {
-        "bomba_principal": {"nome": "Bomba Principal (Simulação)", "ligada": False},
-        "bomba_12": {"nome": "Bomba 12 Polegadas", "ligada": False},
-        "bomba_12_reserva": {"nome": "Bomba 12 Pol (Reserva)", "ligada": False},
-    }
-
+# O estado das bombas vem da fila de comandos (o mesmo para todas as sessões);
+# na sessão fica só qual botão está armado
 if "confirmacao_pendente" not in st.session_state:
     st.session_state["confirmacao_pendente"] = None
 
@@ -109,13 +113,38 @@ if "data_final_padrao" not in st.session_state:
 # ---------------------------------------------------------
 
 
+def dados_do_card(sensor, leitura, hora_atual):
+    """Dados de um card de tanque a partir do snapshot já lido do sensor."""
+    if leitura is None:
+        perc, status, vl_mA = 0, "Offline", 0.0
+    else:
+        perc, status = int(leitura.percentual * 100), leitura.tendencia
+        vl_mA = leitura.valor_mA
+
+    dados = {
+        "nivel": perc,
+        "status": status,
+        "mA": vl_mA,
+        "hora_leitura": hora_atual,
+        "local": sensor.get_local(),
+    }
+
+    # Servidor lento/fora: mostra a última leitura conhecida, marcada com a idade
+    idade = sensor.get_idade_leitura()
+    if idade is not None and idade > LIMITE_DESATUALIZADO_SEG:
+        dados["hora_leitura"] = leitura.data_hora if leitura else hora_atual
+        dados["status"] = f"{status} (sem contato há {int(idade // 60)} min)"
+    return dados
+
+
 # --- FUNÇÃO DO FRAGMENTO (O Segredo do Não-Reset) ---
 # Tudo que estiver aqui dentro atualiza sozinho a cada 240s (4 min).
 @st.fragment(run_every=INTERVALO_ATUALIZACAO_SEG)
+@metricas.medido("render_painel")
 def painel_telemetria_auto_update():
 
-    # 1. Leitura dos Dados
-    perc, status = sensor.get_status_reservatorio()
+    # 1. Leitura dos Dados (todos os dispositivos num lote só)
+    leituras = reservatorios.atualizar_leituras()
     hora_atual = datetime.now(BRAZIL_TZ).strftime("%H:%M:%S")
 
     # CORREÇÃO AQUI: Usamos timedelta nativo em vez de pd.Timedelta
@@ -123,110 +152,157 @@ def painel_telemetria_auto_update():
         datetime.now(BRAZIL_TZ) + timedelta(seconds=INTERVALO_ATUALIZACAO_SEG)
     ).strftime("%H:%M:%S")
 
-    dados_atuais = {
-        "nivel": perc,
-        "status": status,
-        "mA": sensor.get_vl_mA(),
-        "hora_leitura": hora_atual,
-        "local": sensor.get_local(),
-    }
+    cards = [dados_do_card(sensor, leitura, hora_atual) for sensor, leitura in leituras]
+    hora_leitura = cards[0]["hora_leitura"] if cards else hora_atual
 
     # 2. Header dentro do Fragmento
     st.markdown(
         f"""
         <div style="background-color:#1E1E1E; padding:15px; border-radius:10px; display:flex; justify-content:space-between; align-items:center; margin-bottom:20px;">
-            <span style="color:#FFF; font-size:1.2rem;">⏱️ Última Leitura: <b>{dados_atuais['hora_leitura']}</b></span>
+            <span style="color:#FFF; font-size:1.2rem;">⏱️ Última Leitura: <b>{hora_leitura}</b></span>
             <span style="color:#00ADB5; font-size:1.0rem;">Próxima atualização: <b>{prox_atualizacao}</b></span>
         </div>
     """,
         unsafe_allow_html=True,
     )
 
-    # 3. Layout das Colunas
-    col_monitor, col_controle = st.columns([1, 2])
-
-    # --- COLUNA 1: TANQUE ---
-    with col_monitor:
-        with st.container(border=True):
-            # REMOVI O TITULO AQUI DE FORA ("##### Monitoramento")
-            # Ele agora é renderizado dentro do componente para centralizar verticalmente junto
-            render_card_reservatorio_topo(
-                f"Caixa da {dados_atuais["local"]}",  # Passando o título aqui
-                dados_atuais["nivel"],
-                dados_atuais["mA"],
-                dados_atuais["status"],
-            )
-
-    # --- COLUNA 2: BOMBAS ---
-    with col_controle:
-        with st.container(border=True):
-            st.markdown("##### ⚙️ Painel de Controle de Bombas")
-            st.info("Clique para armar, clique novamente para confirmar.")
-
-            chaves = list(st.session_state["config_bombas"].keys())
-
-            for chave in chaves:
-                bomba = st.session_state["config_bombas"][chave]
-                is_ligada = bomba["ligada"]
-
+    # 3. Grade de tanques (um card por dispositivo do cadastro)
+    for inicio in range(0, len(cards), CARDS_POR_LINHA):
+        colunas = st.columns(CARDS_POR_LINHA)
+        for coluna, dados in zip(colunas, cards[inicio : inicio + CARDS_POR_LINHA]):
+            with coluna:
                 with st.container(border=True):
-                    c1, c2, c3 = st.columns([2, 1, 1])
+                    render_card_reservatorio_topo(
+                        f"Caixa da {dados['local']}",
+                        dados["nivel"],
+                        dados["mA"],
+                        dados["status"],
+                    )
+
+    # Alertas ativos (avaliados pelo Ingestor a cada leitura, mesmo sem ninguém na tela)
+    for _, local, regra, severidade in get_motor_alertas().get_ativos():
+        aviso = st.error if severidade == "critico" else st.warning
+        aviso(f"🚨 {local}: {regra.replace('_', ' ')}")
+
+
+ROTULOS_COMANDO = {
+    PENDENTE: "⏳ Na fila",
+    ENVIANDO: "⏳ Enviando",
+    CONFIRMADO: "✅ Confirmado",
+    FALHOU: "❌ Falhou",
+}
+
+
+def on_click_bomba(chave, ligada):
+    # Primeiro clique arma, o segundo envia o comando (sem esperar a resposta)
+    if st.session_state["confirmacao_pendente"] == chave:
+        get_fila_comandos().enviar(chave, not ligada)
+        st.session_state["confirmacao_pendente"] = None
+    else:
+        st.session_state["confirmacao_pendente"] = chave
+
+
+def _comando_em_andamento(fila):
+    return any(
+        comando is not None and not comando.terminado
+        for _, comando in (fila.get_estado(bomba.chave) for bomba in fila.bombas)
+    )
 
-                    with c1:
-                        # Alinhamento vertical
-                        st.markdown(
-                            f"<div style='padding-top:5px; font-weight:bold;'>{bomba['nome']}</div>",
-                            unsafe_allow_html=True,
-                        )
 
-                    with c2:
+def painel_bombas():
+    # Só atualiza sozinho enquanto algum comando espera confirmação; parado,
+    # o painel não gera reruns em todas as sessões abertas
+    acompanhando = _comando_em_andamento(get_fila_comandos())
+    intervalo = INTERVALO_PAINEL_BOMBAS_SEG if acompanhando else None
+    st.fragment(_desenhar_painel_bombas, run_every=intervalo)(acompanhando)
+
+
+def _desenhar_painel_bombas(acompanhando):
+    fila = get_fila_comandos()
+    if _comando_em_andamento(fila) != acompanhando:
+        # Comando novo (clique) ou terminado: recria o fragmento com o intervalo certo
+        st.rerun()
+    with st.container(border=True):
+        st.markdown("##### ⚙️ Painel de Controle de Bombas")
+        st.info("Clique para armar, clique novamente para confirmar.")
+
+        for bomba in fila.bombas:
+            is_ligada, comando = fila.get_estado(bomba.chave)
+            em_andamento = comando is not None and not comando.terminado
+
+            with st.container(border=True):
+                c1, c2, c3 = st.columns([2, 1, 1])
+
+                with c1:
+                    # Alinhamento vertical
+                    st.markdown(
+                        f"<div style='padding-top:5px; font-weight:bold;'>{bomba.nome}</div>",
+                        unsafe_allow_html=True,
+                    )
+                    if comando is not None:
+                        acao = "Ligar" if comando.ligar else "Desligar"
+                        texto = f"{ROTULOS_COMANDO[comando.estado]}: {acao}"
+                        if comando.tentativas > 1:
+                            texto += f" (tentativa {comando.tentativas})"
+                        if comando.estado == FALHOU and comando.erro:
+                            texto += f" · {comando.erro}"
+                        st.caption(texto)
+
+                with c2:
+                    if is_ligada is None:
+                        cor, txt = "#888888", "SEM CONFIRMAÇÃO"
+                    else:
                         cor = "#00ADB5" if is_ligada else "#FF6B6B"
                         txt = "LIGADA" if is_ligada else "PARADA"
-                        st.markdown(
-                            f"<div style='text-align:center; color:{cor}; font-weight:bold; border:1px solid {cor}; border-radius:4px; padding:2px;'>● {txt}</div>",
-                            unsafe_allow_html=True,
-                        )
-
-                    with c3:
-                        if st.session_state["confirmacao_pendente"] == chave:
-                            lbl = "CONFIRMAR?"
-                            tp = "primary"
-                        else:
-                            lbl = "DESLIGAR" if is_ligada else "LIGAR"
-                            tp = "secondary"
-
-                        def on_click_bomba(k=chave):
-                            if st.session_state["confirmacao_pendente"] == k:
-                                st.session_state["config_bombas"][k]["ligada"] = (
-                                    not st.session_state["config_bombas"][k]["ligada"]
-                                )
-                                st.session_state["confirmacao_pendente"] = None
-                            else:
-                                st.session_state["confirmacao_pendente"] = k
-
-                            # Atualiza apenas este fragmento
-                            st.rerun()
-
-                        st.button(
-                            lbl,
-                            key=f"btn_{chave}",
-                            type=tp,
-                            on_click=on_click_bomba,
-                            use_container_width=True,
-                        )
+                    st.markdown(
+                        f"<div style='text-align:center; color:{cor}; font-weight:bold; border:1px solid {cor}; border-radius:4px; padding:2px;'>● {txt}</div>",
+                        unsafe_allow_html=True,
+                    )
+
+                with c3:
+                    if em_andamento:
+                        lbl = "AGUARDANDO..."
+                        tp = "secondary"
+                    elif st.session_state["confirmacao_pendente"] == bomba.chave:
+                        lbl = "CONFIRMAR?"
+                        tp = "primary"
+                    else:
+                        lbl = "DESLIGAR" if is_ligada else "LIGAR"
+                        tp = "secondary"
+
+                    st.button(
+                        lbl,
+                        key=f"btn_{bomba.chave}",
+                        type=tp,
+                        on_click=on_click_bomba,
+                        args=(bomba.chave, bool(is_ligada)),
+                        disabled=em_andamento,
+                        use_container_width=True,
+                    )
 
 
 # --- CHAMADA PRINCIPAL ---
 
-# 1. Roda o painel (auto-refresh isolado)
+# 1. Roda o painel (auto-refresh isolado) e o painel de bombas
 painel_telemetria_auto_update()
+painel_bombas()
 
 st.markdown("---")
 
 # 2. Área dos Dashboards
 # --- CARD 1: FILTROS ---
 with st.container(border=True):
-    col1_data, col2_data = st.columns(2)
+    col_disp, col1_data, col2_data = st.columns(3)
+
+    # Gráficos e exportação usam o mesmo dispositivo do cadastro
+    with col_disp:
+        indice = st.selectbox(
+            "Reservatório:",
+            range(len(reservatorios.sensores)),
+            format_func=lambda i: reservatorios.sensores[i].get_local(),
+            key="historico_sensor",
+        )
+        sensor_historico = reservatorios.sensores[indice]
 
     with col1_data:
         data_inicio = st.datetime_input(
@@ -251,13 +327,63 @@ if data_inicio and data_final:
 # --- CARD 2: GRÁFICO DE LINHA ---
 with st.container(border=True):
     # Gera o gráfico
-    fig = dashboards.create_graph_line(data_inicio, data_final)
-    # Renderiza
-    st.plotly_chart(fig, width="stretch")
+    with metricas.medir("render_grafico_linha"):
+        fig = dashboards.create_graph_line(sensor_historico, data_inicio, data_final)
+        # Renderiza
+        st.plotly_chart(fig, width="stretch")
+
+    # Histórico vindo do store local enquanto o final é atualizado em segundo plano
+    dataset = dashboards.obter_dataset(sensor_historico, data_inicio, data_final)
+    defasagem = dataset.df.attrs.get("defasagem_seg")
+    if defasagem and defasagem > LIMITE_DESATUALIZADO_SEG:
+        st.caption(
+            f"⚠️ Histórico sem os últimos {int(defasagem // 60)} min (atualizando...)"
+        )
 
 # --- CARD 3: GRÁFICO DE BARRAS ---
 with st.container(border=True):
     # Gera o gráfico
-    fig_bar = dashboards.create_graph_bar(data_inicio, data_final)
-    # Renderiza
-    st.plotly_chart(fig_bar, width="stretch")
+    with metricas.medir("render_grafico_barras"):
+        fig_bar = dashboards.create_graph_bar(sensor_historico, data_inicio, data_final)
+        # Renderiza
+        st.plotly_chart(fig_bar, width="stretch")
+
+# --- CARD 4: EXPORTAÇÃO DO HISTÓRICO ---
+with st.container(border=True):
+    st.markdown("**Exportar histórico do período**")
+    col_formato, col_bruto = st.columns(2)
+    with col_formato:
+        formato = st.radio(
+            "Formato:", ["csv", "parquet"], horizontal=True, key="exportacao_formato"
+        )
+    with col_bruto:
+        bruto = st.checkbox(
+            "Leituras brutas", help="Sem a média por minuto", key="exportacao_bruto"
+        )
+
+    ts_exp_inicio = dashboards.get_timestamp_ms(data_inicio)
+    ts_exp_fim = dashboards.get_timestamp_ms(data_final)
+    url = sensor_historico.get_url_exportacao(ts_exp_inicio, ts_exp_fim, formato, bruto)
+    nome = f"historico_{sensor_historico.get_local()}.{formato}"
+    if url:
+        # Download em streaming: começa no primeiro bloco, memória constante
+        st.link_button("⬇️ Baixar", url)
+    elif st.button("Preparar arquivo", key="exportacao_preparar"):
+        # Sem o endpoint os blocos vão para um arquivo temporário em disco, que o
+        # Streamlit lê uma vez para servir; nada é montado em memória antes disso
+        with st.spinner("Gerando arquivo..."), metricas.medir("exportacao_ui"):
+            arquivo = sensor_historico.exportar_historico(
+                ts_exp_inicio, ts_exp_fim, formato, bruto
+            )
+        with arquivo:
+            st.download_button("⬇️ Baixar", arquivo, file_name=nome)
+
+# --- PAINEL DE DEPURAÇÃO (opcional) ---
+if MOSTRAR_DEBUG or st.query_params.get("debug") == "1":
+    with st.expander("🛠️ Métricas do pipeline", expanded=False):
+        resumo = metricas.resumo()
+        st.dataframe(
+            [{"etapa": etapa, **dados} for etapa, dados in sorted(resumo["etapas"].items())],
+            width="stretch",
+        )
+        st.json(resumo["contadores"])
@@ -0,0 +1,341 @@
+"""
+Mede o pipeline do histórico contra o mock local do ThingsBoard
+(tools/mock_thingsboard.py), sem tocar na produção.
+
+Casos, para cada intervalo (1 dia a 1 ano):
+- sync_inicial: primeira sincronização do store (banco vazio)
+- get_historico_raw: caminho em lista, com o store já sincronizado
+- create_data: DataFrame dos gráficos, sem o cache de datasets
+- create_graph_line / create_graph_bar: figura montada do zero
+- create_graph_line_cache / create_graph_bar_cache: figura vinda do cache
+- app_rerun: execução completa do app.py (fragmento incluído) via AppTest
+
+E uma vez, cada rodada num processo novo (partida a frio):
+- import_dashboards: tempo de importar src.ui.dashboards
+- primeira_pintura: importar e executar o app.py inteiro pela primeira vez
+
+Cada caso roda --rodadas vezes; o JSON guarda mínimo, mediana, média e
+desvio. Com --base <resultado anterior.json> cada mediana é comparada e
+o que piorou mais que --tolerancia aparece como regressão. Os casos de
+partida também têm orçamento fixo (--orcamento-import, --orcamento-pintura):
+mediana acima dele conta como falha, com ou sem --base.
+
+Uso: python -m benchmarks.bench_pipeline --dias 1 7 30 365 --latencia 20
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+PASTA_RESULTADOS = BASE_DIR / "benchmarks" / "resultados"
+PERIODOS_DIAS = (1, 7, 30, 90, 365)
+RODADAS = 5
+DEVICE_BENCH = "mock-bench"
+# Orçamento (mediana, em segundos) dos casos de partida a frio
+ORCAMENTO_IMPORT_SEG = 1.0
+ORCAMENTO_PRIMEIRA_PINTURA_SEG = 4.0
+
+# Rodam num processo novo (sem nada importado); imprimem o tempo na última linha
+CODIGO_IMPORT = """
+import time
+inicio = time.perf_counter()
+import src.ui.dashboards
+print(time.perf_counter() - inicio)
+"""
+CODIGO_PRIMEIRA_PINTURA = """
+import time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app.py", default_timeout=120)
+app.run()
+assert not app.exception, app.exception[0].message
+print(time.perf_counter() - inicio)
+"""
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return "desconhecido"
+
+
+def medir(funcao, rodadas, preparar=None):
+    """Roda funcao() rodadas vezes (preparar() antes de cada uma, fora do tempo)."""
+    tempos = []
+    resultado = None
+    for _ in range(rodadas):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return _estatisticas(tempos), resultado
+
+
+def _estatisticas(tempos):
+    return {
+        "rodadas": len(tempos),
+        "min_seg": min(tempos),
+        "mediana_seg": statistics.median(tempos),
+        "media_seg": statistics.fmean(tempos),
+        "desvio_seg": statistics.stdev(tempos) if len(tempos) > 1 else 0.0,
+    }
+
+
+def _tamanho(resultado):
+    try:
+        return len(resultado)
+    except TypeError:
+        return None
+
+
+class Bancada:
+    """Prepara mock, store e caches e roda os casos de um intervalo."""
+
+    def __init__(self, pasta, rodadas):
+        # Só importa o projeto depois que BASE_URL/TELEMETRIA_DB apontam para o mock
+        import src.services.HistoricoStore as historico_store
+        import src.services.SensorClient as sensor_client
+        import src.ui.dashboards as dashboards
+        from src.controllers.Reservatorios import get_reservatorios
+
+        self._hs = historico_store
+        self._sc = sensor_client
+        self._dash = dashboards
+        # Mesmos sensores do cadastro que o app.py usa (o primeiro é o do mock)
+        self._sensores = get_reservatorios().sensores
+        self._pasta = Path(pasta)
+        self._rodadas = rodadas
+        self.resultados = []
+
+    def _novo_store(self, nome):
+        """Banco vazio só para este intervalo (sync_inicial mede do zero)."""
+        store = self._hs.HistoricoStore(self._pasta / f"{nome}.db")
+        self._hs._store = store
+        for sensor in self._sensores:
+            sensor.client._store = store
+        self._sc._cache_historico = self._sc.CacheIntervalos(
+            self._sc.MAX_BYTES_CACHE_HISTORICO
+        )
+        self._limpar_caches()
+
+    def _limpar_caches(self):
+        self._dash._cache_datasets.limpar()
+        self._dash._cache_figuras.limpar()
+
+    def _registrar(self, caso, dias, estatisticas, resultado=None):
+        linha = {"caso": caso, "dias": dias, "pontos": _tamanho(resultado)}
+        linha.update(estatisticas)
+        self.resultados.append(linha)
+        print(
+            f"{caso:<26} {dias:>4}d {linha['mediana_seg']:>9.4f}s "
+            f"(min {linha['min_seg']:.4f}s, pontos {linha['pontos']})"
+        )
+
+    def rodar_intervalo(self, dias, com_app=True):
+        # Horário de Brasília sem fuso, como o app recebe dos campos de data
+        fim = datetime.now(self._dash.BRAZIL_TZ).replace(
+            second=0, microsecond=0, tzinfo=None
+        )
+        inicio = fim - timedelta(days=dias)
+        sensor = self._sensores[0]
+        client = sensor.client
+        dash = self._dash
+
+        self._novo_store(f"bench_{dias}d")
+        ts_inicio = dash.get_timestamp_ms(inicio)
+        ts_fim = dash.get_timestamp_ms(fim)
+        estat, _ = medir(lambda: client.sincronizar_historico(ts_inicio, ts_fim), 1)
+        self._registrar("sync_inicial", dias, estat)
+
+        texto_inicio = inicio.strftime("%d/%m/%Y %H:%M")
+        texto_fim = fim.strftime("%d/%m/%Y %H:%M")
+        estat, res = medir(
+            lambda: client.get_historico_raw(texto_inicio, texto_fim), self._rodadas
+        )
+        self._registrar("get_historico_raw", dias, estat, res)
+
+        estat, res = medir(lambda: dash.create_data(sensor, inicio, fim), self._rodadas)
+        self._registrar("create_data", dias, estat, res)
+
+        for caso, funcao in (
+            ("create_graph_line", dash.create_graph_line),
+            ("create_graph_bar", dash.create_graph_bar),
+        ):
+            estat, _ = medir(
+                lambda: funcao(sensor, inicio, fim), self._rodadas, self._limpar_caches
+            )
+            self._registrar(caso, dias, estat)
+            estat, _ = medir(lambda: funcao(sensor, inicio, fim), self._rodadas)
+            self._registrar(f"{caso}_cache", dias, estat)
+
+        if com_app:
+            self._rodar_app(dias, inicio, fim)
+
+    def _rodar_app(self, dias, inicio, fim):
+        from streamlit.testing.v1 import AppTest
+
+        fuso = self._dash.BRAZIL_TZ
+        erros = []
+
+        def rodar():
+            app = AppTest.from_file(str(BASE_DIR / "app.py"), default_timeout=120)
+            app.session_state["data_inicio_padrao"] = fuso.localize(inicio)
+            app.session_state["data_final_padrao"] = fuso.localize(fim)
+            app.run()
+            erros.extend(e.message for e in app.exception)
+
+        estat, _ = medir(rodar, self._rodadas, self._limpar_caches)
+        if erros:
+            estat["erro"] = erros[0]
+            print(f"app_rerun {dias}d falhou: {erros[0]}")
+        self._registrar("app_rerun", dias, estat)
+
+    def rodar_partida(self, orcamentos):
+        """Casos de partida a frio; retorna quantos estouraram o orçamento."""
+        estouros = 0
+        for caso, codigo in (
+            ("import_dashboards", CODIGO_IMPORT),
+            ("primeira_pintura", CODIGO_PRIMEIRA_PINTURA),
+        ):
+            estat = _estatisticas(
+                [_rodar_processo_novo(codigo) for _ in range(self._rodadas)]
+            )
+            estat["orcamento_seg"] = orcamentos[caso]
+            self._registrar(caso, 0, estat)
+            if estat["mediana_seg"] > orcamentos[caso]:
+                print(f"{caso} acima do orçamento de {orcamentos[caso]:.2f}s")
+                estouros += 1
+        return estouros
+
+
+def _rodar_processo_novo(codigo):
+    """Tempo medido dentro do processo (sem contar a subida do Python)."""
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if saida.returncode != 0:
+        raise RuntimeError(saida.stderr.strip().splitlines()[-1])
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def comparar(resultados, arquivo_base, tolerancia):
+    """Imprime mediana atual / base por caso; retorna quantas regressões houve."""
+    with open(arquivo_base, encoding="utf-8") as f:
+        base = {
+            (r["caso"], r["dias"]): r["mediana_seg"] for r in json.load(f)["resultados"]
+        }
+    regressoes = 0
+    print(f"\nComparação com {arquivo_base}:")
+    for r in resultados:
+        anterior = base.get((r["caso"], r["dias"]))
+        if not anterior:
+            continue
+        razao = r["mediana_seg"] / anterior
+        marca = ""
+        if razao > tolerancia:
+            marca = "  <-- REGRESSÃO"
+            regressoes += 1
+        print(f"{r['caso']:<26} {r['dias']:>4}d {razao:>6.2f}x{marca}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline com mock local")
+    parser.add_argument("--dias", type=int, nargs="+", default=list(PERIODOS_DIAS))
+    parser.add_argument("--rodadas", type=int, default=RODADAS)
+    parser.add_argument("--latencia", type=float, default=20, help="atraso do mock (ms)")
+    parser.add_argument("--variacao", type=float, default=0, help="atraso extra (ms)")
+    parser.add_argument("--sem-app", action="store_true", help="pula o app_rerun")
+    parser.add_argument("--saida", help="arquivo JSON (padrão: benchmarks/resultados/)")
+    parser.add_argument("--base", help="resultado anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=1.25)
+    parser.add_argument("--sem-partida", action="store_true", help="pula a partida a frio")
+    parser.add_argument("--orcamento-import", type=float, default=ORCAMENTO_IMPORT_SEG)
+    parser.add_argument(
+        "--orcamento-pintura", type=float, default=ORCAMENTO_PRIMEIRA_PINTURA_SEG
+    )
+    args = parser.parse_args()
+
+    from tools.mock_thingsboard import iniciar_em_thread
+
+    logging.getLogger("tornado.access").disabled = True  # Sem log por requisição
+    url, parar = iniciar_em_thread(latencia_ms=args.latencia, variacao_ms=args.variacao)
+    pasta = tempfile.mkdtemp(prefix="bench_telemetria_")
+    os.environ.update(
+        BASE_URL=url,
+        SENSOR_LAVADEIRA=DEVICE_BENCH,
+        USUARIO="bench",
+        PASSWORD="bench",
+        TELEMETRIA_WEBSOCKET="0",
+        TELEMETRIA_DB=str(Path(pasta) / "inicial.db"),
+    )
+
+    bancada = Bancada(pasta, args.rodadas)
+    estouros = 0
+    try:
+        if not args.sem_partida:
+            estouros = bancada.rodar_partida(
+                {
+                    "import_dashboards": args.orcamento_import,
+                    "primeira_pintura": args.orcamento_pintura,
+                }
+            )
+        for dias in sorted(args.dias):
+            bancada.rodar_intervalo(dias, com_app=not args.sem_app)
+    finally:
+        parar()
+
+    commit = _commit_atual()
+    saida = Path(
+        args.saida
+        or PASTA_RESULTADOS / f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json"
+    )
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "data": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "plataforma": platform.platform(),
+                "parametros": {
+                    "latencia_ms": args.latencia,
+                    "variacao_ms": args.variacao,
+                    "rodadas": args.rodadas,
+                },
+                "resultados": bancada.resultados,
+            },
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
+    print(f"\nResultados em {saida}")
+
+    regressoes = args.base and comparar(bancada.resultados, args.base, args.tolerancia)
+    if regressoes or estouros:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
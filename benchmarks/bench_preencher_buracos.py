@@ -0,0 +1,82 @@
+"""
+Compara o tempo do preenchimento de buracos antigo (laço por dia) com o
+vetorizado. A equivalência dos dois fica em tests/test_preencher_buracos.py.
+
+Uso: python -m benchmarks.bench_preencher_buracos
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.ui.dashboards import preencher_buracos
+
+PERIODOS_DIAS = (1, 7, 30, 90)
+REPETICOES = 3
+
+
+def preencher_buracos_laco(df):
+    """Implementação anterior de create_graph_line, mantida como referência."""
+    novas_linhas = []
+    dias_unicos = df["dia_formatado"].unique()
+
+    for i in range(len(dias_unicos) - 1):
+        dia_atual = dias_unicos[i]
+        dia_seguinte = dias_unicos[i + 1]
+
+        mask_dia_seguinte = df["dia_formatado"] == dia_seguinte
+        if mask_dia_seguinte.any():
+            primeiro_ponto_next = df[mask_dia_seguinte].iloc[0].copy()
+            primeiro_ponto_next["dia_formatado"] = dia_atual
+            dia_atual_num = int(dia_atual.split("/")[0])
+            primeiro_ponto_next["legenda_tipo"] = (
+                "Dia Par" if dia_atual_num % 2 == 0 else "Dia Ímpar"
+            )
+            novas_linhas.append(primeiro_ponto_next)
+
+    if novas_linhas:
+        df = pd.concat([df, pd.DataFrame(novas_linhas)], ignore_index=True)
+        df = df.sort_values(by="date")
+    return df
+
+
+def gerar_dados(dias):
+    """Série sintética de 1 em 1 minuto no formato de create_data."""
+    datas = pd.date_range("2025-01-01", periods=dias * 1440, freq="min")
+    df = pd.DataFrame(
+        {
+            "ts": datas.astype("int64") // 1_000_000,
+            "date": datas,
+            "value_mA": 4 + np.random.rand(len(datas)) * 2.8,
+        }
+    )
+    df["value_percent"] = np.round((df["value_mA"] - 4) / 2.8 * 100, 0)
+    df["dia_formatado"] = df["date"].dt.strftime("%d/%m")
+    df["legenda_tipo"] = np.where(df["date"].dt.day % 2 == 0, "Dia Par", "Dia Ímpar")
+    return df
+
+
+def _medir(funcao, df):
+    melhor = float("inf")
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao(df)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    print(f"{'dias':>5} {'linhas':>8} {'laço (s)':>10} {'vetor (s)':>10} {'ganho':>8}")
+    for dias in PERIODOS_DIAS:
+        df = gerar_dados(dias)
+        t_laco = _medir(preencher_buracos_laco, df)
+        t_vetor = _medir(preencher_buracos, df)
+        print(
+            f"{dias:>5} {len(df):>8} {t_laco:>10.4f} {t_vetor:>10.4f} "
+            f"{t_laco / t_vetor:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,113 @@
-from src.controllers.Sensor import Sensor
+"""
+Linha de comando da telemetria.
 
+Sem argumentos mostra o status atual de cada reservatório cadastrado.
+O subcomando exportar grava um intervalo do histórico em CSV ou Parquet,
+bloco a bloco (memória constante, seja qual for o tamanho do intervalo):
 
-sensor = Sensor()
+    python main.py exportar --inicio 01/01/2025 --fim "31/01/2025 23:59" \\
+        --formato parquet --saida janeiro.parquet
 
-print(sensor.get_pin_info())
+O subcomando episodios lista os enchimentos/esvaziamentos do índice:
+
+    python main.py episodios --dias 30 --tipo esvaziando --taxa-min 10
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from src.controllers.Reservatorios import Reservatorios
+from src.services.Episodios import ENCHENDO, ESVAZIANDO
+from src.services.Exportador import FORMATOS, exportar
+from src.services.Leitura import BRAZIL_TZ
+
+
+def _sensor(reservatorios, nome):
+    if nome is None:
+        return reservatorios.sensores[0]
+    for sensor in reservatorios.sensores:
+        if nome in (sensor.get_local(), sensor.get_device()):
+            return sensor
+    sys.exit(f"Reservatório não cadastrado: {nome}")
+
+
+def comando_status(reservatorios, args):
+    # Uma consulta por dispositivo, em lote; o CLI não precisa dos Ingestores
+    for sensor, leitura in reservatorios.buscar_leituras():
+        if leitura is None:
+            print(f"{sensor.get_local()}: sem leitura")
+            continue
+        print(
+            f"{sensor.get_local()}: {leitura.percentual:.0%} "
+            f"({leitura.valor_mA:.2f} mA, {leitura.tendencia}) em {leitura.data_hora}"
+        )
+
+
+def comando_exportar(reservatorios, args):
+    sensor = _sensor(reservatorios, args.dispositivo)
+    client = sensor.client
+    ts_inicio = client._converter_para_ms_(args.inicio)
+    ts_fim = client._converter_para_ms_(args.fim)
+    if ts_inicio is None or ts_fim is None or ts_fim < ts_inicio:
+        sys.exit("Intervalo inválido (use dd/mm/aaaa [HH:MM])")
+
+    saida = args.saida or f"historico_{sensor.get_local()}.{args.formato}"
+    total = exportar(client, ts_inicio, ts_fim, saida, args.formato, args.bruto)
+    print(f"{saida}: {total} bytes")
+
+
+def _data(ts):
+    return datetime.fromtimestamp(ts / 1000, BRAZIL_TZ).strftime("%d/%m/%Y %H:%M")
+
+
+def comando_episodios(reservatorios, args):
+    sensor = _sensor(reservatorios, args.dispositivo)
+    ts_fim = int(time.time() * 1000)
+    ts_inicio = ts_fim - args.dias * 86400 * 1000
+    # Traz o store (e o índice) até agora antes de consultar
+    sensor.client.sincronizar_historico(ts_inicio, ts_fim)
+
+    episodios = sensor.get_episodios(ts_inicio, ts_fim, args.tipo, args.taxa_min)
+    for e in episodios:
+        print(
+            f"{_data(e.inicio_ts)} -> {_data(e.fim_ts)}  {e.tipo:<10} "
+            f"{e.nivel_inicio:5.1f}% -> {e.nivel_fim:5.1f}%  "
+            f"{e.duracao_min:6.0f} min  {e.taxa_pct_h:5.1f} %/h"
+        )
+    print(f"{len(episodios)} episódio(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetria dos reservatórios")
+    subcomandos = parser.add_subparsers(dest="comando")
+
+    exportacao = subcomandos.add_parser("exportar", help="exporta o histórico")
+    exportacao.add_argument("--inicio", required=True, help="dd/mm/aaaa [HH:MM]")
+    exportacao.add_argument("--fim", required=True, help="dd/mm/aaaa [HH:MM]")
+    exportacao.add_argument("--formato", choices=list(FORMATOS), default="csv")
+    exportacao.add_argument("--saida", help="arquivo de destino")
+    exportacao.add_argument("--dispositivo", help="nome ou id (padrão: o primeiro)")
+    exportacao.add_argument(
+        "--bruto", action="store_true", help="leituras brutas, sem a média por minuto"
+    )
+
+    episodios = subcomandos.add_parser("episodios", help="lista enchimentos/esvaziamentos")
+    episodios.add_argument("--dias", type=int, default=30)
+    episodios.add_argument("--tipo", choices=[ENCHENDO, ESVAZIANDO])
+    episodios.add_argument("--taxa-min", type=float, help="taxa mínima em %%/h")
+    episodios.add_argument("--dispositivo", help="nome ou id (padrão: o primeiro)")
+    args = parser.parse_args()
+
+    reservatorios = Reservatorios()
+    if args.comando == "exportar":
+        comando_exportar(reservatorios, args)
+    elif args.comando == "episodios":
+        comando_episodios(reservatorios, args)
+    else:
+        comando_status(reservatorios, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.controllers.Sensor import Sensor
+from src.services.Dispositivos import get_dispositivos
+
+# Quantos dispositivos são consultados ao mesmo tempo num lote
+MAX_DISPOSITIVOS_EM_VOO = int(os.getenv("TELEMETRIA_MAX_DISPOSITIVOS_EM_VOO", "8"))
+
+
+class Reservatorios:
+    """
+    Todos os dispositivos do cadastro, um Sensor para cada. As consultas em
+    lote rodam em paralelo num pool limitado, então o tempo total fica perto
+    do de um único dispositivo.
+
+    O limite vale para a rede como um todo: as coletas REST dos Ingestores
+    dividem as mesmas vagas com os lotes, então nunca há mais de max_em_voo
+    dispositivos chamando a API ao mesmo tempo.
+    """
+
+    def __init__(self, dispositivos=None, max_em_voo=MAX_DISPOSITIVOS_EM_VOO):
+        if dispositivos is None:
+            dispositivos = get_dispositivos()
+        self._max_em_voo = max(1, min(max_em_voo, len(dispositivos) or 1))
+        self._vagas = threading.BoundedSemaphore(self._max_em_voo)
+        self.sensores = [Sensor(d, self._vagas) for d in dispositivos]
+
+    def __len__(self):
+        return len(self.sensores)
+
+    def _em_paralelo(self, funcao):
+        with ThreadPoolExecutor(max_workers=self._max_em_voo) as pool:
+            return list(pool.map(funcao, self.sensores))
+
+    def atualizar_leituras(self):
+        """
+        Lê o snapshot de cada dispositivo (sem chamar a API). Retorna
+        [(sensor, Leitura ou None), ...] na ordem do cadastro; depois disso os
+        acessores de cada Sensor leem esse mesmo snapshot.
+        """
+
+        def ler(sensor):
+            snapshot = sensor.atualizar_snapshot()
+            return sensor, snapshot.dados if snapshot else None
+
+        return self._em_paralelo(ler)
+
+    def buscar_leituras(self):
+        """
+        Último valor de cada dispositivo direto na API (sem subir Ingestores).
+        Retorna [(sensor, Leitura ou None), ...] na ordem do cadastro.
+        """
+
+        def buscar(sensor):
+            with self._vagas:
+                return sensor, sensor.client.get_dados_instantaneos(usar_cache=False)
+
+        return self._em_paralelo(buscar)
+
+    def get_historicos(self, ts_inicio, ts_fim, resolucao=None):
+        """
+        Histórico colunar (ver Sensor.get_historico_colunar) de cada
+        dispositivo no intervalo. Retorna [(sensor, DataFrame), ...].
+        """
+
+        def buscar(sensor):
+            with self._vagas:
+                return sensor, sensor.get_historico_colunar(ts_inicio, ts_fim, resolucao)
+
+        return self._em_paralelo(buscar)
+
+
+_reservatorios = None
+_reservatorios_lock = threading.Lock()
+
+
+def get_reservatorios():
+    """Sensores do cadastro criados uma vez por processo (não a cada rerun)."""
+    global _reservatorios
+    with _reservatorios_lock:
+        if _reservatorios is None:
+            _reservatorios = Reservatorios()
+        return _reservatorios
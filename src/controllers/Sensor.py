@@ -1,86 +1,143 @@
-import pandas as pd
+import time
 from src.services.SensorClient import SensorClient
+from src.services.Ingestor import get_ingestor
+from src.utils.metricas import metricas
+
+# Período -> (resolução do rollup em ms, horas buscadas)
+PERIODOS_HISTORICO = {
+    "24h": (60 * 1000, 24),
+    "7d": (3600 * 1000, 7 * 24),
+    "30d": (86400 * 1000, 30 * 24),
+    "1y": (86400 * 1000, 365 * 24),
+}
 
 
 class Sensor:
-    def __init__(self):
-        self.client = SensorClient()
-        self._cache_dados = None
+    def __init__(self, dispositivo=None, vagas=None):
+        """
+        dispositivo: item do cadastro (Dispositivo); sem ele usa o SENSOR_LAVADEIRA.
+        vagas: semáforo que limita quantos dispositivos chamam a API ao mesmo tempo.
+        """
+        if dispositivo is None:
+            self.client = SensorClient()
+        else:
+            self.client = SensorClient(
+                local=dispositivo.nome,
+                device=dispositivo.id,
+                minimo=dispositivo.minimo_mA,
+                maximo=dispositivo.maximo_mA,
+            )
+        # Snapshot lido no início do render; os acessores abaixo leem só ele
+        self._snapshot = None
+        # Leituras ao vivo vêm do snapshot do Ingestor (um por processo), criado
+        # só no primeiro acesso: exportar e consultar histórico não sobem threads
+        self._ingestor = None
+        self._vagas = vagas
+
+    def _get_ingestor(self):
+        if self._ingestor is None:
+            self._ingestor = get_ingestor(self.client, self._vagas)
+        return self._ingestor
 
     def get_dados_historicos_1h(self, data_inicio, data_fim):
+        import pandas as pd
+
         lista_dados = self.client.get_historico_raw(data_inicio, data_fim)
         return pd.DataFrame(lista_dados)
 
+    def get_historico_colunar(self, ts_inicio, ts_fim, resolucao=None):
+        """
+        DataFrame colunar (ts, date, value_mA, value_percent, ...) entre dois
+        timestamps em ms, na resolução adequada à duração do intervalo.
+        """
+        return self.client.get_historico_colunar(ts_inicio, ts_fim, resolucao)
+
+    def atualizar_snapshot(self):
+        """Pega o snapshot mais recente do Ingestor (sem chamar a API)."""
+        self._snapshot = self._get_ingestor().get_snapshot()
+        return self._snapshot
+
+    def _dados(self):
+        if self._snapshot is None:
+            self.atualizar_snapshot()
+        return self._snapshot.dados if self._snapshot else None
+
     def get_status_reservatorio(self):
         """Retorna (Percentual Inteiro, Texto Status)"""
-        data = self.client.get_dados_instantaneos()
-        if not data:
+        # Início de um render: os demais acessores leem este mesmo snapshot
+        snapshot = self.atualizar_snapshot()
+        if not snapshot:
             return (0, "Offline")
 
-        self._cache_dados = data
-        return (int(data[7] * 100), data[8])
+        data = snapshot.dados
+        return (int(data.percentual * 100), data.tendencia)
+
+    def get_idade_leitura(self):
+        """Segundos sem contato com o servidor; a leitura exibida pode estar velha."""
+        return self._get_ingestor().get_idade_seg()
 
     def get_vl_mA(self):
-        return self._cache_dados[6] if self._cache_dados else 0.0
+        data = self._dados()
+        return data.valor_mA if data else 0.0
 
     def get_vl_percentual(self):
-        return int(self._cache_dados[7] * 100) if self._cache_dados else 0
+        data = self._dados()
+        return int(data.percentual * 100) if data else 0
 
     def get_local(self):
         return self.client._local
 
-    def get_tempo_pin(self):
-        data = self.client.get_dados_instantaneos()
-        return data[5]
+    def get_device(self):
+        return self.client._device
 
-    def get_historico_dataframe(self, periodo="24h"):
-        """
-        Gera DataFrame corrigido e reamostrado.
-        periodo: '24h', '7d', '30d'
-        """
-        # 1. Define quantas horas buscar na API baseado no período
-        mapa_horas = {"24h": 24, "7d": 168, "30d": 720}  # 7 * 24  # 30 * 24
-        horas_busca = mapa_horas.get(periodo, 24)
+    def get_tempo_pin(self):
+        data = self._dados()
+        return data.data_hora if data else None
 
-        # 2. Busca dados brutos (mA)
-        raw = self.client.get_historico_raw(horas=horas_busca)
+    def get_leituras_recentes(self, n=None):
+        """(ts, valor_mA) das últimas n leituras ao vivo, sem consultar a API."""
+        return self.client.get_leituras_recentes(n)
 
-        if not raw:
-            return pd.DataFrame(columns=["timestamp", "percentual", "mA"])
+    def get_episodios(self, ts_inicio, ts_fim, tipo=None, taxa_min=None):
+        """Episódios de enchimento/esvaziamento do índice (ver SensorClient.get_episodios)."""
+        return self.client.get_episodios(ts_inicio, ts_fim, tipo, taxa_min)
 
-        df = pd.DataFrame(raw)
+    def exportar_historico(self, ts_inicio, ts_fim, formato="csv", bruto=False):
+        """Arquivo temporário aberto (CSV ou Parquet) com o intervalo; quem chama fecha."""
+        from src.services.Exportador import exportar_em_arquivo_temporario
 
-        # 3. Converter timestamp e Fuso
-        df["timestamp"] = pd.to_datetime(df["ts"], unit="ms")
-        df["timestamp"] = (
-            df["timestamp"].dt.tz_localize("UTC").dt.tz_convert("America/Sao_Paulo")
-        )
+        return exportar_em_arquivo_temporario(self.client, ts_inicio, ts_fim, formato, bruto)
 
-        # 4. Calcular Colunas (mA e Percentual)
-        min_ma, max_ma = self.client._MINIMO, self.client._MAXIMO
+    def get_url_exportacao(self, ts_inicio, ts_fim, formato="csv", bruto=False):
+        """Link do download em streaming ou None se o endpoint estiver desligado."""
+        from src.services.Exportador import registrar_cliente, url_exportacao
 
-        # Coluna mA (já vem como 'value')
-        df["mA"] = df["value"]
+        registrar_cliente(self.client)
+        return url_exportacao(self.client, ts_inicio, ts_fim, formato, bruto)
 
-        # Coluna Percentual
-        df["percentual"] = df["value"].apply(
-            lambda x: max(0, min(100, ((x - min_ma) / (max_ma - min_ma)) * 100))
+    @metricas.medido("sensor_historico_dataframe")
+    def get_historico_dataframe(self, periodo="24h"):
+        """
+        Histórico do período já na resolução de exibição, lido dos rollups
+        do store (média, mín, máx e leituras brutas por balde), sem resample.
+        periodo: '24h' (minuto a minuto), '7d' (hora a hora), '30d' ou '1y' (dia a dia)
+        """
+        resolucao, horas_busca = PERIODOS_HISTORICO.get(periodo, PERIODOS_HISTORICO["24h"])
+
+        ts_fim = int(time.time() * 1000)
+        ts_inicio = ts_fim - horas_busca * 3600 * 1000
+        raw = self.client.get_historico_colunar(ts_inicio, ts_fim, resolucao)
+
+        import pandas as pd
+
+        # Timestamp já vem no fuso de Brasília; percentual já limitado a 0-100
+        return pd.DataFrame(
+            {
+                "timestamp": raw["date"],
+                "percentual": raw["value_percent"] * 100,
+                "mA": raw["value_mA"],
+                "mA_min": raw["value_mA_min"],
+                "mA_max": raw["value_mA_max"],
+                "amostras": raw["amostras"],
+            }
         )
-
-        # 5. Reamostragem (Resample) baseada no período solicitado
-        df = df.set_index("timestamp")
-
-        if periodo == "24h":
-            # Minuto a minuto
-            df_resampled = df.resample("1min").mean()
-        elif periodo == "7d":
-            # Hora a hora
-            df_resampled = df.resample("1h").mean()
-        elif periodo == "30d":
-            # Dia a dia
-            df_resampled = df.resample("1D").mean()
-        else:
-            df_resampled = df
-
-        # Remove linhas vazias (geradas pelo resample se houver buracos) e reseta index
-        return df_resampled.dropna().reset_index()
@@ -0,0 +1,485 @@
+import json
+import math
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from src.services.Dispositivos import get_dispositivos
+from src.utils.logger import logger
+from src.utils.metricas import metricas
+
+# >>>> Regras de alerta avaliadas a cada leitura recebida <<<<
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+ARQUIVO_REGRAS = Path(
+    os.getenv("TELEMETRIA_ALERTAS", BASE_DIR / "config" / "alertas.json")
+)
+# Destinos dos alertas: arquivo JSONL local e, opcionalmente, um webhook
+ARQUIVO_SAIDA_ALERTAS = Path(
+    os.getenv("TELEMETRIA_ALERTAS_ARQUIVO", BASE_DIR / "logs" / "alertas.jsonl")
+)
+URL_WEBHOOK_ALERTAS = os.getenv("TELEMETRIA_ALERTAS_WEBHOOK", "")
+# Alertas esperando envio ao webhook; passando disso os mais novos são descartados
+FILA_MAX_WEBHOOK = 1000
+
+# Faixas de nível (%) usadas pelas regras padrão e pelas cores dos cards
+FAIXA_CRITICA_PCT = 30
+FAIXA_ALERTA_PCT = 50
+# Faixa válida de um sensor 4-20 mA; fora dela é defeito ou cabo rompido
+FAIXA_SENSOR_MA = (4.0, 20.0)
+# Constante de tempo da suavização do nível e da taxa (%/h): pesa por tempo,
+# não por leitura, então push a cada segundo e polling a cada minuto dão a mesma taxa
+CONSTANTE_TEMPO_TAXA_SEG = 600
+
+# Grandezas que uma regra de limite pode observar, na ordem do vetor avaliado
+CAMPOS = ("percentual", "mA", "taxa_pct_h")
+
+# Usadas quando não há config/alertas.json (ou TELEMETRIA_ALERTAS)
+REGRAS_PADRAO = [
+    {
+        "nome": "nivel_critico",
+        "tipo": "limite",
+        "campo": "percentual",
+        "abaixo_de": FAIXA_CRITICA_PCT,
+        "histerese": 3,
+        "debounce": 3,
+        "severidade": "critico",
+    },
+    {
+        "nome": "nivel_baixo",
+        "tipo": "limite",
+        "campo": "percentual",
+        "abaixo_de": FAIXA_ALERTA_PCT,
+        "histerese": 3,
+        "debounce": 3,
+        "severidade": "alerta",
+    },
+    {
+        "nome": "esvaziando_rapido",
+        "tipo": "limite",
+        "campo": "taxa_pct_h",
+        "abaixo_de": -40,
+        "histerese": 10,
+        "debounce": 5,
+        "severidade": "alerta",
+    },
+    {
+        "nome": "sensor_fora_da_faixa",
+        "tipo": "faixa",
+        "campo": "mA",
+        "minimo": FAIXA_SENSOR_MA[0],
+        "maximo": FAIXA_SENSOR_MA[1],
+        "histerese": 0.1,
+        "debounce": 2,
+        "severidade": "critico",
+    },
+    {
+        "nome": "sem_dados",
+        "tipo": "sem_dados",
+        "max_idade_seg": 600,
+        "severidade": "alerta",
+    },
+]
+
+
+@dataclass(frozen=True, slots=True)
+class Alerta:
+    """Mudança de estado de uma regra num dispositivo (disparou ou normalizou)."""
+
+    regra: str
+    device: str
+    local: str
+    estado: str  # disparado ou normalizado
+    severidade: str
+    valor: float
+    limiar: float
+    ts: int  # ms da leitura (ou da verificação, em sem_dados)
+    mensagem: str
+
+
+@dataclass(frozen=True)
+class Regra:
+    """
+    Regra de limite já normalizada: dispara quando sentido * (valor - limiar)
+    > 0 por debounce leituras seguidas e só normaliza depois que o valor
+    volta além do limiar por histerese. sem_dados usa só max_idade_seg.
+    """
+
+    nome: str
+    tipo: str  # limite ou sem_dados
+    campo: str = "percentual"
+    sentido: int = -1  # -1 abaixo_de, +1 acima_de
+    limiar: float = 0.0
+    histerese: float = 0.0
+    debounce: int = 1
+    max_idade_seg: float = 0.0
+    severidade: str = "alerta"
+    dispositivos: tuple = ()  # ids ou nomes; vazio = todos
+
+    def vale_para(self, device, local):
+        if not self.dispositivos:
+            return True
+        return device in self.dispositivos or local in self.dispositivos
+
+
+def _normalizar(item):
+    """Item do JSON -> [Regra, ...] (faixa vira uma regra para cada lado)."""
+    item = dict(item)
+    tipo = item.pop("tipo", "limite")
+    comum = {
+        "nome": item["nome"],
+        "severidade": item.get("severidade", "alerta"),
+        "dispositivos": tuple(item.get("dispositivos", ())),
+    }
+    if tipo == "sem_dados":
+        idade = float(item["max_idade_seg"])
+        return [Regra(tipo="sem_dados", max_idade_seg=idade, **comum)]
+
+    campo = item.get("campo", "percentual")
+    if campo not in CAMPOS:
+        raise ValueError(f"Campo desconhecido na regra '{item['nome']}': {campo}")
+    limite = {
+        "campo": campo,
+        "histerese": float(item.get("histerese", 0.0)),
+        "debounce": max(1, int(item.get("debounce", 1))),
+    }
+    if tipo == "faixa":
+        lados = [(-1, item["minimo"]), (1, item["maximo"])]
+    elif tipo == "limite":
+        lados = [(1, item["acima_de"])] if "acima_de" in item else [(-1, item["abaixo_de"])]
+    else:
+        raise ValueError(f"Tipo de regra desconhecido: {tipo}")
+    return [
+        Regra(tipo="limite", sentido=sentido, limiar=float(limiar), **limite, **comum)
+        for sentido, limiar in lados
+    ]
+
+
+def carregar_regras(caminho=ARQUIVO_REGRAS):
+    """Regras da lista JSON; sem arquivo usa REGRAS_PADRAO. Inválidas são puladas."""
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            itens = json.load(f)
+    except FileNotFoundError:
+        itens = REGRAS_PADRAO
+
+    regras = []
+    for item in itens:
+        try:
+            regras.extend(_normalizar(item))
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Regra de alerta ignorada ({item.get('nome')}): {e}")
+    return regras
+
+
+# --- Destinos (sinks): qualquer objeto com enviar(alerta) ---
+
+
+class SinkLog:
+    def enviar(self, alerta):
+        registrar = logger.warning if alerta.estado == "disparado" else logger.info
+        registrar(f"Alerta {alerta.estado}: {alerta.mensagem}")
+
+
+class SinkArquivo:
+    """Uma linha JSON por alerta num arquivo local."""
+
+    def __init__(self, caminho=ARQUIVO_SAIDA_ALERTAS):
+        self._caminho = Path(caminho)
+        self._caminho.parent.mkdir(exist_ok=True)
+        self._lock = threading.Lock()
+
+    def enviar(self, alerta):
+        linha = json.dumps(asdict(alerta), ensure_ascii=False)
+        with self._lock, open(self._caminho, "a", encoding="utf-8") as f:
+            f.write(linha + "\n")
+
+
+class SinkWebhook:
+    """
+    POST JSON de cada alerta para uma URL, numa thread própria: a ingestão
+    nunca espera a rede. A fila é limitada; cheia, o alerta é descartado.
+    """
+
+    def __init__(self, url, timeout_seg=5, fila_max=FILA_MAX_WEBHOOK):
+        self._url = url
+        self._timeout = timeout_seg
+        self._fila = queue.Queue(maxsize=fila_max)
+        threading.Thread(target=self._loop, name="SinkWebhook", daemon=True).start()
+
+    def enviar(self, alerta):
+        try:
+            self._fila.put_nowait(asdict(alerta))
+        except queue.Full:
+            metricas.incrementar("alertas_descartados_total")
+
+    def _loop(self):
+        while True:
+            corpo = self._fila.get()
+            try:
+                resposta = requests.post(self._url, json=corpo, timeout=self._timeout)
+                resposta.raise_for_status()
+                metricas.incrementar("alertas_webhook_total")
+            except requests.RequestException as e:
+                metricas.incrementar("alertas_webhook_falhas_total")
+                logger.error(f"Webhook de alertas falhou: {e}")
+
+
+def sinks_padrao():
+    sinks = [SinkLog(), SinkArquivo()]
+    if URL_WEBHOOK_ALERTAS:
+        sinks.append(SinkWebhook(URL_WEBHOOK_ALERTAS))
+    return sinks
+
+
+# --- Motor ---
+
+
+class _EstadoDispositivo:
+    """
+    Regras de limite de um dispositivo em vetores NumPy (uma posição por
+    regra) e o estado de debounce/histerese de cada uma. O tamanho é fixo
+    depois de montado: a memória não cresce com o número de leituras.
+    """
+
+    __slots__ = (
+        "regras",
+        "campo",
+        "sentido",
+        "limiar",
+        "histerese",
+        "debounce",
+        "contagem",
+        "ativo",
+        "sem_dados",
+        "sem_dados_ativo",
+        "ultimo_ts",
+        "monitorado_desde",
+        "nivel_suave",
+        "taxa",
+        "local",
+        "lock",
+    )
+
+    def __init__(self, regras, local):
+        limites = [r for r in regras if r.tipo == "limite"]
+        self.regras = limites
+        self.campo = np.array([CAMPOS.index(r.campo) for r in limites], dtype=np.intp)
+        self.sentido = np.array([r.sentido for r in limites], dtype=np.float64)
+        self.limiar = np.array([r.limiar for r in limites], dtype=np.float64)
+        self.histerese = np.array([r.histerese for r in limites], dtype=np.float64)
+        self.debounce = np.array([r.debounce for r in limites], dtype=np.int64)
+        self.contagem = np.zeros(len(limites), dtype=np.int64)
+        self.ativo = np.zeros(len(limites), dtype=bool)
+        self.sem_dados = [r for r in regras if r.tipo == "sem_dados"]
+        self.sem_dados_ativo = [False] * len(self.sem_dados)
+        self.ultimo_ts = None
+        # Início da vigilância de quem ainda não mandou leitura (sem_dados)
+        self.monitorado_desde = None
+        self.nivel_suave = None
+        self.taxa = np.nan
+        self.local = local
+        self.lock = threading.Lock()
+
+
+class MotorAlertas:
+    """
+    Avalia as regras a cada leitura nova, por dispositivo, em O(regras) com
+    operações vetorizadas, e entrega as mudanças de estado aos sinks.
+    """
+
+    def __init__(self, regras=None, sinks=None):
+        self._regras = carregar_regras() if regras is None else regras
+        self._sinks = sinks_padrao() if sinks is None else sinks
+        self._estados = {}
+        self._estados_lock = threading.Lock()
+
+    def _estado(self, device, local):
+        with self._estados_lock:
+            estado = self._estados.get(device)
+            if estado is None:
+                regras = [r for r in self._regras if r.vale_para(device, local)]
+                estado = self._estados[device] = _EstadoDispositivo(regras, local)
+            return estado
+
+    def registrar_dispositivos(self, dispositivos, agora_ms=None):
+        """
+        Passa a vigiar os dispositivos do cadastro desde agora_ms: quem nunca
+        mandou leitura também dispara sem_dados depois de max_idade_seg.
+        """
+        agora_ms = int(time.time() * 1000) if agora_ms is None else agora_ms
+        for dispositivo in dispositivos:
+            estado = self._estado(dispositivo.id, dispositivo.nome)
+            with estado.lock:
+                if estado.monitorado_desde is None:
+                    estado.monitorado_desde = agora_ms
+
+    def avaliar(self, device, leitura):
+        """Avalia uma Leitura; leituras repetidas ou fora de ordem são ignoradas."""
+        estado = self._estado(device, leitura.local)
+        pct = leitura.percentual * 100
+        with estado.lock:
+            anterior = estado.ultimo_ts
+            if anterior is not None and leitura.ts <= anterior:
+                return []
+            if anterior is None:
+                estado.nivel_suave = pct
+                # Sem leitura anterior, a lacuna conta desde o início da vigilância
+                anterior = estado.monitorado_desde
+            else:
+                # Derivada do nível suavizado, também suavizada (O(1) por leitura)
+                dt_seg = (leitura.ts - anterior) / 1000
+                peso = -math.expm1(-dt_seg / CONSTANTE_TEMPO_TAXA_SEG)
+                suave = estado.nivel_suave + peso * (pct - estado.nivel_suave)
+                instantanea = (suave - estado.nivel_suave) / (dt_seg / 3600)
+                estado.taxa = (
+                    instantanea
+                    if np.isnan(estado.taxa)
+                    else estado.taxa + peso * (instantanea - estado.taxa)
+                )
+                estado.nivel_suave = suave
+            estado.ultimo_ts = leitura.ts
+
+            # Idade do dado que faltou: da leitura anterior até esta
+            alertas = [
+                self._sem_dados_normalizado(device, estado, i, anterior, leitura.ts)
+                for i, ativo in enumerate(estado.sem_dados_ativo)
+                if ativo
+            ]
+            alertas += self._avaliar_limites(
+                device, estado, leitura.ts, pct, leitura.valor_mA
+            )
+        self._entregar(alertas)
+        return alertas
+
+    def _avaliar_limites(self, device, estado, ts, pct, mA):
+        if not len(estado.regras):
+            return []
+        valores = np.array((pct, mA, estado.taxa))[estado.campo]
+        # NaN (taxa ainda desconhecida) não viola nem normaliza
+        distancia = estado.sentido * (valores - estado.limiar)
+        violando = distancia > 0
+        normal = distancia < -estado.histerese
+
+        estado.contagem = np.where(violando, estado.contagem + 1, 0)
+        disparou = ~estado.ativo & (estado.contagem >= estado.debounce)
+        normalizou = estado.ativo & normal
+        estado.ativo = (estado.ativo | disparou) & ~normalizou
+
+        alertas = []
+        for i in np.flatnonzero(disparou | normalizou):
+            regra = estado.regras[i]
+            alertas.append(
+                self._alerta(
+                    regra,
+                    device,
+                    estado.local,
+                    "disparado" if disparou[i] else "normalizado",
+                    float(valores[i]),
+                    ts,
+                )
+            )
+        return alertas
+
+    def verificar_atraso(self, device, agora_ms=None):
+        """Regras sem_dados: chamada periodicamente, mesmo sem leitura nova."""
+        with self._estados_lock:
+            estado = self._estados.get(device)
+        if estado is None:
+            return []
+        agora_ms = int(time.time() * 1000) if agora_ms is None else agora_ms
+        alertas = []
+        with estado.lock:
+            referencia = estado.ultimo_ts or estado.monitorado_desde
+            if referencia is None:
+                return []
+            idade = (agora_ms - referencia) / 1000
+            for i, regra in enumerate(estado.sem_dados):
+                if not estado.sem_dados_ativo[i] and idade > regra.max_idade_seg:
+                    estado.sem_dados_ativo[i] = True
+                    alerta = self._alerta(
+                        regra, device, estado.local, "disparado", idade, agora_ms
+                    )
+                    alertas.append(alerta)
+        self._entregar(alertas)
+        return alertas
+
+    def _sem_dados_normalizado(self, device, estado, i, anterior_ts, ts):
+        estado.sem_dados_ativo[i] = False
+        idade = (ts - anterior_ts) / 1000
+        regra = estado.sem_dados[i]
+        return self._alerta(regra, device, estado.local, "normalizado", idade, ts)
+
+    def _alerta(self, regra, device, local, situacao, valor, ts):
+        if regra.tipo == "sem_dados":
+            limiar = regra.max_idade_seg
+            if situacao == "normalizado":
+                mensagem = f"{local}: {regra.nome} normalizado"
+                mensagem += f" (leitura nova após {valor / 60:.0f} min sem dados)"
+            else:
+                mensagem = f"{local}: sem leitura há {valor / 60:.0f} min"
+                mensagem += f" ({regra.nome})"
+        elif situacao == "normalizado":
+            limiar = regra.limiar
+            mensagem = f"{local}: {regra.nome} normalizado ({regra.campo} {valor:.2f})"
+        else:
+            limiar = regra.limiar
+            lado = "abaixo de" if regra.sentido < 0 else "acima de"
+            mensagem = f"{local}: {regra.campo} {valor:.2f} {lado} {limiar:g}"
+            mensagem += f" ({regra.nome})"
+        return Alerta(
+            regra.nome,
+            device,
+            local,
+            situacao,
+            regra.severidade,
+            valor,
+            limiar,
+            int(ts),
+            mensagem,
+        )
+
+    def _entregar(self, alertas):
+        for alerta in alertas:
+            metricas.incrementar(f"alertas_{alerta.estado}_total")
+            for sink in self._sinks:
+                try:
+                    sink.enviar(alerta)
+                except Exception as e:
+                    logger.error(f"Sink de alertas {type(sink).__name__} falhou: {e}")
+
+    def get_ativos(self):
+        """[(device, local, regra, severidade)] das regras disparadas agora."""
+        with self._estados_lock:
+            estados = list(self._estados.items())
+        ativos = []
+        for device, estado in estados:
+            with estado.lock:
+                for i in np.flatnonzero(estado.ativo):
+                    regra = estado.regras[i]
+                    ativos.append((device, estado.local, regra.nome, regra.severidade))
+                for regra, ativo in zip(estado.sem_dados, estado.sem_dados_ativo):
+                    if ativo:
+                        ativos.append((device, estado.local, regra.nome, regra.severidade))
+        return ativos
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def get_motor_alertas():
+    """Motor único por processo (regras lidas uma vez)."""
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            _motor = MotorAlertas()
+            # Todo o cadastro é vigiado desde a partida, não só quem já reportou
+            _motor.registrar_dispositivos(get_dispositivos())
+        return _motor
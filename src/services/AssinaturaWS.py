@@ -0,0 +1,142 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+from tornado.httpclient import HTTPClientError
+from tornado.websocket import websocket_connect
+
+from src.utils.logger import logger
+
+# Reconexão com backoff exponencial (segundos)
+BACKOFF_INICIAL_SEG = 1
+BACKOFF_MAXIMO_SEG = 60
+PING_INTERVALO_SEG = 30
+
+
+class AssinaturaTelemetria:
+    """
+    Assina a chave 'ia' do dispositivo no WebSocket de telemetria do ThingsBoard
+    e repassa cada leitura nova para ao_receber(ts, valor).
+
+    Roda numa thread própria com um loop asyncio. Se a conexão cair, reconecta
+    com backoff; enquanto estiver desconectada (conectada == False) quem usa
+    deve voltar ao polling REST.
+    """
+
+    def __init__(self, client, ao_receber=None, vagas=None):
+        self._client = client
+        self._ao_receber = ao_receber  # Chamado como ao_receber(ts, valor)
+        self._vagas = vagas  # Limite de dispositivos chamando a API REST (semáforo)
+        self._ultimo_ts = None  # Último ts repassado (descarta repetidos)
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._conexao = None
+        self.conectada = False
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(
+                target=lambda: asyncio.run(self._manter_conexao()),
+                name="AssinaturaTelemetria",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._loop is not None and self._conexao is not None:
+            self._loop.call_soon_threadsafe(self._conexao.close)
+
+    def _url(self):
+        base = self._client._base_url.replace("https://", "wss://", 1).replace(
+            "http://", "ws://", 1
+        )
+        return f"{base}/api/ws/plugins/telemetry?token={self._client.get_token_jwt()}"
+
+    def _comando_assinatura(self):
+        return json.dumps(
+            {
+                "tsSubCmds": [
+                    {
+                        "entityType": "DEVICE",
+                        "entityId": self._client._device,
+                        "scope": "LATEST_TELEMETRY",
+                        "cmdId": 1,
+                        "keys": "ia",
+                    }
+                ],
+                "historyCmds": [],
+                "attrSubCmds": [],
+            }
+        )
+
+    async def _manter_conexao(self):
+        self._loop = asyncio.get_running_loop()
+        espera = BACKOFF_INICIAL_SEG
+
+        while not self._parar.is_set():
+            try:
+                self._conexao = await websocket_connect(
+                    self._url(), connect_timeout=10, ping_interval=PING_INTERVALO_SEG
+                )
+                self._semear()
+                await self._conexao.write_message(self._comando_assinatura())
+                self.conectada = True
+                espera = BACKOFF_INICIAL_SEG
+                logger.info("Assinatura WebSocket conectada")
+
+                while True:
+                    mensagem = await self._conexao.read_message()
+                    if mensagem is None:
+                        break  # Conexão fechada
+                    self._processar(mensagem)
+            except HTTPClientError as e:
+                if e.code == 401:
+                    # Token expirado: renova antes da próxima tentativa
+                    try:
+                        self._client._renovar_token_()
+                    except Exception:
+                        pass
+                logger.warning(f"Assinatura WebSocket recusada: {e}")
+            except Exception as e:
+                logger.warning(f"Assinatura WebSocket caiu: {e}")
+            finally:
+                self.conectada = False
+                self._conexao = None
+
+            if self._parar.is_set():
+                break
+            # Backoff exponencial com jitter para não sincronizar reconexões
+            await asyncio.sleep(espera + random.uniform(0, espera / 2))
+            espera = min(espera * 2, BACKOFF_MAXIMO_SEG)
+
+    def _semear(self):
+        """
+        Carrega na tendência e no buffer as leituras do tempo desconectado (uma
+        chamada REST). Não passam por ao_receber: são históricas, não ao vivo.
+        """
+        with self._vagas or nullcontext():
+            self._client._semear_tendencia_(int(time.time() * 1000))
+
+    def _processar(self, mensagem):
+        try:
+            pontos = (json.loads(mensagem).get("data") or {}).get("ia") or []
+        except ValueError:
+            return
+        for ts, valor in pontos:
+            ts, valor = int(ts), float(valor)
+            if self._registrar(ts) and self._ao_receber is not None:
+                self._ao_receber(ts, valor)
+
+    def _registrar(self, ts):
+        with self._lock:
+            if self._ultimo_ts is not None and ts <= self._ultimo_ts:
+                return False  # Repetido ou fora de ordem
+            self._ultimo_ts = ts
+            return True
@@ -0,0 +1,134 @@
+import base64
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.metricas import metricas
+
+# Renova o JWT um pouco antes de expirar, para nenhuma requisição levar 401
+MARGEM_RENOVACAO_SEG = 60
+# Conexões mantidas abertas (keep-alive) com o servidor de telemetria
+POOL_CONEXOES = int(os.getenv("TELEMETRIA_POOL_HTTP", "10"))
+
+
+def _exp_do_jwt(token):
+    """Lê o campo 'exp' (epoch s) do payload do JWT; None se não der para ler."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return None
+
+
+class GerenciadorToken:
+    """
+    Guarda o JWT do processo e faz login quando ele falta, está para expirar
+    ou a API respondeu 401. Vários 401 simultâneos geram um único login.
+    """
+
+    def __init__(self, sessao, base_url):
+        self._sessao = sessao
+        self._base_url = base_url
+        self._token = None  # Já no formato "Bearer <jwt>"
+        self._exp = None
+        self._lock = threading.Lock()
+
+    def get_token(self):
+        token = self._token
+        if token is None or self._expirando():
+            return self._renovar(token)
+        return token
+
+    def invalidar(self, token_usado):
+        """Chamado após um 401 com token_usado; devolve um token novo."""
+        return self._renovar(token_usado)
+
+    def forcar_renovacao(self):
+        """Descarta o token atual (se houver) e faz um único login novo."""
+        return self._renovar(self._token)
+
+    def _expirando(self):
+        return self._exp is not None and self._exp - time.time() < MARGEM_RENOVACAO_SEG
+
+    def _renovar(self, token_visto):
+        with self._lock:
+            # Outra thread já renovou enquanto esta esperava o lock
+            if self._token is not None and self._token != token_visto:
+                return self._token
+
+            payload = {
+                "username": os.getenv("USUARIO"),
+                "password": os.getenv("PASSWORD"),
+            }
+            metricas.incrementar("logins_total")
+            try:
+                with metricas.medir("login"):
+                    response = self._sessao.post(
+                        f"{self._base_url}/api/auth/login", json=payload, timeout=10
+                    )
+            except Exception:
+                raise Exception("ErroConexaoToken")
+            if response.status_code != 200:
+                raise Exception("FalhaToken")
+
+            jwt = response.json()["token"]
+            self._token = f"Bearer {jwt}"
+            self._exp = _exp_do_jwt(jwt)
+            return self._token
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP único por processo: uma requests.Session com pool de conexões
+    (keep-alive e TLS reaproveitados) e o token compartilhado por todos os Sensores.
+    """
+
+    def __init__(self, base_url, pool=POOL_CONEXOES):
+        self.base_url = base_url
+        self.sessao = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool)
+        self.sessao.mount("http://", adapter)
+        self.sessao.mount("https://", adapter)
+        self.tokens = GerenciadorToken(self.sessao, base_url)
+
+    def get(self, url, **kwargs):
+        return self._requisitar("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._requisitar("POST", url, **kwargs)
+
+    def _requisitar(self, metodo, url, **kwargs):
+        token = self.tokens.get_token()
+        response = self._enviar(metodo, url, token, **kwargs)
+        if response.status_code == 401:
+            metricas.incrementar("retentativas_401_total")
+            token = self.tokens.invalidar(token)
+            response = self._enviar(metodo, url, token, **kwargs)
+        return response
+
+    def _enviar(self, metodo, url, token, **kwargs):
+        metricas.incrementar("requisicoes_http_total")
+        with metricas.medir("http"):
+            response = self.sessao.request(
+                metodo, url, headers={"Authorization": token}, **kwargs
+            )
+        if not kwargs.get("stream"):
+            metricas.incrementar("bytes_recebidos_total", len(response.content))
+        return response
+
+
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+
+def get_cliente_http(base_url):
+    """ClienteHTTP compartilhado do processo para essa base_url."""
+    with _clientes_lock:
+        if base_url not in _clientes:
+            _clientes[base_url] = ClienteHTTP(base_url)
+        return _clientes[base_url]
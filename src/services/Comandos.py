@@ -0,0 +1,304 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import requests
+
+from src.services.ClienteHTTP import get_cliente_http
+from src.services.HistoricoStore import get_store
+from src.utils.logger import logger
+from src.utils.metricas import metricas
+
+# >>>> Comandos das bombas: fila de RPCs ao dispositivo, com confirmação <<<<
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+ARQUIVO_BOMBAS = Path(os.getenv("TELEMETRIA_BOMBAS", BASE_DIR / "config" / "bombas.json"))
+# Tempo que o servidor espera a resposta do dispositivo a cada tentativa
+TIMEOUT_RPC_SEG = float(os.getenv("TELEMETRIA_RPC_TIMEOUT_SEG", "10"))
+# Tentativas por comando; a espera entre elas dobra a cada falha
+TENTATIVAS_RPC = int(os.getenv("TELEMETRIA_RPC_TENTATIVAS", "3"))
+ESPERA_RPC_SEG = float(os.getenv("TELEMETRIA_RPC_ESPERA_SEG", "1"))
+# Threads enviando RPCs: um dispositivo lento não trava os comandos das outras bombas
+WORKERS_RPC = 2
+# Comandos esperando envio; passando disso o novo comando falha na hora
+FILA_MAX_COMANDOS = 100
+METODO_RPC = "setPump"
+
+# Usadas quando não há config/bombas.json (ou TELEMETRIA_BOMBAS)
+BOMBAS_PADRAO = [
+    {"chave": "bomba_principal", "nome": "Bomba Principal", "id_env": "CONTROLADOR_BOMBAS"},
+    {"chave": "bomba_12", "nome": "Bomba 12 Polegadas", "id_env": "CONTROLADOR_BOMBAS"},
+    {
+        "chave": "bomba_12_reserva",
+        "nome": "Bomba 12 Pol (Reserva)",
+        "id_env": "CONTROLADOR_BOMBAS",
+    },
+]
+
+PENDENTE = "pendente"
+ENVIANDO = "enviando"
+CONFIRMADO = "confirmado"
+FALHOU = "falhou"
+TERMINADOS = (CONFIRMADO, FALHOU)
+
+
+@dataclass(frozen=True)
+class Bomba:
+    """Bomba comandada por RPC: chave interna, nome exibido e id do dispositivo que a aciona."""
+
+    chave: str
+    nome: str
+    device: str | None = None
+
+
+@dataclass(slots=True)
+class Comando:
+    """
+    Um pedido de ligar/desligar. O id é a chave de idempotência: vai em
+    todas as tentativas, então o dispositivo aplica o comando uma vez só.
+    """
+
+    id: str
+    bomba: str
+    ligar: bool
+    estado: str = PENDENTE
+    tentativas: int = 0
+    criado_em: float = 0.0
+    atualizado_em: float = 0.0
+    erro: str | None = None
+
+    @property
+    def terminado(self):
+        return self.estado in TERMINADOS
+
+
+class _FalhaRPC(Exception):
+    def __init__(self, mensagem, transitoria, ligada=None):
+        super().__init__(mensagem)
+        self.transitoria = transitoria
+        self.ligada = ligada  # Estado que o dispositivo informou, se informou
+
+
+def carregar_bombas(caminho=ARQUIVO_BOMBAS):
+    """
+    Lê a lista JSON de bombas: "chave", "nome" e "device" ou "id_env" (nome
+    da variável de ambiente com o id). Sem arquivo, usa BOMBAS_PADRAO.
+    """
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            itens = json.load(f)
+    except FileNotFoundError:
+        itens = BOMBAS_PADRAO
+
+    bombas = []
+    for item in itens:
+        item = dict(item)
+        id_env = item.pop("id_env", None)
+        if id_env:
+            item["device"] = os.getenv(id_env)
+        if not item.get("device"):
+            logger.warning(
+                f"Bomba '{item.get('nome')}' sem dispositivo; comandos vão falhar"
+            )
+        bombas.append(Bomba(**item))
+    return bombas
+
+
+class FilaComandos:
+    """
+    Recebe os comandos das bombas e os envia em segundo plano como RPC
+    two-way (/api/plugins/rpc/twoway/<device>) pelo mesmo servidor de
+    telemetria. Quem pede recebe o Comando na hora e acompanha o estado
+    (pendente -> enviando -> confirmado/falhou) sem esperar a rede.
+
+    Timeout, erro 5xx e resposta sem confirmação são repetidos com espera
+    crescente; recusa do servidor (4xx) falha direto. Só a confirmação do
+    dispositivo ({"ligada": true/false}) muda o estado da bomba, que fica no
+    store e vale para todas as sessões.
+    """
+
+    def __init__(
+        self,
+        bombas=None,
+        store=None,
+        base_url=None,
+        workers=WORKERS_RPC,
+        tentativas=TENTATIVAS_RPC,
+        timeout_seg=TIMEOUT_RPC_SEG,
+        espera_seg=ESPERA_RPC_SEG,
+    ):
+        if bombas is None:
+            bombas = carregar_bombas()
+        self.bombas = list(bombas)
+        self._por_chave = {b.chave: b for b in self.bombas}
+        self._store = store or get_store()
+        self._base_url = base_url or os.getenv("BASE_URL")
+        self._tentativas = max(1, tentativas)
+        self._timeout = timeout_seg
+        self._espera = espera_seg
+
+        self._lock = threading.Lock()
+        self._estados = self._store.get_estados_bombas()  # chave -> (ligada, ts, id)
+        self._ultimos = {}  # chave -> último Comando da bomba
+        self._fila = queue.Queue(maxsize=FILA_MAX_COMANDOS)
+        for i in range(max(1, workers)):
+            threading.Thread(
+                target=self._loop, name=f"ComandosRPC-{i}", daemon=True
+            ).start()
+
+    def enviar(self, chave, ligar):
+        """
+        Enfileira ligar/desligar a bomba e devolve uma cópia do Comando sem
+        esperar o envio. Com um comando da bomba ainda em andamento, devolve
+        esse mesmo (clique repetido não vira dois comandos).
+        """
+        bomba = self._por_chave[chave]
+        agora = time.time()
+        with self._lock:
+            ultimo = self._ultimos.get(chave)
+            if ultimo is not None and not ultimo.terminado:
+                return replace(ultimo)
+
+            comando = Comando(uuid.uuid4().hex, chave, bool(ligar), criado_em=agora)
+            comando.atualizado_em = agora
+            self._ultimos[chave] = comando
+            if not bomba.device:
+                self._falhar(comando, "bomba sem dispositivo cadastrado")
+            else:
+                try:
+                    self._fila.put_nowait(comando)
+                    metricas.incrementar("comandos_enfileirados_total")
+                except queue.Full:
+                    self._falhar(comando, "fila de comandos cheia")
+            return replace(comando)
+
+    def get_estado(self, chave):
+        """(ligada confirmada ou None se nunca comandada, cópia do último Comando ou None)."""
+        with self._lock:
+            estado = self._estados.get(chave)
+            ultimo = self._ultimos.get(chave)
+            return (
+                estado[0] if estado else None,
+                replace(ultimo) if ultimo else None,
+            )
+
+    def _falhar(self, comando, erro):
+        # Chamado com self._lock
+        comando.estado = FALHOU
+        comando.erro = erro
+        comando.atualizado_em = time.time()
+        metricas.incrementar("comandos_falhos_total")
+        logger.error(f"Comando {comando.id} ({comando.bomba}) falhou: {erro}")
+
+    def _loop(self):
+        while True:
+            comando = self._fila.get()
+            try:
+                self._executar(comando)
+            except Exception as e:
+                with self._lock:
+                    self._falhar(comando, str(e))
+
+    def _executar(self, comando):
+        bomba = self._por_chave[comando.bomba]
+        for tentativa in range(1, self._tentativas + 1):
+            with self._lock:
+                comando.estado = ENVIANDO
+                comando.tentativas = tentativa
+                comando.atualizado_em = time.time()
+            try:
+                ligada = self._rpc(bomba, comando)
+            except _FalhaRPC as e:
+                if e.ligada is not None:
+                    # Não obedeceu, mas disse como a bomba está: esse é o estado real
+                    self._salvar_estado(comando, e.ligada, time.time())
+                with self._lock:
+                    comando.erro = str(e)
+                if not e.transitoria or tentativa == self._tentativas:
+                    break
+                metricas.incrementar("comandos_retentativas_total")
+                time.sleep(self._espera * 2 ** (tentativa - 1))
+                continue
+
+            self._confirmar(comando, ligada)
+            return
+
+        with self._lock:
+            self._falhar(comando, comando.erro)
+
+    def _rpc(self, bomba, comando):
+        """Uma tentativa de RPC; devolve o estado que o dispositivo confirmou."""
+        url = f"{self._base_url}/api/plugins/rpc/twoway/{bomba.device}"
+        corpo = {
+            "method": METODO_RPC,
+            "params": {"bomba": bomba.chave, "ligar": comando.ligar, "id": comando.id},
+            "timeout": int(self._timeout * 1000),
+        }
+        try:
+            with metricas.medir("rpc_bomba"):
+                # Folga sobre o timeout do servidor, que responde 408 antes disso
+                response = get_cliente_http(self._base_url).post(
+                    url, json=corpo, timeout=self._timeout + 5
+                )
+        except requests.RequestException as e:
+            raise _FalhaRPC(f"sem resposta do servidor ({type(e).__name__})", True)
+        except Exception as e:
+            # Login falhou (ErroConexaoToken / FalhaToken): pode passar
+            raise _FalhaRPC(str(e), True)
+
+        if response.status_code in (408, 429) or response.status_code >= 500:
+            raise _FalhaRPC(f"HTTP {response.status_code}", True)
+        if response.status_code != 200:
+            raise _FalhaRPC(f"recusado pelo servidor (HTTP {response.status_code})", False)
+
+        # Só conta como confirmado com o estado explícito do dispositivo; resposta
+        # vazia ou malformada é repetida (o id evita aplicar o comando duas vezes)
+        try:
+            resposta = response.json()
+        except ValueError:
+            resposta = None
+        ligada = resposta.get("ligada") if isinstance(resposta, dict) else None
+        if not isinstance(ligada, bool):
+            raise _FalhaRPC("dispositivo não confirmou o estado da bomba", True)
+        if ligada != comando.ligar:
+            estado = "ligada" if ligada else "parada"
+            raise _FalhaRPC(f"dispositivo manteve a bomba {estado}", False, ligada)
+        return ligada
+
+    def _salvar_estado(self, comando, ligada, agora):
+        self._store.salvar_estado_bomba(
+            comando.bomba, ligada, int(agora * 1000), comando.id
+        )
+        with self._lock:
+            self._estados[comando.bomba] = (ligada, int(agora * 1000), comando.id)
+
+    def _confirmar(self, comando, ligada):
+        agora = time.time()
+        self._salvar_estado(comando, ligada, agora)
+        with self._lock:
+            comando.estado = CONFIRMADO
+            comando.erro = None
+            comando.atualizado_em = agora
+        metricas.incrementar("comandos_confirmados_total")
+        logger.info(
+            f"Bomba {comando.bomba} {'ligada' if ligada else 'desligada'} "
+            f"(comando {comando.id}, {comando.tentativas} tentativa(s))"
+        )
+
+
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def get_fila_comandos():
+    """Fila única por processo: o estado das bombas é o mesmo em todas as sessões."""
+    global _fila
+    with _fila_lock:
+        if _fila is None:
+            _fila = FilaComandos()
+        return _fila
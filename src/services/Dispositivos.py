@@ -0,0 +1,66 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from src.utils.logger import logger
+
+# >>>> Cadastro dos dispositivos monitorados <<<<
+
+# Caminho do cadastro (caminho universal, mesmo padrão do logger)
+BASE_DIR = Path(__file__).resolve().parents[2]
+ARQUIVO_DISPOSITIVOS = Path(
+    os.getenv("TELEMETRIA_DISPOSITIVOS", BASE_DIR / "config" / "dispositivos.json")
+)
+
+
+@dataclass(frozen=True)
+class Dispositivo:
+    """Reservatório ou poço: id no servidor, nome exibido e calibração do sensor (mA)."""
+
+    id: str
+    nome: str
+    minimo_mA: float = 4.0
+    maximo_mA: float = 6.8
+
+
+def carregar_dispositivos(caminho=ARQUIVO_DISPOSITIVOS):
+    """
+    Lê o cadastro (lista JSON). Cada item tem "id" ou "id_env" (nome da
+    variável de ambiente com o id), "nome" e, opcionalmente, "minimo_mA" e
+    "maximo_mA". Sem arquivo, usa só o SENSOR_LAVADEIRA do .env.
+    """
+    load_dotenv()
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            itens = json.load(f)
+    except FileNotFoundError:
+        itens = [{"id_env": "SENSOR_LAVADEIRA", "nome": "Lavadeira"}]
+
+    dispositivos = []
+    for item in itens:
+        item = dict(item)
+        id_env = item.pop("id_env", None)
+        if id_env:
+            item["id"] = os.getenv(id_env)
+        if not item.get("id"):
+            logger.warning(f"Dispositivo '{item.get('nome')}' sem id no cadastro; ignorado")
+            continue
+        dispositivos.append(Dispositivo(**item))
+    return dispositivos
+
+
+_dispositivos = None
+_dispositivos_lock = threading.Lock()
+
+
+def get_dispositivos():
+    """Cadastro lido uma vez por processo."""
+    global _dispositivos
+    with _dispositivos_lock:
+        if _dispositivos is None:
+            _dispositivos = carregar_dispositivos()
+        return _dispositivos
@@ -0,0 +1,218 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.services.HistoricoStore import RESOLUCAO_BASE_MS
+from src.utils.metricas import metricas
+
+# >>>> Episódios de enchimento e esvaziamento (segmentação vetorizada) <<<<
+
+# Média móvel aplicada ao nível antes de derivar (em pontos de 1 min)
+JANELA_SUAVIZACAO = 31
+# Histerese na taxa (%/h): entra em enchendo/esvaziando acima de ENTRADA e só
+# volta a estável abaixo de SAIDA; entre as duas mantém o estado anterior
+TAXA_ENTRADA_PCT_H = 5.0
+TAXA_SAIDA_PCT_H = 2.0
+# Episódios com variação menor que isso (em pontos percentuais) são ruído
+VARIACAO_MINIMA_PCT = 3.0
+# Sem leitura por mais que isso o episódio é cortado
+LACUNA_MAXIMA_MS = 10 * 60 * 1000
+# Dados antes do ponto de retomada relidos para a média móvel começar estável
+AQUECIMENTO_MS = 2 * JANELA_SUAVIZACAO * RESOLUCAO_BASE_MS
+# Sem episódio fechado para servir de ponto de partida, relê até esse tanto para trás
+RETOMADA_SEM_EPISODIO_MS = 24 * 3600 * 1000
+
+ENCHENDO = "enchendo"
+ESVAZIANDO = "esvaziando"
+
+EPISODIO_DTYPE = np.dtype(
+    [
+        ("inicio_ts", np.int64),
+        ("fim_ts", np.int64),
+        ("direcao", np.int8),  # +1 enchendo, -1 esvaziando
+        ("nivel_inicio", np.float64),
+        ("nivel_fim", np.float64),
+        ("variacao_pct", np.float64),
+        ("taxa_pct_h", np.float64),
+    ]
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Episodio:
+    """Um trecho contínuo de enchimento ou esvaziamento (níveis em %)."""
+
+    inicio_ts: int  # ms
+    fim_ts: int  # ms
+    tipo: str  # enchendo ou esvaziando
+    nivel_inicio: float
+    nivel_fim: float
+    variacao_pct: float  # fim - início (negativa ao esvaziar)
+    taxa_pct_h: float  # |variação| por hora
+
+    @property
+    def duracao_min(self):
+        return (self.fim_ts - self.inicio_ts) / 60000
+
+
+def _media_movel(valores, janela):
+    """Média móvel centrada; nas pontas usa só os pontos que existem."""
+    nucleo = np.ones(janela)
+    soma = np.convolve(valores, nucleo, mode="same")
+    contagem = np.convolve(np.ones(len(valores)), nucleo, mode="same")
+    return soma / contagem
+
+
+def detectar_episodios(
+    ts,
+    nivel,
+    janela=JANELA_SUAVIZACAO,
+    entrada=TAXA_ENTRADA_PCT_H,
+    saida=TAXA_SAIDA_PCT_H,
+    variacao_minima=VARIACAO_MINIMA_PCT,
+    lacuna_maxima=LACUNA_MAXIMA_MS,
+):
+    """
+    Segmenta a série de nível (ts em ms, nível em %) em episódios, sem laço
+    por ponto:
+
+    1. suaviza o nível e calcula a taxa (%/h) entre pontos vizinhos;
+    2. marca eventos: +1/-1 onde |taxa| >= entrada, 0 onde |taxa| <= saida
+       ou há lacuna; o resto herda o último evento (histerese via
+       maximum.accumulate);
+    3. cada sequência de estado igual (≠ 0) vira um episódio, descartado se
+       variar menos que variacao_minima ou contra o próprio sentido.
+
+    Retorna um array estruturado com EPISODIO_DTYPE, em ordem de início.
+    """
+    ts = np.asarray(ts, dtype=np.int64)
+    nivel = np.asarray(nivel, dtype=np.float64)
+    if len(ts) < 2:
+        return np.empty(0, dtype=EPISODIO_DTYPE)
+
+    suave = _media_movel(nivel, min(janela, len(nivel)))
+    dt = np.diff(ts)
+    taxa = np.diff(suave) / np.maximum(dt, 1) * 3600 * 1000
+
+    # Estado de cada intervalo i (entre os pontos i e i+1)
+    evento = np.full(len(taxa), np.nan)
+    evento[np.abs(taxa) <= saida] = 0.0
+    evento[taxa >= entrada] = 1.0
+    evento[taxa <= -entrada] = -1.0
+    evento[dt > lacuna_maxima] = 0.0
+    tem_evento = ~np.isnan(evento)
+    ultimo = np.maximum.accumulate(np.where(tem_evento, np.arange(len(evento)), 0))
+    estado = np.where(tem_evento[ultimo], evento[ultimo], 0.0).astype(np.int8)
+
+    # Sequências de mesmo estado: [inicio, fim] em índices de ponto
+    inicios = np.flatnonzero(np.diff(estado)) + 1
+    inicios = np.concatenate(([0], inicios))
+    fins = np.append(inicios[1:], len(estado))
+    direcao = estado[inicios]
+
+    manter = direcao != 0
+    inicios, fins, direcao = inicios[manter], fins[manter], direcao[manter]
+    variacao = suave[fins] - suave[inicios]
+    duracao = ts[fins] - ts[inicios]
+    manter = (
+        (np.abs(variacao) >= variacao_minima)
+        & (np.sign(variacao) == direcao)
+        & (duracao > 0)
+    )
+    inicios, fins = inicios[manter], fins[manter]
+
+    episodios = np.empty(len(inicios), dtype=EPISODIO_DTYPE)
+    episodios["inicio_ts"] = ts[inicios]
+    episodios["fim_ts"] = ts[fins]
+    episodios["direcao"] = direcao[manter]
+    episodios["nivel_inicio"] = suave[inicios]
+    episodios["nivel_fim"] = suave[fins]
+    episodios["variacao_pct"] = variacao[manter]
+    episodios["taxa_pct_h"] = np.abs(variacao[manter]) / duracao[manter] * 3600 * 1000
+    return episodios
+
+
+def _para_linhas(episodios):
+    return [
+        (
+            int(e["inicio_ts"]),
+            int(e["fim_ts"]),
+            ENCHENDO if e["direcao"] > 0 else ESVAZIANDO,
+            round(float(e["nivel_inicio"]), 2),
+            round(float(e["nivel_fim"]), 2),
+            round(float(e["variacao_pct"]), 2),
+            round(float(e["taxa_pct_h"]), 2),
+        )
+        for e in episodios
+    ]
+
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _lock_do_device(device):
+    with _locks_lock:
+        return _locks.setdefault(device, threading.Lock())
+
+
+def _ponto_de_retomada(ultimos, processado_ate, primeiro_ts):
+    """
+    ts a partir do qual o índice é refeito. Episódios que terminam antes
+    disso estão fechados: a média móvel centrada já não muda ali.
+    """
+    assentado = None if processado_ate is None else processado_ate - AQUECIMENTO_MS
+    if not ultimos:
+        if processado_ate is None:
+            return primeiro_ts
+        return max(primeiro_ts, processado_ate - RETOMADA_SEM_EPISODIO_MS)
+
+    inicio, fim = ultimos[0]
+    if assentado is not None and fim < assentado:
+        return fim  # Último episódio fechado: segue dali
+    # Último episódio ainda em aberto: refaz ele (e o que vier depois)
+    anterior = ultimos[1][1] if len(ultimos) > 1 else primeiro_ts
+    return max(anterior, inicio - RETOMADA_SEM_EPISODIO_MS)
+
+
+@metricas.medido("indice_episodios")
+def atualizar_indice(store, device, minimo_mA, maximo_mA, refazer=False):
+    """
+    Leva o índice de episódios do device até o fim do que há no store,
+    relendo só o trecho depois do último episódio fechado (mais um
+    aquecimento para a média móvel). refazer=True segmenta tudo de novo
+    (ex: o store ganhou dados antes do começo). Retorna quantos episódios
+    foram gravados.
+    """
+    with _lock_do_device(device):
+        intervalo = store.get_intervalo_sincronizado(device)
+        if intervalo is None:
+            return 0
+        ultimos, processado_ate = store.get_estado_episodios(device)
+        if refazer:
+            ultimos, processado_ate = [], None
+        retomada = _ponto_de_retomada(ultimos, processado_ate, intervalo[0])
+
+        ts, valores = store.get_leituras_arrays(
+            device, retomada - AQUECIMENTO_MS, intervalo[1]
+        )
+        if len(ts) == 0 or (processado_ate is not None and ts[-1] <= processado_ate):
+            return 0  # Nada novo desde a última atualização
+
+        nivel = np.clip((valores - minimo_mA) / (maximo_mA - minimo_mA), 0.0, 1.0) * 100
+        episodios = detectar_episodios(ts, nivel)
+        # Os que começam antes da retomada já estão no índice (ou são aquecimento)
+        episodios = episodios[episodios["inicio_ts"] >= retomada]
+
+        store.substituir_episodios(device, retomada, _para_linhas(episodios), int(ts[-1]))
+        metricas.incrementar("episodios_gravados_total", len(episodios))
+        return len(episodios)
+
+
+def consultar_episodios(store, device, ts_inicio, ts_fim, tipo=None, taxa_min=None):
+    """[Episodio, ...] do índice, sem reler as leituras."""
+    return [
+        Episodio(*linha)
+        for linha in store.get_episodios(device, ts_inicio, ts_fim, tipo, taxa_min)
+    ]
@@ -0,0 +1,322 @@
+import hashlib
+import hmac
+import os
+import secrets
+import tempfile
+import time
+from functools import cache
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+
+from src.services.HistoricoStore import (
+    MEIO_BALDE_BASE_MS,
+    RESOLUCAO_BASE_MS,
+    inicio_balde,
+)
+from src.utils.logger import logger
+from src.utils.metricas import metricas
+from src.utils.servidor_local import iniciar_servidor
+
+# >>>> Exportação do histórico em blocos (CSV / Parquet) <<<<
+
+# Tamanho de cada bloco lido e escrito: a memória usada não depende do intervalo
+BLOCO_EXPORTACAO_MS = int(os.getenv("TELEMETRIA_BLOCO_EXPORTACAO_H", "24")) * 3600 * 1000
+# Porta do endpoint /exportar (download em streaming); vazio ou 0 = desligado
+PORTA_EXPORTACAO = int(os.getenv("TELEMETRIA_PORTA_EXPORTACAO", "0") or 0)
+# Interface em que o endpoint escuta (o proxy na frente dele publica a URL abaixo)
+HOST_EXPORTACAO = os.getenv("TELEMETRIA_HOST_EXPORTACAO", "127.0.0.1")
+# Endereço do endpoint visto pelo navegador; sem ele o endpoint fica desligado
+URL_EXPORTACAO = os.getenv("TELEMETRIA_URL_EXPORTACAO", "").rstrip("/")
+# Chave dos links assinados; sem ela cada processo sorteia a sua (links não
+# sobrevivem a um restart nem valem entre réplicas)
+SEGREDO_EXPORTACAO = (
+    os.getenv("TELEMETRIA_SEGREDO_EXPORTACAO", "").encode() or secrets.token_bytes(32)
+)
+# Por quanto tempo um link de download gerado pelo painel vale
+VALIDADE_LINK_SEG = int(os.getenv("TELEMETRIA_VALIDADE_LINK_EXPORTACAO_SEG", "600"))
+
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+COLUNAS = ("ts", "date", "value_mA", "value_percent")
+
+
+@cache
+def _esquema():
+    # pyarrow só é importado quando alguém exporta de fato
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("ts", pa.int64()),
+            ("date", pa.timestamp("ms", tz="America/Sao_Paulo")),
+            ("value_mA", pa.float64()),
+            ("value_percent", pa.float64()),
+        ]
+    )
+
+
+def iterar_blocos(client, ts_inicio, ts_fim, bruto=False, bloco_ms=None):
+    """
+    Gera (ts, valor_mA) em blocos de bloco_ms, em ordem, dentro de [ts_inicio, ts_fim].
+
+    Blocos já sincronizados saem do store local; os demais vêm da API em
+    médias de 1 min (ou leituras brutas com bruto=True), sem passar pelo
+    store, para não carregar o intervalo inteiro de uma vez.
+    """
+    bloco_ms = bloco_ms or BLOCO_EXPORTACAO_MS
+    intervalo = client._store.get_intervalo_sincronizado(client._device)
+    for a in range(int(ts_inicio), int(ts_fim) + 1, bloco_ms):
+        b = min(a + bloco_ms, int(ts_fim) + 1)  # [a, b)
+        coberto = intervalo is not None and intervalo[0] <= a and b <= intervalo[1]
+        if coberto and not bruto:
+            ts, valores = client._store.get_leituras_arrays(client._device, a, b - 1)
+        else:
+            if bruto:
+                resultado = client._buscar_historico_paginado_(a, b, agg="NONE")
+            else:
+                # Alinhado ao minuto, como na sincronização: mesmos ts do store
+                inicio = (a // RESOLUCAO_BASE_MS) * RESOLUCAO_BASE_MS
+                resultado = client._buscar_historico_paginado_(inicio, b)
+            if resultado is None:
+                raise Exception("FalhaExportacao")
+            ts, valores = resultado
+            if not bruto:
+                # Minuto cortado pelo fim do bloco: mesmo ts do minuto inteiro
+                ts = inicio_balde(ts, RESOLUCAO_BASE_MS) + MEIO_BALDE_BASE_MS
+            dentro = (ts >= a) & (ts < b)
+            ts, valores = ts[dentro], valores[dentro]
+        if len(ts):
+            yield ts, valores
+
+
+def _tabela(client, ts, valores):
+    import pyarrow as pa
+
+    esquema = _esquema()
+    perc = np.clip((valores - client._MINIMO) / (client._MAXIMO - client._MINIMO), 0.0, 1.0)
+    return pa.table(
+        {
+            "ts": ts,
+            "date": pa.array(ts, type=pa.timestamp("ms")).cast(esquema.field("date").type),
+            "value_mA": valores,
+            "value_percent": np.round(perc, 4),
+        },
+        schema=esquema,
+    )
+
+
+def gerar_csv(client, ts_inicio, ts_fim, bruto=False):
+    """Bytes do CSV, um pedaço por bloco (o primeiro traz o cabeçalho)."""
+    cabecalho = True
+    for ts, valores in iterar_blocos(client, ts_inicio, ts_fim, bruto):
+        df = _tabela(client, ts, valores).to_pandas()
+        yield df.to_csv(index=False, header=cabecalho).encode("utf-8")
+        cabecalho = False
+    if cabecalho:
+        yield (",".join(COLUNAS) + "\n").encode("utf-8")
+
+
+class _SaidaDescarregavel:
+    """Arquivo de escrita em memória que é esvaziado a cada bloco gerado."""
+
+    def __init__(self):
+        self._partes = []
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def retirar(self):
+        dados = b"".join(self._partes)
+        self._partes = []
+        return dados
+
+
+def gerar_parquet(client, ts_inicio, ts_fim, bruto=False):
+    """Bytes do Parquet, um row group por bloco; o rodapé sai no fim."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    saida = _SaidaDescarregavel()
+    escritor = pq.ParquetWriter(pa.PythonFile(saida, mode="w"), _esquema())
+    try:
+        for ts, valores in iterar_blocos(client, ts_inicio, ts_fim, bruto):
+            escritor.write_table(_tabela(client, ts, valores))
+            yield saida.retirar()
+    finally:
+        escritor.close()
+    yield saida.retirar()
+
+
+def gerar_exportacao(client, ts_inicio, ts_fim, formato="csv", bruto=False):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}")
+    gerador = gerar_parquet if formato == "parquet" else gerar_csv
+    return gerador(client, ts_inicio, ts_fim, bruto)
+
+
+def _escrever(arquivo, client, ts_inicio, ts_fim, formato, bruto):
+    total = 0
+    for pedaco in gerar_exportacao(client, ts_inicio, ts_fim, formato, bruto):
+        arquivo.write(pedaco)
+        total += len(pedaco)
+    return total
+
+
+@metricas.medido("exportacao")
+def exportar(client, ts_inicio, ts_fim, destino, formato="csv", bruto=False):
+    """Grava o intervalo em destino (caminho). Retorna o total de bytes escritos."""
+    with open(destino, "wb") as f:
+        return _escrever(f, client, ts_inicio, ts_fim, formato, bruto)
+
+
+@metricas.medido("exportacao")
+def exportar_em_arquivo_temporario(client, ts_inicio, ts_fim, formato="csv", bruto=False):
+    """
+    Grava o intervalo num arquivo temporário (apagado ao fechar) e o devolve
+    aberto no início. Quem chama fecha; a memória não depende do intervalo.
+    """
+    arquivo = tempfile.TemporaryFile(buffering=0)
+    try:
+        _escrever(arquivo, client, ts_inicio, ts_fim, formato, bruto)
+    except BaseException:
+        arquivo.close()
+        raise
+    arquivo.seek(0)
+    return arquivo
+
+
+def nome_arquivo(client, ts_inicio, ts_fim, formato):
+    return f"historico_{client._local}_{int(ts_inicio)}_{int(ts_fim)}.{FORMATOS[formato][1]}"
+
+
+def assinar(device, ts_inicio, ts_fim, formato, bruto, expira):
+    """HMAC-SHA256 (hex) dos parâmetros de um link de download."""
+    mensagem = f"{device}|{int(ts_inicio)}|{int(ts_fim)}|{formato}|{int(bool(bruto))}|{expira}"
+    return hmac.new(SEGREDO_EXPORTACAO, mensagem.encode(), hashlib.sha256).hexdigest()
+
+
+def _link_valido(params, agora=None):
+    """True se a assinatura confere com os parâmetros e o link não expirou."""
+    try:
+        expira = int(params["expira"])
+        esperada = assinar(
+            params["device"],
+            params["inicio"],
+            params["fim"],
+            params.get("formato", "csv"),
+            params.get("bruto") == "1",
+            expira,
+        )
+    except (KeyError, ValueError):
+        return False
+    agora = time.time() if agora is None else agora
+    return agora < expira and hmac.compare_digest(esperada, params.get("assinatura", ""))
+
+
+class _HandlerExportacao(BaseHTTPRequestHandler):
+    """
+    GET /exportar?inicio=<ms>&fim=<ms>&formato=csv|parquet&device=<id>
+    [&bruto=1]&expira=<epoch s>&assinatura=<hmac>
+    Só atende links assinados por url_exportacao e ainda válidos.
+    Responde em chunked transfer: o download começa no primeiro bloco.
+    """
+
+    protocol_version = "HTTP/1.1"
+    clientes = {}  # device -> SensorClient, registrados por registrar_cliente
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/exportar":
+            self.send_error(404)
+            return
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if not _link_valido(params):
+            self.send_error(403, "Link inválido ou expirado")
+            return
+        try:
+            ts_inicio, ts_fim = int(params["inicio"]), int(params["fim"])
+            formato = params.get("formato", "csv")
+            client = self.clientes[params["device"]]
+            tipo = FORMATOS[formato][0]
+        except (KeyError, ValueError):
+            self.send_error(400, "Parâmetros inválidos")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header(
+            "Content-Disposition",
+            f'attachment; filename="{nome_arquivo(client, ts_inicio, ts_fim, formato)}"',
+        )
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            gerador = gerar_exportacao(
+                client, ts_inicio, ts_fim, formato, params.get("bruto") == "1"
+            )
+            for pedaco in gerador:
+                if pedaco:
+                    self.wfile.write(f"{len(pedaco):X}\r\n".encode() + pedaco + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:
+            # Cabeçalho já foi: só resta cortar a conexão para o download falhar
+            logger.error(f"Exportação interrompida: {e}")
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def registrar_cliente(client):
+    """Disponibiliza o dispositivo do client no endpoint de exportação."""
+    _HandlerExportacao.clientes.setdefault(client._device, client)
+
+
+def iniciar_servidor_exportacao(porta=None, host=None):
+    """Sobe (uma vez) o endpoint /exportar. Retorna a porta ou None se desligado."""
+    return iniciar_servidor(
+        "exportacao",
+        porta or PORTA_EXPORTACAO,
+        _HandlerExportacao,
+        host or HOST_EXPORTACAO,
+    )
+
+
+def url_exportacao(client, ts_inicio, ts_fim, formato="csv", bruto=False):
+    """
+    Link assinado do download em streaming (vale VALIDADE_LINK_SEG), ou None
+    se o endpoint estiver desligado: sem TELEMETRIA_URL_EXPORTACAO não há
+    endereço que o navegador alcance.
+    """
+    if not URL_EXPORTACAO or iniciar_servidor_exportacao() is None:
+        return None
+    expira = int(time.time()) + VALIDADE_LINK_SEG
+    params = {
+        "inicio": int(ts_inicio),
+        "fim": int(ts_fim),
+        "formato": formato,
+        "device": client._device,
+    }
+    if bruto:
+        params["bruto"] = 1
+    params["expira"] = expira
+    params["assinatura"] = assinar(client._device, ts_inicio, ts_fim, formato, bruto, expira)
+    return f"{URL_EXPORTACAO}/exportar?{urlencode(params)}"
@@ -0,0 +1,516 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+
+# >>>> Armazenamento local do histórico <<<<
+
+# Caminho do banco (caminho universal, mesmo padrão do logger)
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_DIR = BASE_DIR / "data"
+DB_FILE = Path(os.getenv("TELEMETRIA_DB", DATA_DIR / "telemetria.db"))
+
+# Versão do esquema: ao mudar a resolução base ou as colunas dela, o banco
+# antigo é descartado
+VERSAO_ESQUEMA = 3
+
+# Pirâmide de resoluções: 1 min (base, vinda da API), 15 min, 1 h e 1 dia
+RESOLUCOES_MS = (60 * 1000, 15 * 60 * 1000, 3600 * 1000, 86400 * 1000)
+RESOLUCAO_BASE_MS = RESOLUCOES_MS[0]
+# O servidor marca cada balde agregado no meio dele; leituras ao vivo usam o mesmo ts
+MEIO_BALDE_BASE_MS = RESOLUCAO_BASE_MS // 2
+
+# Baldes diários começam à meia-noite de Brasília, que é 03:00 UTC
+# (America/Sao_Paulo não tem horário de verão desde 2019)
+OFFSET_FUSO_MS = 3 * 3600 * 1000
+
+
+class HistoricoStore:
+    """
+    Guarda o histórico em SQLite, um balde de 1 min por (dispositivo, ts) com
+    média, mínimo, máximo e contagem das leituras brutas do minuto, e lembra
+    qual intervalo de tempo já foi sincronizado com a API para cada dispositivo.
+
+    A cada gravação os rollups (soma, mín, máx, contagem de leituras brutas)
+    de 15 min, 1 h e 1 dia dos baldes afetados são atualizados, então
+    consultas longas leem poucas linhas prontas.
+
+    Trechos antigos de consultas longas podem vir da API já na resolução do
+    rollup (salvar_rollups), sem passar pela base: cada resolução lembra o
+    intervalo que recebeu assim. Baldes que a base cobre inteiros sempre saem
+    da base; antes dela, valem os do servidor.
+    """
+
+    def __init__(self, caminho=DB_FILE):
+        Path(caminho).parent.mkdir(exist_ok=True)
+        # Uma conexão compartilhada; o lock serializa o acesso entre threads
+        self._conn = sqlite3.connect(str(caminho), check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            versao = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if versao < VERSAO_ESQUEMA:
+                # Esquema antigo: recomeça do zero a sincronização e o que deriva dela
+                for tabela in (
+                    "leituras",
+                    "sincronizacao",
+                    "rollups",
+                    "sincronizacao_rollups",
+                    "episodios",
+                    "episodios_processados",
+                ):
+                    self._conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+                self._conn.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS leituras (
+                    device TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    value REAL NOT NULL,
+                    minimo REAL NOT NULL,
+                    maximo REAL NOT NULL,
+                    n INTEGER NOT NULL,
+                    PRIMARY KEY (device, ts)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sincronizacao (
+                    device TEXT PRIMARY KEY,
+                    primeiro_ts INTEGER NOT NULL,
+                    ultimo_ts INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rollups (
+                    device TEXT NOT NULL,
+                    resolucao INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    soma REAL NOT NULL,
+                    minimo REAL NOT NULL,
+                    maximo REAL NOT NULL,
+                    n INTEGER NOT NULL,
+                    PRIMARY KEY (device, resolucao, bucket)
+                ) WITHOUT ROWID
+                """
+            )
+            # Intervalo [primeiro_ts, ultimo_ts) de cada resolução vindo pronto da API
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sincronizacao_rollups (
+                    device TEXT NOT NULL,
+                    resolucao INTEGER NOT NULL,
+                    primeiro_ts INTEGER NOT NULL,
+                    ultimo_ts INTEGER NOT NULL,
+                    PRIMARY KEY (device, resolucao)
+                )
+                """
+            )
+            # Índice de episódios de enchimento/esvaziamento (src/services/Episodios.py)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS episodios (
+                    device TEXT NOT NULL,
+                    inicio_ts INTEGER NOT NULL,
+                    fim_ts INTEGER NOT NULL,
+                    tipo TEXT NOT NULL,
+                    nivel_inicio REAL NOT NULL,
+                    nivel_fim REAL NOT NULL,
+                    variacao_pct REAL NOT NULL,
+                    taxa_pct_h REAL NOT NULL,
+                    PRIMARY KEY (device, inicio_ts)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS episodios_por_tipo
+                ON episodios (device, tipo, inicio_ts)
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS episodios_processados (
+                    device TEXT PRIMARY KEY,
+                    processado_ate INTEGER NOT NULL
+                )
+                """
+            )
+            # Último estado confirmado de cada bomba (src/services/Comandos.py)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bombas (
+                    chave TEXT PRIMARY KEY,
+                    ligada INTEGER NOT NULL,
+                    confirmado_ts INTEGER NOT NULL,
+                    comando_id TEXT NOT NULL
+                )
+                """
+            )
+
+    def get_intervalo_sincronizado(self, device):
+        """Retorna (primeiro_ts, ultimo_ts) já sincronizados ou None."""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT primeiro_ts, ultimo_ts FROM sincronizacao WHERE device = ?",
+                (device,),
+            ).fetchone()
+        return tuple(linha) if linha else None
+
+    def get_intervalo_rollups(self, device, resolucao):
+        """Retorna (primeiro_ts, ultimo_ts) dos rollups vindos prontos da API ou None."""
+        with self._lock:
+            linha = self._conn.execute(
+                """
+                SELECT primeiro_ts, ultimo_ts FROM sincronizacao_rollups
+                WHERE device = ? AND resolucao = ?
+                """,
+                (device, resolucao),
+            ).fetchone()
+        return tuple(linha) if linha else None
+
+    def salvar_rollups(self, device, resolucao, baldes, ts_inicio, ts_fim):
+        """
+        Grava baldes já agregados pela API [(início do balde, média, mínimo,
+        máximo, contagem), ...] direto nos rollups da resolução e estende o
+        intervalo recebido assim para [ts_inicio, ts_fim). Baldes que a base
+        cobre inteiros não são tocados: os dela estão sempre em dia.
+        """
+        with self._lock, self._conn:
+            sincronizado = self._conn.execute(
+                "SELECT primeiro_ts FROM sincronizacao WHERE device = ?", (device,)
+            ).fetchone()
+            limite = (
+                inicio_balde(sincronizado[0] - 1, resolucao) + resolucao
+                if sincronizado
+                else None
+            )
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO rollups
+                    (device, resolucao, bucket, soma, minimo, maximo, n)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (device, resolucao, int(b), float(media) * n, float(mi), float(ma), int(n))
+                    for b, media, mi, ma, n in baldes
+                    if n > 0 and (limite is None or b < limite)
+                ],
+            )
+            self._conn.execute(
+                """
+                INSERT INTO sincronizacao_rollups (device, resolucao, primeiro_ts, ultimo_ts)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(device, resolucao) DO UPDATE SET
+                    primeiro_ts = MIN(primeiro_ts, excluded.primeiro_ts),
+                    ultimo_ts = MAX(ultimo_ts, excluded.ultimo_ts)
+                """,
+                (device, resolucao, int(ts_inicio), int(ts_fim)),
+            )
+
+    def salvar_leituras(self, device, pontos, ts_inicio, ts_fim):
+        """
+        Grava os baldes de 1 min [(ts, média, mínimo, máximo, contagem), ...]
+        vindos da API e estende o intervalo sincronizado para cobrir
+        [ts_inicio, ts_fim]. Baldes repetidos são sobrescritos (o servidor tem
+        todas as leituras do minuto, inclusive as que chegaram ao vivo).
+        """
+        linhas = [
+            (device, int(ts), float(media), float(minimo), float(maximo), int(n))
+            for ts, media, minimo, maximo, n in pontos
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO leituras (device, ts, value, minimo, maximo, n)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                linhas,
+            )
+            if linhas:
+                tss = [linha[1] for linha in linhas]
+                sincronizado = self._conn.execute(
+                    "SELECT primeiro_ts FROM sincronizacao WHERE device = ?", (device,)
+                ).fetchone()
+                primeiro_ts = min(sincronizado[0], ts_inicio) if sincronizado else ts_inicio
+                self._atualizar_rollups(device, min(tss), max(tss), primeiro_ts)
+            self._conn.execute(
+                """
+                INSERT INTO sincronizacao (device, primeiro_ts, ultimo_ts)
+                VALUES (?, ?, ?)
+                ON CONFLICT(device) DO UPDATE SET
+                    primeiro_ts = MIN(primeiro_ts, excluded.primeiro_ts),
+                    ultimo_ts = MAX(ultimo_ts, excluded.ultimo_ts)
+                """,
+                (device, int(ts_inicio), int(ts_fim)),
+            )
+
+    def registrar_leitura(self, device, ts, valor):
+        """
+        Soma uma leitura bruta recebida ao vivo ao balde de 1 min dela e aos
+        rollups, sem reler a base. Leituras até o fim do intervalo sincronizado
+        já estão nos baldes vindos da API e são ignoradas. Retorna True se gravou.
+        """
+        ts, valor = int(ts), float(valor)
+        with self._lock, self._conn:
+            sincronizado = self._conn.execute(
+                "SELECT ultimo_ts FROM sincronizacao WHERE device = ?", (device,)
+            ).fetchone()
+            if sincronizado and ts <= sincronizado[0]:
+                return False
+            self._conn.execute(
+                """
+                INSERT INTO leituras (device, ts, value, minimo, maximo, n)
+                VALUES (:device, :ts, :v, :v, :v, 1)
+                ON CONFLICT(device, ts) DO UPDATE SET
+                    value = (value * n + excluded.value) / (n + 1),
+                    minimo = MIN(minimo, excluded.minimo),
+                    maximo = MAX(maximo, excluded.maximo),
+                    n = n + 1
+                """,
+                {
+                    "device": device,
+                    "ts": inicio_balde(ts, RESOLUCAO_BASE_MS) + MEIO_BALDE_BASE_MS,
+                    "v": valor,
+                },
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO rollups (device, resolucao, bucket, soma, minimo, maximo, n)
+                VALUES (:device, :res, :bucket, :v, :v, :v, 1)
+                ON CONFLICT(device, resolucao, bucket) DO UPDATE SET
+                    soma = soma + excluded.soma,
+                    minimo = MIN(minimo, excluded.minimo),
+                    maximo = MAX(maximo, excluded.maximo),
+                    n = n + 1
+                """,
+                [
+                    {
+                        "device": device,
+                        "res": resolucao,
+                        "bucket": inicio_balde(ts, resolucao),
+                        "v": valor,
+                    }
+                    for resolucao in RESOLUCOES_MS[1:]
+                ],
+            )
+        return True
+
+    def _atualizar_rollups(self, device, ts_min, ts_max, primeiro_ts=None):
+        """
+        Recalcula, a partir da base, os baldes de cada resolução que tocam
+        [ts_min, ts_max]. O balde em que a base começa (primeiro_ts) só tem parte
+        das leituras: se ele veio pronto da API (salvar_rollups), fica o do servidor.
+        """
+        # Média ponderada pelas leituras brutas de cada minuto, não pelos minutos
+        for resolucao in RESOLUCOES_MS[1:]:
+            inicio = inicio_balde(ts_min, resolucao)
+            if primeiro_ts is not None and inicio < primeiro_ts:
+                recebido = self._conn.execute(
+                    """
+                    SELECT 1 FROM sincronizacao_rollups
+                    WHERE device = ? AND resolucao = ?
+                      AND primeiro_ts <= ? AND ? < ultimo_ts
+                    """,
+                    (device, resolucao, inicio, inicio),
+                ).fetchone()
+                if recebido:
+                    inicio += resolucao
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO rollups
+                    (device, resolucao, bucket, soma, minimo, maximo, n)
+                SELECT device, :res, ((ts - :off) / :res) * :res + :off,
+                       SUM(value * n), MIN(minimo), MAX(maximo), SUM(n)
+                FROM leituras
+                WHERE device = :device AND ts >= :inicio AND ts < :fim
+                GROUP BY (ts - :off) / :res
+                """,
+                {
+                    "device": device,
+                    "res": resolucao,
+                    "off": OFFSET_FUSO_MS,
+                    "inicio": inicio,
+                    "fim": inicio_balde(ts_max, resolucao) + resolucao,
+                },
+            )
+
+    def get_leituras(self, device, ts_inicio, ts_fim):
+        """
+        Retorna [(ts, média do minuto), ...] ordenado por ts dentro de
+        [ts_inicio, ts_fim].
+        """
+        with self._lock:
+            return self._conn.execute(
+                """
+                SELECT ts, value FROM leituras
+                WHERE device = ? AND ts >= ? AND ts <= ?
+                ORDER BY ts
+                """,
+                (device, int(ts_inicio), int(ts_fim)),
+            ).fetchall()
+
+    def get_leituras_arrays(self, device, ts_inicio, ts_fim):
+        """Mesmo que get_leituras, mas em colunas NumPy: (ts int64, valor float64)."""
+        linhas = self.get_leituras(device, ts_inicio, ts_fim)
+        tabela = np.array(linhas, dtype=[("ts", np.int64), ("value", np.float64)])
+        return tabela["ts"], tabela["value"]
+
+    def get_serie(self, device, ts_inicio, ts_fim, resolucao=RESOLUCAO_BASE_MS):
+        """
+        Série na resolução pedida, em colunas NumPy: (ts, média, mínimo,
+        máximo, contagem de leituras brutas). Na resolução base lê os baldes
+        de 1 min; nas outras, os rollups.
+        """
+        with self._lock:
+            if resolucao == RESOLUCAO_BASE_MS:
+                linhas = self._conn.execute(
+                    """
+                    SELECT ts, value, minimo, maximo, n FROM leituras
+                    WHERE device = ? AND ts >= ? AND ts <= ?
+                    ORDER BY ts
+                    """,
+                    (device, int(ts_inicio), int(ts_fim)),
+                ).fetchall()
+            else:
+                linhas = self._conn.execute(
+                    """
+                    SELECT bucket, soma / n, minimo, maximo, n FROM rollups
+                    WHERE device = ? AND resolucao = ? AND bucket >= ? AND bucket <= ?
+                    ORDER BY bucket
+                    """,
+                    (
+                        device,
+                        resolucao,
+                        inicio_balde(int(ts_inicio), resolucao),
+                        int(ts_fim),
+                    ),
+                ).fetchall()
+        tabela = np.array(
+            linhas,
+            dtype=[
+                ("ts", np.int64),
+                ("media", np.float64),
+                ("minimo", np.float64),
+                ("maximo", np.float64),
+                ("n", np.int64),
+            ],
+        )
+        return (
+            tabela["ts"],
+            tabela["media"],
+            tabela["minimo"],
+            tabela["maximo"],
+            tabela["n"],
+        )
+
+    def get_estado_episodios(self, device):
+        """
+        ((inicio_ts, fim_ts) dos dois últimos episódios, do mais novo para o
+        mais velho; processado_ate ou None) do índice de episódios.
+        """
+        with self._lock:
+            ultimos = self._conn.execute(
+                """
+                SELECT inicio_ts, fim_ts FROM episodios WHERE device = ?
+                ORDER BY inicio_ts DESC LIMIT 2
+                """,
+                (device,),
+            ).fetchall()
+            marca = self._conn.execute(
+                "SELECT processado_ate FROM episodios_processados WHERE device = ?",
+                (device,),
+            ).fetchone()
+        return [tuple(linha) for linha in ultimos], marca[0] if marca else None
+
+    def substituir_episodios(self, device, desde_ts, episodios, processado_ate):
+        """
+        Troca os episódios que terminam depois de desde_ts pelos dados
+        [(inicio_ts, fim_ts, tipo, nivel_inicio, nivel_fim, variacao_pct,
+        taxa_pct_h), ...] e avança a marca de processamento, numa transação.
+        """
+        linhas = [(device, *episodio) for episodio in episodios]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM episodios WHERE device = ? AND fim_ts > ?",
+                (device, int(desde_ts)),
+            )
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO episodios
+                    (device, inicio_ts, fim_ts, tipo, nivel_inicio, nivel_fim,
+                     variacao_pct, taxa_pct_h)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                linhas,
+            )
+            self._conn.execute(
+                """
+                INSERT INTO episodios_processados (device, processado_ate) VALUES (?, ?)
+                ON CONFLICT(device) DO UPDATE SET processado_ate = excluded.processado_ate
+                """,
+                (device, int(processado_ate)),
+            )
+
+    def get_episodios(self, device, ts_inicio, ts_fim, tipo=None, taxa_min=None):
+        """
+        Episódios que começam em [ts_inicio, ts_fim], em ordem, opcionalmente
+        de um tipo e com taxa (em %/h, sempre positiva) de pelo menos taxa_min.
+        """
+        sql = """
+            SELECT inicio_ts, fim_ts, tipo, nivel_inicio, nivel_fim,
+                   variacao_pct, taxa_pct_h
+            FROM episodios
+            WHERE device = ? AND inicio_ts >= ? AND inicio_ts <= ?
+        """
+        params = [device, int(ts_inicio), int(ts_fim)]
+        if tipo is not None:
+            sql += " AND tipo = ?"
+            params.append(tipo)
+        if taxa_min is not None:
+            sql += " AND taxa_pct_h >= ?"
+            params.append(float(taxa_min))
+        with self._lock:
+            return self._conn.execute(sql + " ORDER BY inicio_ts", params).fetchall()
+
+    def get_estados_bombas(self):
+        """{chave: (ligada, confirmado_ts, comando_id)} das bombas já comandadas."""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT chave, ligada, confirmado_ts, comando_id FROM bombas"
+            ).fetchall()
+        return {chave: (bool(ligada), ts, cid) for chave, ligada, ts, cid in linhas}
+
+    def salvar_estado_bomba(self, chave, ligada, confirmado_ts, comando_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO bombas (chave, ligada, confirmado_ts, comando_id)
+                VALUES (?, ?, ?, ?)
+                """,
+                (chave, int(bool(ligada)), int(confirmado_ts), comando_id),
+            )
+
+
+def inicio_balde(ts, resolucao):
+    """Início do balde (alinhado à meia-noite de Brasília) que contém ts."""
+    return ((ts - OFFSET_FUSO_MS) // resolucao) * resolucao + OFFSET_FUSO_MS
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Instância única do store por processo (compartilhada entre os Sensores)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = HistoricoStore()
+        return _store
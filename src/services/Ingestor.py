@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+from src.services.Alertas import get_motor_alertas
+from src.services.AssinaturaWS import AssinaturaTelemetria
+from src.services.Leitura import Leitura
+from src.utils.logger import logger
+from src.utils.metricas import metricas
+
+# Intervalo da coleta em segundo plano (uma por processo, não por sessão)
+INTERVALO_INGESTAO_SEG = int(os.getenv("TELEMETRIA_INTERVALO_INGESTAO", "60"))
+# Recebe as leituras por push no WebSocket; o polling REST vira fallback
+USAR_WEBSOCKET = os.getenv("TELEMETRIA_WEBSOCKET", "1") == "1"
+# Quanto o render espera pela primeira leitura antes de seguir sem ela
+ESPERA_PRIMEIRA_LEITURA_SEG = 2
+
+
+@dataclass(frozen=True)
+class SnapshotTelemetria:
+    """Última leitura publicada pelo Ingestor e o momento (epoch s) da coleta."""
+
+    dados: Leitura
+    coletado_em: float
+
+    def idade_seg(self):
+        return time.time() - self.coletado_em
+
+
+class Ingestor:
+    """
+    Thread única por dispositivo no processo que busca a última leitura e a tendência em
+    intervalo fixo e publica um snapshot. Os fragmentos do dashboard só leem
+    o snapshot, então a carga na API não cresce com o número de sessões.
+
+    Com o WebSocket ativo, cada leitura recebida por push já publica um novo
+    snapshot e o polling REST só roda enquanto a assinatura estiver caída.
+    Cada leitura nova também entra no histórico local, então os rollups
+    acompanham os dados sem esperar a sincronização.
+
+    vagas (semáforo) limita quantos dispositivos chamam a API REST ao mesmo
+    tempo; é o mesmo das consultas em lote de Reservatorios.
+    """
+
+    def __init__(
+        self,
+        client,
+        intervalo_seg=INTERVALO_INGESTAO_SEG,
+        usar_websocket=USAR_WEBSOCKET,
+        vagas=None,
+    ):
+        self._client = client
+        self._vagas = vagas
+        self._intervalo = intervalo_seg
+        self._snapshot = None
+        self._primeira_leitura = threading.Event()
+        self._ultimo_contato = None  # Último sucesso com o servidor (epoch s)
+        self._ultimo_ts_gravado = None  # Última leitura já somada ao histórico
+        self._lock = threading.Lock()
+        self._gravacao_lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+        self._alertas = get_motor_alertas()
+        self._assinatura = None
+        if usar_websocket:
+            self._assinatura = AssinaturaTelemetria(
+                client, ao_receber=self._ao_receber_push, vagas=vagas
+            )
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(
+                    target=self._loop, name="IngestorTelemetria", daemon=True
+                )
+                self._thread.start()
+        if self._assinatura is not None:
+            self._assinatura.iniciar()
+
+    def parar(self):
+        self._parar.set()
+        if self._assinatura is not None:
+            self._assinatura.parar()
+
+    def _loop(self):
+        while not self._parar.is_set():
+            if self._push_ativo():
+                self._ultimo_contato = time.time()  # Conectado = servidor vivo
+            else:
+                self.coletar()
+            # Sem leitura nova o alerta de dados parados só sai por aqui
+            self._alertas.verificar_atraso(self._client._device)
+            self._parar.wait(self._intervalo)
+
+    def _push_ativo(self):
+        """True se o WebSocket está conectado e já publicou um snapshot."""
+        return (
+            self._assinatura is not None
+            and self._assinatura.conectada
+            and self._snapshot is not None
+        )
+
+    def _ao_receber_push(self, ts, valor):
+        """Leitura nova pelo WebSocket: atualiza a tendência em O(1) e publica."""
+        # A assinatura já semeia a tendência ao conectar, então não consulta a API aqui
+        metricas.incrementar("leituras_push_total")
+        dados = self._client.registrar_leitura(ts, valor, semear=False)
+        self._publicar(dados)
+
+    def _publicar(self, dados):
+        # Regras avaliadas a cada leitura, com ou sem navegador aberto
+        self._alertas.avaliar(self._client._device, dados)
+        self._gravar(dados)
+        self._snapshot = SnapshotTelemetria(dados, time.time())
+        self._ultimo_contato = self._snapshot.coletado_em
+        self._primeira_leitura.set()
+
+    def _gravar(self, dados):
+        """Soma a leitura ao histórico uma vez só (o polling repete a última)."""
+        with self._gravacao_lock:
+            ultimo = self._ultimo_ts_gravado
+            if ultimo is not None and dados.ts <= ultimo:
+                return
+            self._ultimo_ts_gravado = dados.ts
+        try:
+            self._client.gravar_no_historico(dados.ts, dados.valor_mA)
+        except Exception as e:
+            logger.error(f"Ingestor: falha ao gravar leitura no histórico: {e}")
+
+    def coletar(self):
+        """Faz uma coleta agora e publica o snapshot (mantém o anterior se falhar)."""
+        metricas.incrementar("coletas_rest_total")
+        try:
+            with self._vagas or nullcontext():
+                dados = self._client.get_dados_instantaneos(usar_cache=False)
+        except Exception as e:
+            logger.error(f"Ingestor: falha na coleta: {e}")
+            dados = None
+
+        if dados:
+            self._publicar(dados)
+        return self._snapshot
+
+    def get_snapshot(self, espera_max_seg=ESPERA_PRIMEIRA_LEITURA_SEG):
+        """
+        Snapshot mais recente, sem chamar a API. Enquanto não houver nenhum,
+        espera no máximo espera_max_seg pela primeira coleta da thread.
+        """
+        if self._snapshot is None:
+            self._primeira_leitura.wait(espera_max_seg)
+        return self._snapshot
+
+    def get_idade_seg(self):
+        """Segundos desde o último contato bem-sucedido com o servidor (None se nunca)."""
+        if self._ultimo_contato is None:
+            return None
+        return time.time() - self._ultimo_contato
+
+
+_ingestores = {}
+_ingestores_lock = threading.Lock()
+
+
+def get_ingestor(client, vagas=None):
+    """Ingestor único por dispositivo no processo; é criado e iniciado na primeira chamada."""
+    with _ingestores_lock:
+        if client._device not in _ingestores:
+            ingestor = Ingestor(client, vagas=vagas)
+            ingestor.iniciar()
+            _ingestores[client._device] = ingestor
+        return _ingestores[client._device]
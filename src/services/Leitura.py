@@ -0,0 +1,100 @@
+import os
+import threading
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+# >>>> Leitura instantânea e histórico recente em memória <<<<
+
+BRAZIL_TZ = pytz.timezone("America/Sao_Paulo")
+# Quantas leituras recentes cada dispositivo guarda (1 por minuto = 1 dia)
+CAPACIDADE_BUFFER = int(os.getenv("TELEMETRIA_BUFFER_LEITURAS", "1440"))
+
+
+@dataclass(frozen=True, slots=True)
+class Leitura:
+    """
+    Uma leitura do sensor já com percentual e tendência. As datas em texto
+    só são formatadas quando alguém pede (a maioria dos renders não usa).
+    """
+
+    usuario: str
+    local: str
+    ts: int  # ms
+    valor_mA: float
+    percentual: float  # 0.0 a 1.0
+    tendencia: str  # Enchendo, Esvaziando, Estavel, Aguardando
+    media: float
+    status_sistema: str = "Normal"
+
+    @property
+    def datahora(self):
+        return datetime.fromtimestamp(self.ts / 1000, BRAZIL_TZ)
+
+    @property
+    def data(self):
+        """AAAAMMDD"""
+        return self.datahora.strftime("%Y%m%d")
+
+    @property
+    def hora(self):
+        """HH:MM:SS"""
+        return self.datahora.strftime("%H:%M:%S")
+
+    @property
+    def data_hora(self):
+        """dd/mm/AAAA HH:MM:SS"""
+        return self.datahora.strftime("%d/%m/%Y %H:%M:%S")
+
+
+class BufferLeituras:
+    """
+    Últimas N leituras de um dispositivo num buffer circular de tamanho fixo
+    (array de ts e de valores): a memória não cresce com o tempo de execução.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_BUFFER):
+        self._capacidade = capacidade
+        self._ts = array("q", [0]) * capacidade
+        self._valores = array("d", [0.0]) * capacidade
+        self._proximo = 0  # Posição onde entra a próxima leitura
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._n
+
+    def adicionar(self, ts, valor):
+        """Inclui uma leitura; repetidas ou fora de ordem são ignoradas."""
+        with self._lock:
+            if self._n and ts <= self._ts[self._proximo - 1]:
+                return False
+            self._ts[self._proximo] = ts
+            self._valores[self._proximo] = valor
+            self._proximo = (self._proximo + 1) % self._capacidade
+            self._n = min(self._n + 1, self._capacidade)
+            return True
+
+    def ultimas(self, n=None):
+        """(ts int64, valor float64) das n leituras mais recentes, da mais antiga à mais nova."""
+        with self._lock:
+            n = self._n if n is None else min(n, self._n)
+            ts = np.frombuffer(self._ts, dtype=np.int64)
+            valores = np.frombuffer(self._valores, dtype=np.float64)
+            idx = (np.arange(self._proximo - n, self._proximo)) % self._capacidade
+            return ts[idx], valores[idx]
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(device):
+    """Buffer único por dispositivo no processo."""
+    with _buffers_lock:
+        if device not in _buffers:
+            _buffers[device] = BufferLeituras()
+        return _buffers[device]
@@ -1,147 +1,512 @@
 import os
-import requests
-import streamlit as st
+import numpy as np
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 import pytz
+from src.services.ClienteHTTP import get_cliente_http
+from src.services.Leitura import Leitura, get_buffer
+from src.services.HistoricoStore import (
+    MEIO_BALDE_BASE_MS,
+    RESOLUCAO_BASE_MS,
+    RESOLUCOES_MS,
+    get_store,
+    inicio_balde,
+)
+from src.services.Tendencia import get_estimador
+from src.utils.cache import CacheLRU
+from src.services.Episodios import atualizar_indice, consultar_episodios
+from src.utils.cache_intervalos import CacheIntervalos
+from src.utils.metricas import metricas
+from src.utils.resiliencia import CircuitBreaker, RevalidadorSWR
+from src.utils.singleflight import SingleFlight
+
+# .env lido uma vez por processo (antes era a cada SensorClient criado)
+load_dotenv()
+
+# Orçamento de pontos por consulta de histórico (o gráfico não mostra mais que isso)
+PONTOS_ALVO = 1500
+# Evita sincronizar o mesmo trecho final a cada render (mesmo papel do antigo ttl=60)
+INTERVALO_MIN_SYNC_MS = 60 * 1000
+
+# Paginação do histórico: máximo de pontos que o servidor devolve por requisição
+LIMITE_PONTOS_API = 1000
+# Janela de cada pedaço quando não há agregação (agg=NONE); pedaços cheios são divididos
+JANELA_BRUTA_MS = 6 * 3600 * 1000
+# Agregações pedidas por balde: média, mínimo, máximo e quantas leituras brutas
+AGREGACOES_BASE = ("AVG", "MIN", "MAX", "COUNT")
+# Consultas em resolução maior que 1 min só baixam a base do fim do intervalo
+# (onde chegam as leituras ao vivo); o resto vem pronto na resolução da consulta
+JANELA_BASE_MS = int(os.getenv("TELEMETRIA_JANELA_BASE_H", "24")) * 3600 * 1000
+# Quantas requisições de histórico podem estar em voo ao mesmo tempo no processo
+# (somando todas as sincronizações e dispositivos)
+MAX_REQUISICOES_EM_VOO = int(os.getenv("TELEMETRIA_MAX_CONCORRENCIA", "4"))
+# Memória para trechos de série já lidos do store (por dispositivo e resolução)
+MAX_BYTES_CACHE_HISTORICO = (
+    int(os.getenv("TELEMETRIA_CACHE_HISTORICO_MB", "64")) * 1024 * 1024
+)
+
+# Quanto tempo o último dado consultado pelas sessões vale (antes era o st.cache_data)
+TTL_ULTIMO_DADO_SEG = 30
+
+# Vagas para requisições de histórico, compartilhadas por todo o processo
+_vagas_historico = threading.BoundedSemaphore(MAX_REQUISICOES_EM_VOO)
+# Requisições idênticas simultâneas (de qualquer sessão) viram uma só
+_singleflight = SingleFlight()
+# Depois de falhas seguidas para de chamar a API por um tempo (uma sonda por vez)
+_breaker = CircuitBreaker("telemetria", limite_falhas=3, espera_seg=30)
+# Atualizações do histórico em segundo plano enquanto o render usa o store
+_revalidador = RevalidadorSWR()
+# Trechos completos da série em memória: mover a janela só lê as bordas novas
+_cache_historico = CacheIntervalos(MAX_BYTES_CACHE_HISTORICO)
+# Último dado por dispositivo, compartilhado pelas sessões (conta entradas, não bytes)
+_cache_ultimo_dado = CacheLRU(1024, tamanho=lambda _: 1)
+
+metricas.registrar_coletor("singleflight", _singleflight.estatisticas)
+metricas.registrar_coletor("cache_historico", _cache_historico.estatisticas)
+metricas.registrar_coletor(
+    "circuito", lambda: {"aberto": int(_breaker.estado != CircuitBreaker.FECHADO)}
+)
+
+
+def escolher_resolucao(ts_inicio, ts_fim, pontos_alvo=PONTOS_ALVO):
+    """Menor resolução da pirâmide (1min/15min/1h/1d) que cabe no orçamento de pontos."""
+    duracao = max(ts_fim - ts_inicio, 0)
+    for resolucao in RESOLUCOES_MS:
+        if duracao / resolucao <= pontos_alvo:
+            return resolucao
+    return RESOLUCOES_MS[-1]
+
+
+def _ia_para_arrays(dados):
+    """Converte o array JSON 'ia' da API direto em colunas (ts int64, valor float64)."""
+    pontos = (dados or {}).get("ia") or []
+    ts = np.fromiter((p["ts"] for p in pontos), dtype=np.int64, count=len(pontos))
+    valores = np.array([p["value"] for p in pontos], dtype=np.float64)
+    return ts, valores
 
 
 class SensorClient:
-    def __init__(self, usuario="Usuario", local="Lavadeira", minutes_to_timestamp=15):
-        load_dotenv()
+    def __init__(
+        self,
+        usuario="Usuario",
+        local="Lavadeira",
+        minutes_to_timestamp=15,
+        device=None,
+        minimo=4.0,
+        maximo=6.8,
+    ):
         self._base_url = os.getenv("BASE_URL")
-        self.__TOKEN__ = None
-        self._MINIMO = 4.0
-        self._MAXIMO = 6.8
+        # Sessão HTTP (pool keep-alive) e token compartilhados por todo o processo
+        self._http = get_cliente_http(self._base_url)
+        self._MINIMO = minimo
+        self._MAXIMO = maximo
         self._MINUTES_TO_TIMESTAMP = minutes_to_timestamp * 60 * 1000
         self._usuario = usuario
         self._local = local
         self._BRAZIL_TZ = pytz.timezone("America/Sao_Paulo")  # Fuso Horário Definido
+        self._device = device or os.getenv("SENSOR_LAVADEIRA")
+        self._store = get_store()
+        # Tendência incremental: uma janela móvel por dispositivo, sem refazer a consulta
+        self._tendencia = get_estimador(self._device, self._MINUTES_TO_TIMESTAMP)
+        # Últimas N leituras em memória fixa (buffer circular por dispositivo)
+        self._recentes = get_buffer(self._device)
 
     def _renovar_token_(self):
-        # Lógica de renovação de token (mantida simplificada aqui)
-        payload = {"username": os.getenv("USUARIO"), "password": os.getenv("PASSWORD")}
-        try:
-            response = requests.post(
-                f"{self._base_url}/api/auth/login", json=payload, timeout=10
-            )
-            if response.status_code == 200:
-                self.__TOKEN__ = f"Bearer {response.json()['token']}"
-            else:
-                raise Exception("FalhaToken")
-        except:
-            raise Exception("ErroConexaoToken")
+        # Força um login novo no gerenciador de token do processo (um só, mesmo
+        # sem token em cache: get_token + invalidar faria dois)
+        self._http.tokens.forcar_renovacao()
 
-    @st.cache_data(ttl=30, show_spinner=False)
-    def _consultar_api_unique_(_self):
-        # Busca último dado
-        url = f"{_self._base_url}/api/plugins/telemetry/DEVICE/{os.getenv('SENSOR_LAVADEIRA')}/values/timeseries"
-        headers = {"Authorization": _self.__TOKEN__}
-        try:
-            response = requests.get(
-                url, headers=headers, params={"useStrictDataTypes": "false"}, timeout=5
-            )
-            if response.status_code == 401:
-                _self._renovar_token_()
-                headers["Authorization"] = _self.__TOKEN__
-                response = requests.get(
-                    url,
-                    headers=headers,
-                    params={"useStrictDataTypes": "false"},
-                    timeout=5,
-                )
-            return response.json()
-        except:
-            return {}
+    def _get_json_(self, chave, url, params, timeout, vagas=None):
+        """
+        GET coalescido: chamadas simultâneas com a mesma chave esperam a que
+        já está em voo e recebem o mesmo JSON. Retorna None em caso de falha.
+        vagas (semáforo) limita quantas requisições desse tipo saem ao mesmo
+        tempo; quem só espera uma requisição coalescida não ocupa vaga.
+        """
 
-    @st.cache_data(ttl=60, show_spinner=False)
-    def _consultar_api_time_series_(_self, ts_inicio, ts_fim):
-        # Busca histórico
-        url = f"{_self._base_url}/api/plugins/telemetry/DEVICE/{os.getenv('SENSOR_LAVADEIRA')}/values/timeseries?keys=ia&startTs={ts_inicio}&endTs={ts_fim}&interval=3600000&limit=1000&agg=AVG"
-        headers = {"Authorization": _self.__TOKEN__}
-        try:
-            response = requests.get(
-                url, headers=headers, params={"useStrictDataTypes": "false"}, timeout=10
-            )
-            if response.status_code == 401:
-                _self._renovar_token_()
-                headers["Authorization"] = _self.__TOKEN__
-                response = requests.get(
-                    url,
-                    headers=headers,
-                    params={"useStrictDataTypes": "false"},
-                    timeout=10,
-                )
-            return response.json()
-        except:
-            return {}
+        def requisitar():
+            # Circuito aberto: nem tenta, quem chama usa o último dado conhecido
+            if not _breaker.permitir():
+                return None
+            try:
+                # 401 e renovação do token ficam a cargo do ClienteHTTP
+                with vagas or nullcontext():
+                    response = self._http.get(url, params=params, timeout=timeout)
+            except:
+                metricas.incrementar("falhas_api_total")
+                _breaker.registrar_falha()
+                return None
+            if response.status_code >= 500:
+                metricas.incrementar("falhas_api_total")
+                _breaker.registrar_falha()
+                return None
+            _breaker.registrar_sucesso()
+            if response.status_code != 200:
+                return None
+            with metricas.medir("json_decode"):
+                return response.json()
 
-    def _analisando_tendencias_(self, ts_ini, ts_fim, valor_atual):
-        try:
-            dados = self._consultar_api_time_series_(ts_ini, ts_fim)
-            if not dados or "ia" not in dados:
-                return 0, "Sem Dados"
+        return _singleflight.executar(chave, requisitar)
 
-            valores = [float(i["value"]) for i in dados["ia"]]
-            if not valores:
-                return 0, "Aguardando"
+    def get_estatisticas_requisicoes(self):
+        """Contadores do single-flight: chamadas, executadas, coalescidas, em_voo."""
+        return _singleflight.estatisticas()
 
-            media = sum(valores) / len(valores)
-            margem = media * 0.003  # 0.3%
+    def get_estatisticas_cache_historico(self):
+        """Contadores do cache de séries: segmentos, bytes, acertos, lacunas_buscadas."""
+        return _cache_historico.estatisticas()
 
-            if valor_atual > (media + margem):
-                status = "Enchendo"
-            elif valor_atual < (media - margem):
-                status = "Esvaziando"
-            else:
-                status = "Estavel"
+    def get_estado_circuito(self):
+        """'fechado', 'aberto' ou 'meio_aberto'."""
+        return _breaker.estado
 
-            return round(media, 2), status
-        except:
-            return 0, "Com Problema"
+    def _requisitar_unico_(self):
+        """Busca o último dado direto na API (sem cache). Retorna None em caso de falha."""
+        url = f"{self._base_url}/api/plugins/telemetry/DEVICE/{self._device}/values/timeseries"
+        params = {"useStrictDataTypes": "false"}
+        return self._get_json_(("latest", self._device), url, params, timeout=5)
 
-    def get_dados_instantaneos(self):
-        """Retorna lista bruta: [user, status, local, data, hora, full_dt, mA, perc, tendencia, media]"""
-        try:
-            dados = self._consultar_api_unique_()
-            if not dados or "ia" not in dados:
-                return None
+    def get_token_jwt(self):
+        """JWT atual sem o prefixo 'Bearer' (faz login se ainda não houver token)."""
+        return self._http.tokens.get_token().removeprefix("Bearer ")
 
-            val_mA = float(dados["ia"][0]["value"])
-            ts = int(dados["ia"][0]["ts"])
+    def _consultar_api_unique_(self, device):
+        # Busca último dado, reaproveitado por TTL_ULTIMO_DADO_SEG entre as sessões
+        dados = _cache_ultimo_dado.get(device)
+        if dados is None:
+            dados = self._requisitar_unico_() or {}
+            _cache_ultimo_dado.put(device, dados, ttl=TTL_ULTIMO_DADO_SEG)
+        return dados
 
-            # Timestamp para Data BR
-            dt_obj = datetime.fromtimestamp(ts / 1000, self._BRAZIL_TZ)
+    def _requisitar_time_series_(
+        self,
+        ts_inicio,
+        ts_fim,
+        intervalo=RESOLUCAO_BASE_MS,
+        agg="AVG",
+        limite=LIMITE_PONTOS_API,
+        ordem="ASC",
+    ):
+        """
+        Busca o histórico direto na API (sem cache). Retorna None em caso de falha.
+        Com mais de limite pontos no intervalo o servidor corta pela ordem: ASC
+        devolve os mais antigos, DESC os mais recentes (do mais novo ao mais velho).
+        """
+        url = f"{self._base_url}/api/plugins/telemetry/DEVICE/{self._device}/values/timeseries"
+        params = {
+            "keys": "ia",
+            "startTs": int(ts_inicio),
+            "endTs": int(ts_fim),
+            "interval": int(intervalo),
+            "limit": int(limite),
+            "agg": agg,
+            "orderBy": ordem,
+            "useStrictDataTypes": "false",
+        }
+        chave = ("timeseries", self._device, params["startTs"], params["endTs"])
+        chave += (params["interval"], agg, params["limit"], ordem)
+        return self._get_json_(chave, url, params, timeout=10, vagas=_vagas_historico)
 
-            # Normalização simples
-            perc = max(
-                0.0, min(1.0, (val_mA - self._MINIMO) / (self._MAXIMO - self._MINIMO))
+    def _dividir_intervalo_(self, ts_inicio, ts_fim, intervalo, agg):
+        """Quebra [ts_inicio, ts_fim) em pedaços que cabem no limite do servidor."""
+        if agg == "NONE":
+            passo = JANELA_BRUTA_MS
+        else:
+            # Com agregação, cada pedaço tem no máximo LIMITE_PONTOS_API baldes
+            passo = intervalo * LIMITE_PONTOS_API
+        return [(a, min(a + passo, ts_fim)) for a in range(ts_inicio, ts_fim, passo)]
+
+    def _buscar_historico_paginado_(
+        self,
+        ts_inicio,
+        ts_fim,
+        intervalo=RESOLUCAO_BASE_MS,
+        agg="AVG",
+        max_em_voo=MAX_REQUISICOES_EM_VOO,
+    ):
+        """
+        Busca [ts_inicio, ts_fim) em pedaços, no máximo max_em_voo em paralelo,
+        e junta tudo em ordem de ts e sem repetidos. O total em voo no processo
+        continua limitado a MAX_REQUISICOES_EM_VOO (_vagas_historico).
+
+        Retorna (ts int64, valor float64) ou None se algum pedaço falhar.
+        """
+        pedacos = self._dividir_intervalo_(ts_inicio, ts_fim, intervalo, agg)
+        if not pedacos:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        def buscar(pedaco):
+            return self._requisitar_time_series_(pedaco[0], pedaco[1], intervalo, agg)
+
+        colunas_ts, colunas_valor = [], []
+        with ThreadPoolExecutor(max_workers=max_em_voo) as pool:
+            while pedacos:
+                proximos = []
+                for (a, b), dados in zip(pedacos, pool.map(buscar, pedacos)):
+                    if dados is None:
+                        return None
+                    ts, valores = _ia_para_arrays(dados)
+                    if agg == "NONE" and len(ts) >= LIMITE_PONTOS_API and b - a > 1:
+                        # Pedaço bruto veio cheio (pode estar truncado): divide ao meio
+                        meio = (a + b) // 2
+                        proximos += [(a, meio), (meio, b)]
+                        continue
+                    colunas_ts.append(ts)
+                    colunas_valor.append(valores)
+                pedacos = proximos
+
+        ts = np.concatenate(colunas_ts) if colunas_ts else np.empty(0, dtype=np.int64)
+        valores = (
+            np.concatenate(colunas_valor)
+            if colunas_valor
+            else np.empty(0, dtype=np.float64)
+        )
+        # Ordena e remove pontos que caíram na borda de dois pedaços
+        ts, idx = np.unique(ts, return_index=True)
+        return ts, valores[idx]
+
+    def _buscar_baldes_(self, ts_inicio, ts_fim, resolucao=RESOLUCAO_BASE_MS):
+        """
+        Baldes de resolucao ms de [ts_inicio, ts_fim) com as quatro agregações
+        de AGREGACOES_BASE (buscadas em paralelo). Retorna [(ts, média, mínimo,
+        máximo, contagem), ...] ou None se alguma busca falhar. Na base o ts é o
+        meio do minuto (como nas leituras ao vivo); nos rollups, o início do balde.
+        """
+        with ThreadPoolExecutor(max_workers=len(AGREGACOES_BASE)) as pool:
+            series = list(
+                pool.map(
+                    lambda agg: self._buscar_historico_paginado_(
+                        ts_inicio, ts_fim, resolucao, agg
+                    ),
+                    AGREGACOES_BASE,
+                )
             )
+        if any(serie is None for serie in series):
+            return None
+
+        ts, media = series[0]
+
+        def alinhar(serie, padrao):
+            # Os baldes das agregações coincidem; se faltar algum, fica o padrão
+            coluna = padrao.copy()
+            _, em_ts, em_serie = np.intersect1d(ts, serie[0], return_indices=True)
+            coluna[em_ts] = serie[1][em_serie]
+            return coluna
+
+        minimo = alinhar(series[1], media)
+        maximo = alinhar(series[2], media)
+        n = alinhar(series[3], np.ones(len(ts))).astype(np.int64)
+        # O servidor carimba o balde no meio do trecho pedido: um balde cortado
+        # por ts_fim sai antes do meio do balde inteiro. Com o ts do balde inteiro
+        # a próxima sincronização sobrescreve o balde em vez de duplicá-lo.
+        ts = inicio_balde(ts, resolucao)
+        if resolucao == RESOLUCAO_BASE_MS:
+            ts = ts + MEIO_BALDE_BASE_MS
+        return list(
+            zip(ts.tolist(), media.tolist(), minimo.tolist(), maximo.tolist(), n.tolist())
+        )
+
+    def sincronizar_rollups(self, ts_inicio, ts_fim, resolucao):
+        """
+        Garante os rollups de resolucao em [ts_inicio, ts_fim) (baldes inteiros)
+        pedindo à API os baldes já agregados, sem baixar a base de 1 min. Serve
+        para trechos antigos de consultas longas: 1 ano em baldes de 1 dia são
+        4 requisições, não as ~2000 da base.
+        """
+        ts_inicio = inicio_balde(ts_inicio, resolucao)
+        intervalo = self._store.get_intervalo_rollups(self._device, resolucao)
+        if intervalo is None:
+            lacunas = [(ts_inicio, ts_fim)]
+        else:
+            lacunas = [(ts_inicio, intervalo[0]), (intervalo[1], ts_fim)]
+
+        for ini, fim in lacunas:
+            if ini >= fim:
+                continue
+            baldes = self._buscar_baldes_(ini, fim, resolucao)
+            if baldes is not None:
+                self._store.salvar_rollups(self._device, resolucao, baldes, ini, fim)
+
+    def _sincronizar_consulta_(self, ts_inicio, ts_fim, resolucao):
+        """
+        Sincroniza o necessário para ler [ts_inicio, ts_fim] em resolucao. Na
+        base, é sincronizar_historico. Nas outras, só a última JANELA_BASE_MS
+        (e o que a base já tiver antes) vem em 1 min; o trecho anterior vem
+        pronto na resolução da consulta (sincronizar_rollups).
+        """
+        if resolucao == RESOLUCAO_BASE_MS:
+            self.sincronizar_historico(ts_inicio, ts_fim)
+            return
+
+        ts_fim = min(ts_fim, int(time.time() * 1000))
+        inicio = inicio_balde(ts_inicio, resolucao)
+        corte = max(inicio, inicio_balde(ts_fim - JANELA_BASE_MS, resolucao))
+        intervalo = self._store.get_intervalo_sincronizado(self._device)
+        if intervalo is not None:
+            # Primeiro balde que a base já cobre inteiro
+            completo = inicio_balde(intervalo[0] - 1, resolucao) + resolucao
+            corte = max(inicio, min(corte, completo))
+
+        self.sincronizar_historico(corte, ts_fim)
+        if inicio < corte:
+            self.sincronizar_rollups(inicio, corte, resolucao)
+
+    def _cobertura_(self, resolucao):
+        """
+        (primeiro_ts, ultimo_ts) do trecho contínuo que o store tem em
+        resolucao: a base mais, nos rollups, o que veio pronto da API logo antes.
+        """
+        intervalo = self._store.get_intervalo_sincronizado(self._device)
+        if resolucao == RESOLUCAO_BASE_MS:
+            return intervalo
+        recebido = self._store.get_intervalo_rollups(self._device, resolucao)
+        if intervalo is None:
+            return recebido
+        # Emendam se o recebido chega ao primeiro balde que a base cobre inteiro
+        completo = inicio_balde(intervalo[0] - 1, resolucao) + resolucao
+        if recebido is not None and recebido[0] < intervalo[0] and recebido[1] >= completo:
+            return recebido[0], intervalo[1]
+        return intervalo
+
+    @metricas.medido("sincronizar_historico")
+    def sincronizar_historico(self, ts_inicio, ts_fim):
+        """
+        Garante que o store local cubra [ts_inicio, ts_fim], pedindo à API
+        apenas as lacunas antes do primeiro e depois do último ts sincronizado.
+        """
+        agora = int(time.time() * 1000)
+        ts_fim = min(ts_fim, agora)  # Não existe dado no futuro
+        if ts_inicio >= ts_fim:
+            return
+
+        intervalo = self._store.get_intervalo_sincronizado(self._device)
+        if intervalo is None:
+            lacunas = [(ts_inicio, ts_fim)]
+        else:
+            primeiro_ts, ultimo_ts = intervalo
+            lacunas = []
+            if ts_inicio < primeiro_ts:
+                lacunas.append((ts_inicio, primeiro_ts))
+            if ts_fim > ultimo_ts and agora - ultimo_ts >= INTERVALO_MIN_SYNC_MS:
+                lacunas.append((ultimo_ts, ts_fim))
+
+        novos = antes_do_inicio = False
+        for ini, fim in lacunas:
+            # A API entrega a resolução base (média, mín, máx e contagem por
+            # minuto); os rollups maiores são montados localmente pelo store.
+            # Alinha ao início do balde: a API agrupa a partir do startTs, então
+            # inícios alinhados geram sempre os mesmos ts. O último balde (parcial)
+            # é buscado de novo e sobrescrito.
+            ini = (ini // RESOLUCAO_BASE_MS) * RESOLUCAO_BASE_MS
+            baldes = self._buscar_baldes_(ini, fim)
+            if baldes is None:
+                continue  # Não marca como sincronizado; tenta de novo no próximo render
+
+            self._store.salvar_leituras(self._device, baldes, ini, fim)
+            novos = True
+            antes_do_inicio |= intervalo is not None and ini < intervalo[0]
 
-            # Simulação de status (para simplificar o código aqui, ou use sua lógica de tendência)
-            media, status = self._analisando_tendencias_(
-                int(ts - self._MINUTES_TO_TIMESTAMP), int(ts), val_mA
+        if novos:
+            # Índice de episódios segue o store: só o trecho novo é segmentado
+            # (dados anteriores ao que já existia refazem o índice inteiro)
+            atualizar_indice(
+                self._store, self._device, self._MINIMO, self._MAXIMO, antes_do_inicio
             )
 
-            return [
-                self._usuario,  # 0
-                "Normal",  # 1
-                self._local,  # 2
-                dt_obj.strftime("%Y%m%d"),  # 3
-                dt_obj.strftime("%H:%M:%S"),  # 4
-                dt_obj.strftime("%d/%m/%Y %H:%M:%S"),  # 5
-                val_mA,  # 6
-                perc,  # 7
-                status,  # 8
-                media,  # 9
-            ]
+    def get_episodios(self, ts_inicio, ts_fim, tipo=None, taxa_min=None):
+        """
+        Episódios de enchimento/esvaziamento que começam em [ts_inicio, ts_fim],
+        lidos do índice (tipo 'enchendo' ou 'esvaziando'; taxa_min em %/h).
+        """
+        return consultar_episodios(
+            self._store, self._device, ts_inicio, ts_fim, tipo, taxa_min
+        )
+
+    def _semear_tendencia_(self, ts):
+        """
+        Carrega numa consulta só as leituras brutas da janela que termina em ts.
+        Retorna o último ponto ({"ts", "value"}) ou None se falhar ou vier vazia.
+        """
+        # DESC: se a janela tiver mais leituras que o limite, ficam as mais
+        # recentes (com ASC a tendência seria a do começo da janela)
+        dados = self._requisitar_time_series_(
+            ts - self._MINUTES_TO_TIMESTAMP, ts, agg="NONE", ordem="DESC"
+        )
+        pontos = ((dados or {}).get("ia") or [])[::-1]
+        for ponto in pontos:
+            ts_ponto, valor = int(ponto["ts"]), float(ponto["value"])
+            self._tendencia.adicionar(ts_ponto, valor)
+            self._recentes.adicionar(ts_ponto, valor)
+        return pontos[-1] if pontos else None
+
+    def registrar_leitura(self, ts, val_mA, semear=True):
+        """
+        Atualiza a tendência com uma leitura (O(1)) e devolve a Leitura de
+        get_dados_instantaneos. Só consulta a janela na API se o estimador
+        ainda estiver vazio e semear=True.
+        """
+        if semear and self._tendencia.vazio:
+            self._semear_tendencia_(ts)
+        self._tendencia.adicionar(ts, val_mA)
+        self._recentes.adicionar(ts, val_mA)
+        media, status = self._tendencia.classificar()
+        return self.montar_leitura(ts, val_mA, media, status)
+
+    def gravar_no_historico(self, ts, val_mA):
+        """
+        Soma uma leitura recebida ao vivo ao histórico local (balde de 1 min e
+        rollups), sem esperar a próxima sincronização. Retorna True se gravou.
+        """
+        return self._store.registrar_leitura(self._device, ts, val_mA)
+
+    def montar_leitura(self, ts, val_mA, media, status):
+        """Monta a Leitura a partir do valor bruto (ts em ms); as datas ficam para depois."""
+        # Normalização simples
+        perc = max(0.0, min(1.0, (val_mA - self._MINIMO) / (self._MAXIMO - self._MINIMO)))
+        return Leitura(self._usuario, self._local, ts, val_mA, perc, status, media)
+
+    def get_leituras_recentes(self, n=None):
+        """(ts, valor_mA) em arrays NumPy das últimas n leituras recebidas."""
+        return self._recentes.ultimas(n)
+
+    @metricas.medido("dados_instantaneos")
+    def get_dados_instantaneos(self, usar_cache=True):
+        """
+        Retorna a Leitura atual (valor, percentual, tendência e média) ou None.
+
+        usar_cache=False vai direto na API (para uso fora do Streamlit, ex: Ingestor)
+        """
+        try:
+            ponto = None
+            if self._tendencia.vazio:
+                # Estimador vazio: a janela da tendência já traz a última leitura,
+                # então uma única requisição devolve valor, média e tendência
+                ponto = self._semear_tendencia_(int(time.time() * 1000))
+
+            if ponto is None:
+                if usar_cache:
+                    dados = self._consultar_api_unique_(self._device)
+                else:
+                    dados = self._requisitar_unico_()
+                if not dados or "ia" not in dados:
+                    return None
+                ponto = dados["ia"][0]
+
+            # Tendência pelo estimador incremental (sem segunda requisição)
+            return self.registrar_leitura(
+                int(ponto["ts"]), float(ponto["value"]), semear=False
+            )
         except:
             return None
 
     def _converter_para_ms_(self, data_str):
         """
-        Função auxiliar para converter string (dd/mm/yyyy [HH:MM])
-        para timestamp em milissegundos.
+        Função auxiliar para converter string (dd/mm/yyyy [HH:MM]), no horário
+        de Brasília, para timestamp em milissegundos.
         """
         if not data_str:
             return None
@@ -153,8 +518,11 @@ class SensorClient:
 
         try:
             # 2. Criação do objeto datetime
-            # Formato esperado: Dia/Mês/Ano Hora:Minuto
-            dt_obj = datetime.strptime(data_str, "%d/%m/%Y %H:%M")
+            # Formato esperado: Dia/Mês/Ano Hora:Minuto, sempre em Brasília
+            # (não depende do fuso do servidor)
+            dt_obj = self._BRAZIL_TZ.localize(
+                datetime.strptime(data_str, "%d/%m/%Y %H:%M")
+            )
 
             # 3. Conversão para timestamp (segundos) e depois para milissegundos
             # int() remove as casas decimais
@@ -165,6 +533,7 @@ class SensorClient:
             print(f"Erro ao converter data '{data_str}': {e}")
             return None
 
+    @metricas.medido("historico_raw")
     def get_historico_raw(self, date_inicio, date_fim):
         """Busca dados brutos para o gráfico
 
@@ -178,27 +547,133 @@ class SensorClient:
 
         timestamp_inicio = self._converter_para_ms_(date_inicio)
         timestamp_fim = self._converter_para_ms_(date_fim)
+        if timestamp_inicio is None or timestamp_fim is None:
+            return []
+
+        # Traz só o que falta da API e lê o intervalo do store local
+        self.sincronizar_historico(timestamp_inicio, timestamp_fim)
+        pontos = self._store.get_leituras(self._device, timestamp_inicio, timestamp_fim)
 
-        dados = self._consultar_api_time_series_(timestamp_inicio, timestamp_fim)
         lista_final = []
-        if dados and "ia" in dados:
-            for p in dados["ia"]:
-                perc = max(
-                    0.0,
-                    min(
-                        1.0,
-                        (float(p["value"]) - self._MINIMO)
-                        / (self._MAXIMO - self._MINIMO),
-                    ),
-                )
-                lista_final.append(
-                    {
-                        "date": datetime.fromtimestamp(
-                            int(p["ts"]) / 1000, self._BRAZIL_TZ
-                        ).strftime("%d/%m/%Y %H:%M:%S"),
-                        "ts": int(p["ts"]),
-                        "value_mA": float(p["value"]),
-                        "value_percent": round(perc, 2),
-                    }
-                )
+        for ts, valor in pontos:
+            perc = max(
+                0.0,
+                min(1.0, (valor - self._MINIMO) / (self._MAXIMO - self._MINIMO)),
+            )
+            lista_final.append(
+                {
+                    "date": datetime.fromtimestamp(
+                        ts / 1000, self._BRAZIL_TZ
+                    ).strftime("%d/%m/%Y %H:%M:%S"),
+                    "ts": ts,
+                    "value_mA": valor,
+                    "value_percent": round(perc, 2),
+                }
+            )
         return lista_final
+
+    def _ler_serie_(self, ts_inicio, ts_fim, resolucao, intervalo):
+        """
+        Mesmo retorno de HistoricoStore.get_serie, mas os baldes completos e já
+        sincronizados vêm do cache em memória; do store só se leem as lacunas.
+
+        Ficam fora do cache os baldes que ainda podem mudar: o que contém o
+        primeiro ts sincronizado (pode ganhar pontos mais antigos) e os a partir
+        do último (ainda recebem leituras).
+        """
+
+        def ler_store(a, b):
+            # Intervalo [a, b) em baldes; get_serie trabalha com fim inclusivo
+            return self._store.get_serie(self._device, a, b - 1, resolucao)
+
+        # Na base o filtro é pelo ts da leitura; nos rollups, pelo balde que o contém
+        if resolucao == RESOLUCAO_BASE_MS:
+            inicio = ts_inicio
+        else:
+            inicio = inicio_balde(ts_inicio, resolucao)
+        fim = ts_fim + 1
+        if intervalo is None:
+            return ler_store(inicio, fim)
+
+        primeiro_ts, ultimo_ts = intervalo
+        cache_inicio = max(inicio, inicio_balde(primeiro_ts - 1, resolucao) + resolucao)
+        cache_fim = min(fim, inicio_balde(ultimo_ts, resolucao))
+        if cache_inicio >= cache_fim:
+            return ler_store(inicio, fim)
+
+        partes = []
+        if inicio < cache_inicio:
+            partes.append(ler_store(inicio, cache_inicio))
+        partes.append(
+            _cache_historico.obter(
+                (self._device, resolucao), cache_inicio, cache_fim, ler_store
+            )
+        )
+        if cache_fim < fim:
+            partes.append(ler_store(cache_fim, fim))
+        return tuple(np.concatenate(coluna) for coluna in zip(*partes))
+
+    @metricas.medido("historico_colunar")
+    def get_historico_colunar(self, ts_inicio, ts_fim, resolucao=None):
+        """
+        Versão colunar de get_historico_raw, sem dict por ponto nem strings de data.
+
+        Parameters:
+        ts_inicio, ts_fim: timestamps em milissegundos
+        resolucao: tamanho do balde em ms; se None é escolhida pela duração
+        do intervalo (ver escolher_resolucao)
+
+        Retorna DataFrame com ts (int64), date (datetime com fuso de Brasília),
+        value_mA (média), value_mA_min, value_mA_max (float64),
+        value_percent, value_percent_min, value_percent_max (0.0 a 1.0) e
+        amostras (leituras brutas por balde). A resolução usada fica em
+        df.attrs, junto com defasagem_seg: quanto o fim do intervalo está além
+        do último dado sincronizado.
+
+        Fora da resolução base, só o fim do intervalo é sincronizado minuto a
+        minuto; o trecho anterior vem da API já na resolução pedida.
+        """
+        if resolucao is None:
+            resolucao = escolher_resolucao(ts_inicio, ts_fim)
+
+        def sincronizar():
+            self._sincronizar_consulta_(ts_inicio, ts_fim, resolucao)
+
+        intervalo = self._cobertura_(resolucao)
+        if intervalo is not None and intervalo[0] <= ts_inicio <= intervalo[1]:
+            # O store já tem o começo do intervalo: mostra o que tem agora e
+            # busca o trecho final em segundo plano (stale-while-revalidate)
+            _revalidador.disparar(("historico", self._device), sincronizar)
+        else:
+            sincronizar()
+            intervalo = self._cobertura_(resolucao)
+
+        ts, media, minimo, maximo, amostras = self._ler_serie_(
+            ts_inicio, ts_fim, resolucao, intervalo
+        )
+
+        import pandas as pd  # Só quem monta DataFrame paga o import
+
+        def percentual(mA):
+            return np.clip((mA - self._MINIMO) / (self._MAXIMO - self._MINIMO), 0.0, 1.0)
+
+        datas = pd.to_datetime(ts, unit="ms", utc=True).tz_convert(self._BRAZIL_TZ)
+
+        df = pd.DataFrame(
+            {
+                "ts": ts,
+                "date": datas,
+                "value_mA": media,
+                "value_mA_min": minimo,
+                "value_mA_max": maximo,
+                "value_percent": percentual(media),
+                "value_percent_min": percentual(minimo),
+                "value_percent_max": percentual(maximo),
+                "amostras": amostras,
+            }
+        )
+        df.attrs["resolucao_ms"] = resolucao
+        if intervalo is not None:
+            fim_esperado = min(ts_fim, int(time.time() * 1000))
+            df.attrs["defasagem_seg"] = max(0, fim_esperado - intervalo[1]) / 1000
+        return df
@@ -0,0 +1,146 @@
+import threading
+from array import array
+
+# >>>> Tendência incremental (janela móvel) <<<<
+
+# Margem para considerar o nível estável (0.3% da média, como antes)
+MARGEM_ESTAVEL = 0.003
+# Fator de suavização da média móvel exponencial
+ALFA_EWMA = 0.2
+
+
+class EstimadorTendencia:
+    """
+    Janela móvel de leituras num buffer circular de tamanho fixo.
+
+    Mantém somas acumuladas (n, Σt, Σy, Σt², Σty) para atualizar média e
+    inclinação por mínimos quadrados em O(1) a cada leitura, além de uma EWMA.
+    O tempo é guardado em minutos a partir de uma origem que é reposicionada
+    quando as somas são recalculadas, para não perder precisão.
+    """
+
+    def __init__(self, janela_ms, capacidade=256, alfa=ALFA_EWMA):
+        self._janela_ms = janela_ms
+        self._capacidade = capacidade
+        self._alfa = alfa
+        self._ts = array("q", [0]) * capacidade
+        self._valores = array("d", [0.0]) * capacidade
+        self._inicio = 0  # Posição da leitura mais antiga
+        self._n = 0
+        self._origem = 0  # ts (ms) que vira t = 0
+        self._somas = [0.0, 0.0, 0.0, 0.0]  # Σt, Σy, Σt², Σty
+        self._desde_recalculo = 0
+        self.ewma = None
+        self.ultimo_ts = None
+        self._lock = threading.Lock()
+
+    @property
+    def vazio(self):
+        return self._n == 0
+
+    def __len__(self):
+        return self._n
+
+    def adicionar(self, ts, valor):
+        """Inclui uma leitura (ts em ms). Repetidas ou fora de ordem são ignoradas."""
+        with self._lock:
+            if self.ultimo_ts is not None and ts <= self.ultimo_ts:
+                return False
+
+            # Remove o que saiu da janela (ou abre espaço se o buffer estiver cheio)
+            while self._n and (
+                self._ts[self._inicio] < ts - self._janela_ms
+                or self._n == self._capacidade
+            ):
+                self._remover_mais_antigo()
+
+            if self._n == 0:
+                self._origem = ts
+                self._somas = [0.0, 0.0, 0.0, 0.0]
+
+            pos = (self._inicio + self._n) % self._capacidade
+            self._ts[pos] = ts
+            self._valores[pos] = valor
+            self._n += 1
+            self._acumular(ts, valor, 1)
+
+            self.ewma = (
+                valor if self.ewma is None else self._alfa * valor + (1 - self._alfa) * self.ewma
+            )
+            self.ultimo_ts = ts
+
+            # De tempos em tempos refaz as somas do zero (custo amortizado O(1))
+            self._desde_recalculo += 1
+            if self._desde_recalculo >= self._capacidade:
+                self._recalcular()
+            return True
+
+    def media(self):
+        return self._somas[1] / self._n if self._n else None
+
+    def inclinacao(self):
+        """Inclinação por mínimos quadrados em mA por minuto (None com menos de 2 pontos)."""
+        n = self._n
+        if n < 2:
+            return None
+        s_t, s_y, s_tt, s_ty = self._somas
+        denominador = n * s_tt - s_t * s_t
+        if denominador <= 0:
+            return 0.0
+        return (n * s_ty - s_t * s_y) / denominador
+
+    def classificar(self):
+        """
+        Retorna (media, status). O status compara a variação projetada na
+        janela (inclinação x duração) com a margem de 0.3% da média.
+        """
+        with self._lock:
+            media = self.media()
+            if media is None:
+                return 0, "Aguardando"
+
+            inclinacao = self.inclinacao()
+            if inclinacao is None:
+                return round(media, 2), "Estavel"
+
+            variacao = inclinacao * (self._janela_ms / 60000)
+            margem = media * MARGEM_ESTAVEL
+            if variacao > margem:
+                status = "Enchendo"
+            elif variacao < -margem:
+                status = "Esvaziando"
+            else:
+                status = "Estavel"
+            return round(media, 2), status
+
+    def _acumular(self, ts, valor, sinal):
+        t = (ts - self._origem) / 60000
+        self._somas[0] += sinal * t
+        self._somas[1] += sinal * valor
+        self._somas[2] += sinal * t * t
+        self._somas[3] += sinal * t * valor
+
+    def _remover_mais_antigo(self):
+        self._acumular(self._ts[self._inicio], self._valores[self._inicio], -1)
+        self._inicio = (self._inicio + 1) % self._capacidade
+        self._n -= 1
+
+    def _recalcular(self):
+        self._desde_recalculo = 0
+        self._origem = self._ts[self._inicio]
+        self._somas = [0.0, 0.0, 0.0, 0.0]
+        for i in range(self._n):
+            pos = (self._inicio + i) % self._capacidade
+            self._acumular(self._ts[pos], self._valores[pos], 1)
+
+
+_estimadores = {}
+_estimadores_lock = threading.Lock()
+
+
+def get_estimador(device, janela_ms):
+    """Estimador único por dispositivo no processo."""
+    with _estimadores_lock:
+        if device not in _estimadores:
+            _estimadores[device] = EstimadorTendencia(janela_ms)
+        return _estimadores[device]
@@ -1,21 +1,44 @@
+import base64
 import streamlit as st
 import datetime
+from functools import cache
 
+from src.services.Alertas import FAIXA_ALERTA_PCT, FAIXA_CRITICA_PCT
 
-def load_css():
-    """Lê o arquivo CSS e injeta no Streamlit."""
+
+# Arquivos estáticos lidos uma vez por processo; cada rerun só reenvia o texto
+@cache
+def _ler_css(caminho="assets/css/style.css"):
     try:
-        with open("assets/css/style.css", encoding="utf-8") as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        with open(caminho, encoding="utf-8") as f:
+            return f.read()
     except FileNotFoundError:
-        pass
+        return None
+
+
+@cache
+def get_img_as_base64(file_path):
+    """Conteúdo do arquivo em base64 (ou None se não der para ler)."""
+    try:
+        with open(file_path, "rb") as f:
+            return base64.b64encode(f.read()).decode()
+    except OSError:
+        return None
+
+
+def load_css():
+    """Lê o arquivo CSS e injeta no Streamlit."""
+    css = _ler_css()
+    if css is not None:
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
 
 def _obter_classes_visuais(nivel_percentual, status_tendencia):
     # Regra de Cores
-    if nivel_percentual < 30:
+    # Mesmas faixas das regras de alerta padrão
+    if nivel_percentual < FAIXA_CRITICA_PCT:
         cls_cor = "nivel-critico"
-    elif 30 <= nivel_percentual < 50:
+    elif nivel_percentual < FAIXA_ALERTA_PCT:
         cls_cor = "nivel-alerta"
     else:
         cls_cor = "nivel-normal"
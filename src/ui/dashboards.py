@@ -1,11 +1,18 @@
-import plotly.express as px
-import plotly.graph_objects as go  # <--- Importante para os marcadores customizados
-import pandas as pd
+import numpy as np
+from dataclasses import dataclass
 from datetime import datetime, time, date
+import time as time_mod
+from typing import TYPE_CHECKING
 import pytz
-from src.controllers.Sensor import Sensor
+from src.services.SensorClient import escolher_resolucao
+from src.utils.cache import CacheLRU
+from src.utils.downsampling import reduzir_pontos
+from src.utils.metricas import metricas
+
+# plotly e pandas são importados só ao montar um gráfico (partida mais rápida)
+if TYPE_CHECKING:
+    import pandas as pd
 
-sensor = Sensor()
 BRAZIL_TZ = pytz.timezone("America/Sao_Paulo")
 
 # --- CONFIGURAÇÕES VISUAIS ---
@@ -20,8 +27,43 @@ CORES_MAPA = {
 # Se sua leitura é a cada 5 min, use 12 para ter 1 marcador por hora.
 DENSIDADE_MARCADORES = 4
 
-
-def get_datetimes(dt_input):
+# CONTROLE DE VOLUME (Downsampling)
+# Máximo de pontos enviados ao navegador por gráfico (None desliga a redução).
+# 'minmax' mantém o mínimo e o máximo de cada balde; 'lttb' preserva o formato.
+PONTOS_MAX_GRAFICO = 1000
+METODO_DOWNSAMPLING = "minmax"
+# Com 'minmax' a redução usa o mínimo e o máximo de cada balde do store, não
+# a média: vales e picos curtos aparecem em qualquer resolução
+COLUNAS_EXTREMOS = ("value_percent_min", "value_percent_max")
+# Intervalos com mais pontos que isso (antes da redução) usam WebGL (Scattergl)
+LIMITE_WEBGL = 1500
+
+# CACHE DE DATASETS E FIGURAS (compartilhado entre sessões)
+# Intervalos que terminam perto de "agora" ainda recebem dados: expiram após o TTL.
+# Intervalos fechados no passado não mudam e só saem do cache por LRU.
+TTL_DADOS_RECENTES_SEG = 60
+# Intervalo fechado montado antes de o store cobrir o fim (a sincronização segue
+# em segundo plano): expira logo, para o próximo render ver o trecho que faltava
+TTL_DADOS_INCOMPLETOS_SEG = 5
+_cache_datasets = CacheLRU(
+    64 * 1024 * 1024, tamanho=lambda ds: int(ds.df.memory_usage(deep=True).sum())
+)
+_cache_figuras = CacheLRU(32 * 1024 * 1024)  # JSON serializado das figuras
+metricas.registrar_coletor("cache_datasets", _cache_datasets.estatisticas)
+metricas.registrar_coletor("cache_figuras", _cache_figuras.estatisticas)
+
+
+@dataclass(frozen=True)
+class DatasetHistorico:
+    """Dados prontos de um intervalo, usados pelos dois gráficos. Não alterar o df."""
+
+    chave: tuple  # (device, ts_inicio, ts_fim, resolucao)
+    df: "pd.DataFrame"
+    ttl: float = None
+
+
+def _normalizar_datetime(dt_input):
+    """Converte str/date/datetime em datetime com fuso de Brasília, truncado no minuto."""
     if isinstance(dt_input, str):
         dt = datetime.strptime(dt_input, "%Y-%m-%d %H:%M:%S")
     elif isinstance(dt_input, date) and not isinstance(dt_input, datetime):
@@ -36,38 +78,82 @@ def get_datetimes(dt_input):
     else:
         dt_aware = dt.astimezone(BRAZIL_TZ)
 
-    return dt_aware.strftime("%d/%m/%Y %H:%M")
+    return dt_aware.replace(second=0, microsecond=0)
+
+
+def get_datetimes(dt_input):
+    return _normalizar_datetime(dt_input).strftime("%d/%m/%Y %H:%M")
 
 
-def create_data(data_inicio, data_final):
-    data_inicio_str = get_datetimes(data_inicio)
-    data_fim_str = get_datetimes(data_final)
+def get_timestamp_ms(dt_input):
+    return int(_normalizar_datetime(dt_input).timestamp() * 1000)
 
-    # Carrega dados brutos
-    df = sensor.get_dados_historicos_1h(data_inicio_str, data_fim_str)
 
-    # --- CORREÇÃO AQUI ---
-    # Seus dados vêm como "13/12/2025" (String).
-    # O dayfirst=True é OBRIGATÓRIO para ele não confundir Dia com Mês.
-    df["date"] = pd.to_datetime(df["date"], dayfirst=True)
+@metricas.medido("create_data")
+def create_data(sensor, data_inicio, data_final, resolucao=None):
+    # Carrega dados em colunas (ts/mA/percentual já vetorizados, sem string de data)
+    df = sensor.get_historico_colunar(
+        get_timestamp_ms(data_inicio), get_timestamp_ms(data_final), resolucao
+    )
 
-    # Se ainda der warning, você pode forçar o formato assim (opcional, mas mais seguro):
-    # df["date"] = pd.to_datetime(df["date"], format="%d/%m/%Y %H:%M:%S")
+    # Horário local de Brasília sem offset, para o Plotly exibir a hora da caixa
+    df["date"] = df["date"].dt.tz_localize(None)
 
-    df["value_percent"] = round(df["value_percent"] * 100, 0)
-    df = df.sort_values(by="date")
+    for coluna in ("value_percent", "value_percent_min", "value_percent_max"):
+        df[coluna] = np.round(df[coluna] * 100, 0)
+    # O store já devolve ordenado por ts, não precisa de sort_values
 
     # 2. Identificador único do dia
     df["dia_formatado"] = df["date"].dt.strftime("%d/%m")
 
     # 3. Identificador da Legenda
-    df["legenda_tipo"] = df["date"].dt.day.apply(
-        lambda x: "Dia Par" if x % 2 == 0 else "Dia Ímpar"
-    )
+    df["legenda_tipo"] = np.where(df["date"].dt.day % 2 == 0, "Dia Par", "Dia Ímpar")
 
     return df
 
 
+def obter_dataset(sensor, data_inicio, data_final):
+    """
+    Monta (uma vez) o dataset do intervalo para o sensor (um dispositivo do
+    cadastro), memoizado por (device, ts_inicio, ts_fim, resolucao).
+    """
+    ts_inicio = get_timestamp_ms(data_inicio)
+    ts_fim = get_timestamp_ms(data_final)
+    resolucao = escolher_resolucao(ts_inicio, ts_fim)
+    chave = (sensor.get_device(), ts_inicio, ts_fim, resolucao)
+
+    dataset = _cache_datasets.get(chave)
+    if dataset is None:
+        df = create_data(sensor, data_inicio, data_final, resolucao)
+        agora_ms = int(time_mod.time() * 1000)
+        if ts_fim > agora_ms - resolucao:
+            ttl = TTL_DADOS_RECENTES_SEG
+        elif df.attrs.get("defasagem_seg", 0) > 0:
+            ttl = TTL_DADOS_INCOMPLETOS_SEG
+        else:
+            ttl = None
+        dataset = DatasetHistorico(chave, df, ttl)
+        _cache_datasets.put(chave, dataset, ttl)
+    return dataset
+
+
+def _figura_em_cache(tipo, dataset, pontos_max, montar):
+    """Devolve a figura do cache (JSON) ou monta com montar(df) e guarda."""
+    chave = (tipo, pontos_max) + dataset.chave
+    fig_json = _cache_figuras.get(chave)
+    if fig_json is not None:
+        import plotly.io as pio
+
+        with metricas.medir("figura_de_json"):
+            return pio.from_json(fig_json)
+
+    fig = montar(dataset.df, pontos_max)
+    with metricas.medir("figura_para_json"):
+        fig_json = fig.to_json()
+    _cache_figuras.put(chave, fig_json, dataset.ttl)
+    return fig
+
+
 # --- FUNÇÃO AUXILIAR DE ESTILO (DRY) ---
 def aplicar_estilo_dark(fig):
     """Aplica o tema escuro premium, cores de texto claras e tooltips."""
@@ -121,31 +207,48 @@ def aplicar_estilo_dark(fig):
     return fig
 
 
-def create_graph_line(data_inicio, data_final):
-    df = create_data(data_inicio, data_final)
+def preencher_buracos(df):
+    """
+    Liga as linhas de dias consecutivos: copia o primeiro ponto de cada dia
+    para o fim do dia anterior (com o dia e a legenda do anterior), para não
+    ficar um buraco entre as cores. Feito de uma vez, sem laço por dia.
+    """
+    import pandas as pd
 
-    # --- LÓGICA DE PREENCHIMENTO DE BURACOS ---
-    novas_linhas = []
-    dias_unicos = df["dia_formatado"].unique()
+    # Primeiro registro de cada dia (df já vem ordenado por data)
+    primeiros = df.drop_duplicates(subset="dia_formatado", keep="first")
+    if len(primeiros) < 2:
+        return df
 
-    for i in range(len(dias_unicos) - 1):
-        dia_atual = dias_unicos[i]
-        dia_seguinte = dias_unicos[i + 1]
+    # Cada dia (a partir do segundo) empresta seu primeiro ponto ao dia anterior
+    pontes = primeiros.iloc[1:].copy()
+    pontes["dia_formatado"] = primeiros["dia_formatado"].to_numpy()[:-1]
+    pontes["legenda_tipo"] = primeiros["legenda_tipo"].to_numpy()[:-1]
 
-        mask_dia_seguinte = df["dia_formatado"] == dia_seguinte
-        if mask_dia_seguinte.any():
-            primeiro_ponto_next = df[mask_dia_seguinte].iloc[0].copy()
-            primeiro_ponto_next["dia_formatado"] = dia_atual
-            dia_atual_num = int(dia_atual.split("/")[0])
-            primeiro_ponto_next["legenda_tipo"] = (
-                "Dia Par" if dia_atual_num % 2 == 0 else "Dia Ímpar"
-            )
-            novas_linhas.append(primeiro_ponto_next)
+    # Sort estável: a ponte fica antes do ponto original de mesma data
+    return pd.concat([pontes, df], ignore_index=True).sort_values(
+        by="date", kind="stable"
+    )
+
+
+def create_graph_line(sensor, data_inicio, data_final, pontos_max=PONTOS_MAX_GRAFICO):
+    dataset = obter_dataset(sensor, data_inicio, data_final)
+    return _figura_em_cache("linha", dataset, pontos_max, _montar_graph_line)
 
-    if novas_linhas:
-        df = pd.concat([df, pd.DataFrame(novas_linhas)], ignore_index=True)
-        df = df.sort_values(by="date")
-    # ------------------------------------------
+
+@metricas.medido("figura_linha")
+def _montar_graph_line(df, pontos_max):
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go  # <--- Importante para os marcadores customizados
+
+    # Decide pelo tamanho original: depois da redução nunca passaria do limite
+    usar_webgl = len(df) > LIMITE_WEBGL
+    df = reduzir_pontos(
+        df, "date", "value_percent", pontos_max, METODO_DOWNSAMPLING, COLUNAS_EXTREMOS
+    )
+
+    df = preencher_buracos(df)
 
     # 1. CRIA A LINHA SUAVE
     fig = px.line(
@@ -156,10 +259,12 @@ def create_graph_line(data_inicio, data_final):
         color="legenda_tipo",
         line_group="dia_formatado",
         color_discrete_map=CORES_MAPA,
+        render_mode="webgl" if usar_webgl else "svg",
     )
 
     fig.update_traces(
-        line_shape="spline",
+        # Scattergl não suporta spline; com muitos pontos a linha reta já fica suave
+        line_shape="linear" if usar_webgl else "spline",
         line_width=5,
         hovertemplate="<b>Data:</b> %{x|%d/%m %H:%M}<br><b>Nível:</b> %{y}%<br><extra></extra>",
     )
@@ -183,8 +288,9 @@ def create_graph_line(data_inicio, data_final):
         df_group = df_markers[df_markers["legenda_tipo"] == tipo_legenda]
 
         if not df_group.empty:
+            marcador = go.Scattergl if usar_webgl else go.Scatter
             fig.add_trace(
-                go.Scatter(
+                marcador(
                     x=df_group["date"],
                     y=df_group["value_percent"],
                     mode="markers",
@@ -201,8 +307,18 @@ def create_graph_line(data_inicio, data_final):
     return aplicar_estilo_dark(fig)
 
 
-def create_graph_bar(data_inicio, data_final):
-    df = create_data(data_inicio, data_final)
+def create_graph_bar(sensor, data_inicio, data_final, pontos_max=PONTOS_MAX_GRAFICO):
+    dataset = obter_dataset(sensor, data_inicio, data_final)
+    return _figura_em_cache("barras", dataset, pontos_max, _montar_graph_bar)
+
+
+@metricas.medido("figura_barras")
+def _montar_graph_bar(df, pontos_max):
+    import plotly.express as px
+
+    df = reduzir_pontos(
+        df, "date", "value_percent", pontos_max, METODO_DOWNSAMPLING, COLUNAS_EXTREMOS
+    )
 
     fig = px.bar(
         df,
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+# >>>> Cache em memória com limite de bytes <<<<
+
+
+class CacheLRU:
+    """
+    Cache LRU thread-safe limitado pelo tamanho total (em bytes) dos valores.
+    Cada entrada pode ter um ttl próprio (em segundos); sem ttl não expira.
+    """
+
+    def __init__(self, max_bytes, tamanho=len):
+        self._max_bytes = max_bytes
+        self._tamanho = tamanho  # Função que estima o tamanho de um valor
+        self._itens = OrderedDict()  # chave -> (valor, bytes, expira_em)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chave):
+        """Retorna o valor ou None (ausente ou expirado)."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or (item[2] is not None and item[2] < time.monotonic()):
+                if item is not None:
+                    self._remover(chave)
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return item[0]
+
+    def put(self, chave, valor, ttl=None):
+        tamanho = self._tamanho(valor)
+        if tamanho > self._max_bytes:
+            return  # Maior que o cache inteiro: não guarda
+        expira_em = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (valor, tamanho, expira_em)
+            self._bytes += tamanho
+            # Despeja os menos usados até caber no limite
+            while self._bytes > self._max_bytes:
+                self._remover(next(iter(self._itens)))
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+            }
+
+    @property
+    def bytes_usados(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._itens)
+
+    def _remover(self, chave):
+        _, tamanho, _ = self._itens.pop(chave)
+        self._bytes -= tamanho
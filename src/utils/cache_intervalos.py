@@ -0,0 +1,141 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# >>>> Cache de séries por intervalo de tempo <<<<
+
+
+class _Segmento:
+    """Trecho contíguo [inicio, fim) de uma série: tupla de colunas, ts primeiro."""
+
+    __slots__ = ("chave", "inicio", "fim", "colunas", "nbytes")
+
+    def __init__(self, chave, inicio, fim, colunas):
+        self.chave = chave
+        self.inicio = inicio
+        self.fim = fim
+        self.colunas = colunas
+        self.nbytes = sum(coluna.nbytes for coluna in colunas)
+
+
+class CacheIntervalos:
+    """
+    Guarda, por chave (ex: dispositivo + resolução), os intervalos de tempo já
+    carregados. Um pedido novo só busca as lacunas ainda não cobertas e as
+    junta aos segmentos vizinhos num único array contíguo.
+
+    O total de bytes é limitado; os segmentos menos usados são descartados.
+    """
+
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._segmentos = {}  # chave -> [_Segmento] ordenados por inicio
+        self._lru = OrderedDict()  # id(segmento) -> segmento
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0  # Pedidos atendidos sem nenhuma busca
+        self.lacunas_buscadas = 0
+
+    def obter(self, chave, inicio, fim, buscar):
+        """
+        Colunas do intervalo [inicio, fim). buscar(a, b) deve devolver a tupla
+        de colunas (ts primeiro) do intervalo [a, b).
+        """
+        if fim <= inicio:
+            return None
+
+        with self._lock:
+            lacunas = self._lacunas(chave, inicio, fim)
+            if not lacunas:
+                self.acertos += 1
+            self.lacunas_buscadas += len(lacunas)
+
+        # Busca fora do lock: outras chaves/threads não ficam esperando a I/O
+        novos = [(a, b, buscar(a, b)) for a, b in lacunas]
+
+        with self._lock:
+            for a, b, colunas in novos:
+                self._inserir(chave, a, b, colunas)
+            segmento = self._segmento_que_cobre(chave, inicio, fim)
+            if segmento is not None:
+                self._lru.move_to_end(id(segmento))
+                return _recortar(segmento.colunas, inicio, fim)
+
+        # Não coube no cache (maior que o limite): devolve direto
+        return buscar(inicio, fim)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "segmentos": len(self._lru),
+                "bytes": self._bytes,
+                "acertos": self.acertos,
+                "lacunas_buscadas": self.lacunas_buscadas,
+            }
+
+    def _lacunas(self, chave, inicio, fim):
+        lacunas = []
+        cursor = inicio
+        for segmento in self._segmentos.get(chave, []):
+            if segmento.fim <= cursor:
+                continue
+            if segmento.inicio >= fim:
+                break
+            if segmento.inicio > cursor:
+                lacunas.append((cursor, segmento.inicio))
+            cursor = max(cursor, segmento.fim)
+        if cursor < fim:
+            lacunas.append((cursor, fim))
+        return lacunas
+
+    def _inserir(self, chave, inicio, fim, colunas):
+        lista = self._segmentos.setdefault(chave, [])
+        # Segmentos que encostam ou se sobrepõem ao novo viram um só
+        vizinhos = [s for s in lista if s.fim >= inicio and s.inicio <= fim]
+        for segmento in vizinhos:
+            self._remover(segmento)
+
+        partes = [s.colunas for s in vizinhos] + [colunas]
+        ts = np.concatenate([p[0] for p in partes])
+        ts, idx = np.unique(ts, return_index=True)  # Ordena e tira repetidos
+        juntas = (ts,) + tuple(
+            np.concatenate([p[i] for p in partes])[idx] for i in range(1, len(colunas))
+        )
+
+        novo = _Segmento(
+            chave,
+            min([inicio] + [s.inicio for s in vizinhos]),
+            max([fim] + [s.fim for s in vizinhos]),
+            juntas,
+        )
+        lista = self._segmentos.setdefault(chave, [])
+        lista.append(novo)
+        lista.sort(key=lambda s: s.inicio)
+        self._lru[id(novo)] = novo
+        self._bytes += novo.nbytes
+
+        while self._bytes > self._max_bytes and self._lru:
+            self._remover(next(iter(self._lru.values())))
+
+    def _remover(self, segmento):
+        if self._lru.pop(id(segmento), None) is None:
+            return
+        self._bytes -= segmento.nbytes
+        lista = self._segmentos[segmento.chave]
+        lista.remove(segmento)
+        if not lista:
+            del self._segmentos[segmento.chave]
+
+    def _segmento_que_cobre(self, chave, inicio, fim):
+        for segmento in self._segmentos.get(chave, []):
+            if segmento.inicio <= inicio and segmento.fim >= fim:
+                return segmento
+        return None
+
+
+def _recortar(colunas, inicio, fim):
+    """Fatia [inicio, fim) das colunas pelo ts (cópia, o segmento pode mudar)."""
+    ts = colunas[0]
+    a, b = np.searchsorted(ts, [inicio, fim], side="left")
+    return tuple(coluna[a:b].copy() for coluna in colunas)
@@ -0,0 +1,123 @@
+import numpy as np
+
+# >>>> Redução de pontos para os gráficos <<<<
+# As funções devolvem os ÍNDICES escolhidos (ordenados), assim quem chama
+# filtra o DataFrame inteiro com .iloc e mantém todas as colunas.
+
+
+def _grade(y, inicios, fins):
+    """
+    Baldes [inicio, fim) de y numa matriz (um por linha), completados com NaN
+    até o maior tamanho: argmin/argmax de todos os baldes de uma vez.
+    """
+    tamanho = int((fins - inicios).max())
+    grade = np.full((len(inicios), tamanho), np.nan)
+    deslocamento = np.arange(tamanho)
+    posicoes = inicios[:, None] + deslocamento[None, :]
+    validos = posicoes < fins[:, None]
+    grade[validos] = y[posicoes[validos]]
+    return grade
+
+
+def extremos_por_balde(y_min, y_max, n_baldes):
+    """
+    Divide a série em n_baldes e devolve (índices do menor y_min, índices do
+    maior y_max), um de cada por balde. Para pontos que já são agregados
+    (média de um balde do store), y_min/y_max são o mínimo e o máximo de cada um.
+    """
+    y_min = np.asarray(y_min, dtype=np.float64)
+    y_max = np.asarray(y_max, dtype=np.float64)
+    limites = np.linspace(0, len(y_min), n_baldes + 1).astype(np.int64)
+    inicios, fins = limites[:-1], limites[1:]
+    return (
+        inicios + np.nanargmin(_grade(y_min, inicios, fins), axis=1),
+        inicios + np.nanargmax(_grade(y_max, inicios, fins), axis=1),
+    )
+
+
+def minmax_por_balde(y, n_pontos):
+    """
+    Divide a série em n_pontos/2 baldes e mantém o mínimo e o máximo de cada um,
+    além do primeiro e do último ponto. Picos e vales nunca são descartados.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    total = len(y)
+    if n_pontos is None or total <= n_pontos or n_pontos < 4:
+        return np.arange(total)
+
+    minimos, maximos = extremos_por_balde(y, y, n_pontos // 2)
+    return np.unique(np.concatenate([minimos, maximos, [0, total - 1]]))
+
+
+def lttb(x, y, n_pontos):
+    """
+    Largest-Triangle-Three-Buckets: escolhe em cada balde o ponto que forma o
+    maior triângulo com o ponto anterior escolhido e a média do próximo balde.
+    O mínimo e o máximo globais são sempre incluídos.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    total = len(y)
+    if n_pontos is None or total <= n_pontos or n_pontos < 3:
+        return np.arange(total)
+
+    # Primeiro e último pontos ficam fixos; o miolo é dividido em n_pontos-2 baldes
+    limites = np.linspace(1, total - 1, n_pontos - 1).astype(np.int64)
+    escolhidos = np.empty(n_pontos, dtype=np.int64)
+    escolhidos[0] = 0
+    escolhidos[-1] = total - 1
+
+    anterior = 0
+    for i in range(n_pontos - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Média do próximo balde (o último usa o ponto final)
+        prox_inicio = fim
+        prox_fim = limites[i + 2] if i + 2 < len(limites) else total
+        media_x = x[prox_inicio:prox_fim].mean()
+        media_y = y[prox_inicio:prox_fim].mean()
+
+        areas = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+
+    return np.unique(np.concatenate([escolhidos, [np.argmin(y), np.argmax(y)]]))
+
+
+def reduzir_pontos(
+    df, coluna_x, coluna_y, n_pontos, metodo="minmax", colunas_extremos=None
+):
+    """
+    Aplica a redução escolhida ('minmax' ou 'lttb') e devolve o DataFrame filtrado.
+
+    colunas_extremos=(coluna_min, coluna_max): com 'minmax', cada balde vira o
+    envelope dos pontos agregados (menor mínimo e maior máximo), com coluna_y
+    trocada por esses valores. Um vale de um minuto dentro de um balde de
+    15 min continua no gráfico, mesmo que a média do balde quase não mude.
+    """
+    if n_pontos is None or len(df) <= n_pontos:
+        return df
+
+    if metodo == "lttb":
+        x = df[coluna_x]
+        # Datas viram números (ns) para o cálculo das áreas
+        x = x.astype("int64") if np.issubdtype(x.dtype, np.datetime64) else x
+        indices = lttb(x.to_numpy(), df[coluna_y].to_numpy(), n_pontos)
+    elif colunas_extremos is not None and n_pontos >= 2:
+        import pandas as pd
+
+        coluna_min, coluna_max = colunas_extremos
+        minimos, maximos = extremos_por_balde(
+            df[coluna_min].to_numpy(), df[coluna_max].to_numpy(), n_pontos // 2
+        )
+        baixos = df.iloc[minimos].copy()
+        baixos[coluna_y] = baixos[coluna_min]
+        altos = df.iloc[maximos].copy()
+        altos[coluna_y] = altos[coluna_max]
+        return pd.concat([baixos, altos]).sort_values(coluna_x, kind="stable")
+    else:
+        indices = minmax_por_balde(df[coluna_y].to_numpy(), n_pontos)
+
+    return df.iloc[indices]
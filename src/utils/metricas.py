@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler
+
+from src.utils.logger import logger
+from src.utils.servidor_local import iniciar_servidor
+
+# >>>> Métricas do pipeline (tempos por etapa e contadores) <<<<
+
+PREFIXO = "telemetria"
+# Porta do endpoint /metrics (formato Prometheus); vazio ou 0 = desligado
+PORTA_METRICAS = int(os.getenv("TELEMETRIA_PORTA_METRICAS", "0") or 0)
+# Etapas mais lentas que isso vão para o log
+LIMITE_LOG_LENTO_SEG = float(os.getenv("TELEMETRIA_LOG_LENTO_SEG", "2"))
+
+
+class _Etapa:
+    __slots__ = ("n", "soma", "maximo")
+
+    def __init__(self):
+        self.n = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+
+class Metricas:
+    """
+    Registro de métricas do processo: contadores, tempos por etapa (contagem,
+    soma e máximo) e coletores, funções que devolvem valores na hora da
+    leitura (ex: hits de um cache que já conta os próprios acessos).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._etapas = {}
+        self._coletores = {}
+
+    def incrementar(self, nome, valor=1):
+        with self._lock:
+            self._contadores[nome] = self._contadores.get(nome, 0) + valor
+
+    def registrar_tempo(self, etapa, segundos):
+        with self._lock:
+            dados = self._etapas.get(etapa)
+            if dados is None:
+                dados = self._etapas[etapa] = _Etapa()
+            dados.n += 1
+            dados.soma += segundos
+            dados.maximo = max(dados.maximo, segundos)
+        if segundos > LIMITE_LOG_LENTO_SEG:
+            logger.warning(f"Etapa lenta: {etapa} levou {segundos:.2f}s")
+
+    def registrar_coletor(self, nome, funcao):
+        """funcao() -> {metrica: valor}; substitui um coletor de mesmo nome."""
+        with self._lock:
+            self._coletores[nome] = funcao
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tempo(etapa, time.perf_counter() - inicio)
+
+    def medido(self, etapa):
+        """Decorador: mede cada chamada da função como a etapa dada."""
+
+        def decorador(funcao):
+            @wraps(funcao)
+            def envolvida(*args, **kwargs):
+                with self.medir(etapa):
+                    return funcao(*args, **kwargs)
+
+            return envolvida
+
+        return decorador
+
+    def resumo(self):
+        """Fotografia atual: {'contadores': {...}, 'etapas': {etapa: {...}}}."""
+        with self._lock:
+            contadores = dict(self._contadores)
+            etapas = {
+                nome: {
+                    "n": d.n,
+                    "soma_seg": d.soma,
+                    "media_seg": d.soma / d.n if d.n else 0.0,
+                    "max_seg": d.maximo,
+                }
+                for nome, d in self._etapas.items()
+            }
+            coletores = list(self._coletores.items())
+
+        for nome, funcao in coletores:
+            try:
+                for metrica, valor in funcao().items():
+                    contadores[f"{nome}_{metrica}"] = valor
+            except Exception as e:
+                logger.error(f"Coletor de métricas '{nome}' falhou: {e}")
+        return {"contadores": contadores, "etapas": etapas}
+
+    def formato_prometheus(self):
+        """Texto no formato de exposição do Prometheus."""
+        resumo = self.resumo()
+        linhas = []
+        for nome, valor in sorted(resumo["contadores"].items()):
+            linhas.append(f"{PREFIXO}_{nome} {float(valor)}")
+
+        etapas = sorted(resumo["etapas"].items())
+        # Cada família de métricas fica agrupada, como o formato exige
+        linhas.append(f"# TYPE {PREFIXO}_etapa_segundos summary")
+        for etapa, dados in etapas:
+            rotulo = f'{{etapa="{etapa}"}}'
+            linhas.append(f"{PREFIXO}_etapa_segundos_count{rotulo} {dados['n']}")
+            linhas.append(f"{PREFIXO}_etapa_segundos_sum{rotulo} {dados['soma_seg']}")
+        linhas.append(f"# TYPE {PREFIXO}_etapa_max_segundos gauge")
+        for etapa, dados in etapas:
+            rotulo = f'{{etapa="{etapa}"}}'
+            linhas.append(f"{PREFIXO}_etapa_max_segundos{rotulo} {dados['max_seg']}")
+        return "\n".join(linhas) + "\n"
+
+
+metricas = Metricas()
+
+
+class _HandlerMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        corpo = metricas.formato_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass  # Sem log a cada scrape
+
+
+def iniciar_servidor_metricas(porta=PORTA_METRICAS, host="127.0.0.1"):
+    """
+    Sobe (uma vez por processo) o endpoint http://host:porta/metrics numa
+    thread. Retorna a porta em uso ou None se estiver desligado.
+    """
+    return iniciar_servidor("metricas", porta, _HandlerMetricas, host)
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from src.utils.logger import logger
+
+# >>>> Proteções para servidor lento ou fora do ar <<<<
+
+
+class CircuitBreaker:
+    """
+    Depois de limite_falhas falhas seguidas, abre o circuito e recusa chamadas
+    por espera_seg segundos. Passado esse tempo deixa passar uma única sonda:
+    se ela der certo o circuito fecha, se falhar volta a abrir.
+    """
+
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(self, nome, limite_falhas=3, espera_seg=30):
+        self.nome = nome
+        self._limite = limite_falhas
+        self._espera = espera_seg
+        self._lock = threading.Lock()
+        self._falhas = 0
+        self._aberto_em = 0.0
+        self._sonda_em_voo = False
+        self.estado = self.FECHADO
+
+    def permitir(self):
+        with self._lock:
+            if self.estado == self.FECHADO:
+                return True
+            if self.estado == self.ABERTO:
+                if time.monotonic() - self._aberto_em < self._espera:
+                    return False
+                self.estado = self.MEIO_ABERTO
+                self._sonda_em_voo = False
+            # Meio aberto: só uma sonda por vez
+            if self._sonda_em_voo:
+                return False
+            self._sonda_em_voo = True
+            return True
+
+    def registrar_sucesso(self):
+        with self._lock:
+            if self.estado != self.FECHADO:
+                logger.info(f"Circuito '{self.nome}' fechado")
+            self.estado = self.FECHADO
+            self._falhas = 0
+            self._sonda_em_voo = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas += 1
+            self._sonda_em_voo = False
+            if self.estado == self.MEIO_ABERTO or self._falhas >= self._limite:
+                if self.estado != self.ABERTO:
+                    logger.warning(
+                        f"Circuito '{self.nome}' aberto após {self._falhas} falhas"
+                    )
+                self.estado = self.ABERTO
+                self._aberto_em = time.monotonic()
+
+
+class RevalidadorSWR:
+    """
+    Stale-while-revalidate: quem chama já tem um valor (mesmo velho) para
+    mostrar e pede a atualização em segundo plano. Atualizações da mesma chave
+    não se acumulam: enquanto uma roda, os novos pedidos são ignorados.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rodando = set()
+
+    def disparar(self, chave, funcao):
+        """Roda funcao() numa thread se ainda não houver uma para a chave."""
+        with self._lock:
+            if chave in self._rodando:
+                return False
+            self._rodando.add(chave)
+
+        def rodar():
+            try:
+                funcao()
+            except Exception as e:
+                logger.error(f"Revalidação de {chave} falhou: {e}")
+            finally:
+                with self._lock:
+                    self._rodando.discard(chave)
+
+        threading.Thread(target=rodar, name=f"SWR-{chave}", daemon=True).start()
+        return True
+
+    def em_andamento(self, chave):
+        with self._lock:
+            return chave in self._rodando
@@ -0,0 +1,33 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+from src.utils.logger import logger
+
+# >>>> Servidores HTTP locais (métricas, exportação) em threads <<<<
+
+_servidores = {}
+_servidores_lock = threading.Lock()
+
+
+def iniciar_servidor(nome, porta, handler, host="127.0.0.1"):
+    """
+    Sobe uma vez por processo (por nome) um ThreadingHTTPServer com o handler
+    numa thread daemon. Retorna a porta em uso, ou None se porta for 0/vazia
+    ou não der para abrir.
+    """
+    with _servidores_lock:
+        if nome not in _servidores:
+            if not porta:
+                return None
+            try:
+                servidor = ThreadingHTTPServer((host, porta), handler)
+            except OSError as e:
+                logger.error(f"Servidor '{nome}' não subiu na porta {porta}: {e}")
+                return None
+            servidor.daemon_threads = True
+            threading.Thread(
+                target=servidor.serve_forever, name=f"HTTP-{nome}", daemon=True
+            ).start()
+            _servidores[nome] = servidor
+            logger.info(f"Servidor '{nome}' em http://{host}:{servidor.server_address[1]}")
+        return _servidores[nome].server_address[1]
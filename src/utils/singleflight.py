@@ -0,0 +1,63 @@
+import threading
+
+# >>>> Coalescência de requisições iguais em voo <<<<
+
+
+class _Chamada:
+    __slots__ = ("evento", "resultado", "erro")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class SingleFlight:
+    """
+    Garante que, para a mesma chave, só uma execução esteja em voo por vez:
+    quem chega enquanto ela roda espera e recebe o mesmo resultado (ou erro).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_voo = {}
+        self.chamadas = 0
+        self.executadas = 0
+        self.coalescidas = 0
+
+    def executar(self, chave, funcao):
+        with self._lock:
+            self.chamadas += 1
+            chamada = self._em_voo.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._em_voo[chave] = _Chamada()
+                self.executadas += 1
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado
+        except Exception as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_voo[chave]
+            chamada.evento.set()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "chamadas": self.chamadas,
+                "executadas": self.executadas,
+                "coalescidas": self.coalescidas,
+                "em_voo": len(self._em_voo),
+            }
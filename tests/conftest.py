@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+# Banco, saída de alertas e credenciais só dos testes; definidos antes de
+# qualquer import de src/ (os caminhos são lidos na importação dos módulos)
+_TMP = Path(tempfile.mkdtemp(prefix="telemetria_testes_"))
+os.environ["TELEMETRIA_DB"] = str(_TMP / "telemetria.db")
+os.environ["TELEMETRIA_ALERTAS_ARQUIVO"] = str(_TMP / "alertas.jsonl")
+os.environ["USUARIO"] = "teste@local"
+os.environ["PASSWORD"] = "teste"
+os.environ["TELEMETRIA_WEBSOCKET"] = "0"
+
+
+def _esperar(condicao, timeout_seg=5.0, passo_seg=0.02):
+    """Espera condicao() ficar verdadeira; devolve o último resultado."""
+    limite = time.monotonic() + timeout_seg
+    resultado = condicao()
+    while not resultado and time.monotonic() < limite:
+        time.sleep(passo_seg)
+        resultado = condicao()
+    return resultado
+
+
+@pytest.fixture
+def esperar():
+    return _esperar
+
+
+@pytest.fixture
+def mock_tb(monkeypatch):
+    """ThingsBoard falso numa thread; BASE_URL aponta para ele."""
+    from tools.mock_thingsboard import iniciar_em_thread
+
+    url, parar = iniciar_em_thread(intervalo_push_seg=0.2)
+    monkeypatch.setenv("BASE_URL", url)
+    yield url
+    parar()
@@ -0,0 +1,179 @@
+import time
+
+from src.services.Alertas import REGRAS_PADRAO, MotorAlertas, _normalizar
+from src.services.Dispositivos import Dispositivo
+from src.services.Ingestor import INTERVALO_INGESTAO_SEG
+from src.services.Leitura import Leitura
+
+MINIMO, MAXIMO = 4.0, 6.8
+T0 = 1704164400000
+MINUTO = 60 * 1000
+
+NIVEL_CRITICO = {
+    "nome": "nivel_critico",
+    "tipo": "limite",
+    "campo": "percentual",
+    "abaixo_de": 30,
+    "histerese": 3,
+    "debounce": 3,
+}
+SEM_DADOS = {"nome": "sem_dados", "tipo": "sem_dados", "max_idade_seg": 600}
+ESVAZIANDO, FORA_DA_FAIXA = (
+    next(r for r in REGRAS_PADRAO if r["nome"] == nome)
+    for nome in ("esvaziando_rapido", "sensor_fora_da_faixa")
+)
+
+
+class _SinkLista:
+    def __init__(self):
+        self.alertas = []
+
+    def enviar(self, alerta):
+        self.alertas.append(alerta)
+
+
+def _motor(*itens):
+    sink = _SinkLista()
+    regras = [regra for item in itens for regra in _normalizar(item)]
+    return MotorAlertas(regras, [sink]), sink
+
+
+def _leitura(ts, pct, mA=None):
+    if mA is None:
+        mA = MINIMO + pct / 100 * (MAXIMO - MINIMO)
+    return Leitura("u", "Lavadeira", ts, mA, pct / 100, "Estavel", mA)
+
+
+def _estados(motor, pcts):
+    """Avalia os níveis, um por minuto; devolve os estados emitidos por leitura."""
+    return [
+        [a.estado for a in motor.avaliar("d", _leitura(T0 + i * MINUTO, pct))]
+        for i, pct in enumerate(pcts)
+    ]
+
+
+def test_debounce_exige_leituras_seguidas():
+    motor, _ = _motor(NIVEL_CRITICO)
+    # Duas abaixo, uma acima (zera a contagem), depois três seguidas
+    estados = _estados(motor, [25, 25, 40, 25, 25, 25, 25])
+    assert estados == [[], [], [], [], [], ["disparado"], []]
+    assert motor.get_ativos() == [("d", "Lavadeira", "nivel_critico", "alerta")]
+
+
+def test_histerese_segura_a_normalizacao():
+    motor, sink = _motor(NIVEL_CRITICO)
+    # Dispara; 31 e 32.9 ainda estão dentro da histerese (limiar + 3)
+    estados = _estados(motor, [20, 20, 20, 31, 32.9, 25, 33.5, 31])
+    assert estados == [[], [], ["disparado"], [], [], [], ["normalizado"], []]
+    assert motor.get_ativos() == []
+    assert sink.alertas[-1].mensagem == (
+        "Lavadeira: nivel_critico normalizado (percentual 33.50)"
+    )
+
+
+def test_leitura_repetida_ou_fora_de_ordem_nao_conta():
+    motor, _ = _motor(NIVEL_CRITICO)
+    motor.avaliar("d", _leitura(T0 + 2 * MINUTO, 20))
+    for ts in (T0 + 2 * MINUTO, T0 + MINUTO, T0):
+        assert motor.avaliar("d", _leitura(ts, 20)) == []
+    assert motor.get_ativos() == []
+
+
+def test_sem_dados_informa_a_idade_da_lacuna():
+    motor, sink = _motor(SEM_DADOS)
+    motor.avaliar("d", _leitura(T0, 60))
+
+    assert motor.verificar_atraso("d", T0 + 5 * MINUTO) == []
+    (disparado,) = motor.verificar_atraso("d", T0 + 11 * MINUTO)
+    assert (disparado.estado, disparado.valor) == ("disparado", 660)
+    # Não repete enquanto continua sem dados
+    assert motor.verificar_atraso("d", T0 + 12 * MINUTO) == []
+
+    (normalizado,) = motor.avaliar("d", _leitura(T0 + 15 * MINUTO, 60))
+    assert (normalizado.estado, normalizado.valor) == ("normalizado", 900)
+    assert normalizado.mensagem == (
+        "Lavadeira: sem_dados normalizado (leitura nova após 15 min sem dados)"
+    )
+    assert [a.estado for a in sink.alertas] == ["disparado", "normalizado"]
+
+
+def test_dispositivo_que_nunca_reportou_tambem_dispara_sem_dados():
+    motor, _ = _motor(SEM_DADOS)
+    motor.registrar_dispositivos([Dispositivo("d", "Lavadeira")], T0)
+
+    assert motor.verificar_atraso("d", T0 + 5 * MINUTO) == []
+    (disparado,) = motor.verificar_atraso("d", T0 + 11 * MINUTO)
+    assert (disparado.estado, disparado.valor) == ("disparado", 660)
+    assert disparado.mensagem == "Lavadeira: sem leitura há 11 min (sem_dados)"
+
+    # A primeira leitura normaliza e conta a lacuna desde o início da vigilância
+    (normalizado,) = motor.avaliar("d", _leitura(T0 + 15 * MINUTO, 60))
+    assert (normalizado.estado, normalizado.valor) == ("normalizado", 900)
+
+
+def test_vigilancia_nao_descarta_leitura_anterior_a_partida():
+    motor, _ = _motor(NIVEL_CRITICO)
+    motor.registrar_dispositivos([Dispositivo("d", "Lavadeira")], T0 + 10 * MINUTO)
+    # Última leitura do dispositivo é de antes de o motor subir: ainda conta
+    estados = _estados(motor, [20, 20, 20])
+    assert estados == [[], [], ["disparado"]]
+
+
+def test_esvaziando_rapido_segue_a_taxa_suavizada():
+    motor, sink = _motor(ESVAZIANDO)
+    # Estável, depois caindo 1.5%/min (-90%/h) por 40 min, depois estável de novo
+    pcts = [80] * 10 + [80 - 1.5 * i for i in range(1, 41)] + [20] * 60
+    estados = _estados(motor, pcts)
+
+    disparos = [i for i, e in enumerate(estados) if e == ["disparado"]]
+    normalizacoes = [i for i, e in enumerate(estados) if e == ["normalizado"]]
+    assert len(disparos) == len(normalizacoes) == 1
+    # Só dispara já na descida, depois do debounce, e normaliza depois que parou
+    assert 10 + ESVAZIANDO["debounce"] <= disparos[0] < 50 <= normalizacoes[0]
+    assert sink.alertas[0].valor < -40 and sink.alertas[1].valor > -30
+
+    # Queda lenta (-18%/h) não dispara
+    lento, _ = _motor(ESVAZIANDO)
+    assert not any(_estados(lento, [80 - 0.3 * i for i in range(120)]))
+
+
+def test_sensor_fora_de_4_a_20_mA():
+    motor, sink = _motor(FORA_DA_FAIXA)
+
+    def estados(correntes, inicio):
+        leituras = [
+            _leitura(T0 + (inicio + i) * MINUTO, 50, mA) for i, mA in enumerate(correntes)
+        ]
+        return [[a.estado for a in motor.avaliar("d", leitura)] for leitura in leituras]
+
+    # Abaixo de 4 mA (sensor desligado/rompido): debounce de 2 leituras
+    assert estados([3.5, 12, 3.5, 3.5, 4.05, 4.2], 0) == [
+        [],
+        [],
+        [],
+        ["disparado"],
+        [],
+        ["normalizado"],
+    ]
+    # Acima de 20 mA (curto): dispara pelo outro lado da faixa
+    assert estados([21, 21, 19.95, 19.8], 10) == [[], ["disparado"], [], ["normalizado"]]
+    assert [a.limiar for a in sink.alertas if a.estado == "disparado"] == [4.0, 20.0]
+    assert all(a.regra == "sensor_fora_da_faixa" for a in sink.alertas)
+
+
+def test_mil_regras_cabem_folgado_no_intervalo_de_coleta():
+    itens = [
+        {"nome": f"limite_{i}", "campo": "percentual", "abaixo_de": i % 30, "debounce": 2}
+        for i in range(1000)
+    ]
+    motor, _ = _motor(*itens)
+    dispositivos = [f"d{i}" for i in range(20)]
+
+    inicio = time.perf_counter()
+    for minuto in range(10):
+        for device in dispositivos:
+            motor.avaliar(device, _leitura(T0 + minuto * MINUTO, 35 - 2 * minuto))
+    por_rodada = (time.perf_counter() - inicio) / 10
+
+    # Uma rodada (20 dispositivos x 1000 regras) em menos de 1% do intervalo
+    assert por_rodada < INTERVALO_INGESTAO_SEG / 100
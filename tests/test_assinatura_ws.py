@@ -0,0 +1,141 @@
+import time
+import uuid
+
+import pytest
+
+import src.services.AssinaturaWS as assinatura_ws
+from src.services.AssinaturaWS import AssinaturaTelemetria
+from src.services.Ingestor import Ingestor
+from src.services.SensorClient import SensorClient
+from src.utils.metricas import metricas
+from tools.mock_thingsboard import iniciar_em_thread
+
+BACKOFF_INICIAL_SEG = 0.1
+BACKOFF_MAXIMO_SEG = 0.4
+
+
+@pytest.fixture
+def backoff_curto(monkeypatch):
+    monkeypatch.setattr(assinatura_ws, "BACKOFF_INICIAL_SEG", BACKOFF_INICIAL_SEG)
+    monkeypatch.setattr(assinatura_ws, "BACKOFF_MAXIMO_SEG", BACKOFF_MAXIMO_SEG)
+
+
+def _client():
+    # Device novo por teste: tendência e buffer são registros do processo
+    return SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+
+
+def _contador(nome):
+    return metricas.resumo()["contadores"].get(nome, 0)
+
+
+def test_semeadura_nao_repassa_pontos_historicos(mock_tb, esperar):
+    client = _client()
+    recebidos = []
+    inicio_ms = int(time.time() * 1000)
+    assinatura = AssinaturaTelemetria(client, lambda ts, v: recebidos.append(ts))
+    assinatura.iniciar()
+    try:
+        assert esperar(lambda: len(recebidos) >= 2)
+        # A janela da tendência veio do REST ao conectar...
+        assert len(client._tendencia) > len(recebidos)
+        # ...mas só as leituras ao vivo chegaram ao callback, sem repetidas
+        assert min(recebidos) >= inicio_ms - 1000
+        assert recebidos == sorted(set(recebidos))
+    finally:
+        assinatura.parar()
+
+
+def test_reconecta_com_backoff_exponencial(monkeypatch, esperar, backoff_curto):
+    url, parar = iniciar_em_thread(intervalo_push_seg=0.2)
+    monkeypatch.setenv("BASE_URL", url)
+    porta = int(url.rsplit(":", 1)[1])
+
+    client = _client()
+    recebidos = []
+    assinatura = AssinaturaTelemetria(client, lambda ts, v: recebidos.append(ts))
+    tentativas = []
+    url_original = assinatura._url
+
+    def url_contando():
+        tentativas.append(time.monotonic())
+        return url_original()
+
+    monkeypatch.setattr(assinatura, "_url", url_contando)
+    assinatura.iniciar()
+    try:
+        assert esperar(lambda: assinatura.conectada and recebidos)
+
+        # Servidor cai: a assinatura percebe e tenta de novo, esperando cada vez mais
+        parar()
+        assert esperar(lambda: not assinatura.conectada)
+        assert esperar(lambda: len(tentativas) >= 5)
+        espacos = [b - a for a, b in zip(tentativas[1:], tentativas[2:])]
+        for i, espaco in enumerate(espacos[:3]):
+            minimo = min(BACKOFF_INICIAL_SEG * 2 ** (i + 1), BACKOFF_MAXIMO_SEG)
+            assert espaco >= minimo * 0.9
+            # Jitter de até metade da espera, nunca além do teto
+            assert espaco <= BACKOFF_MAXIMO_SEG * 1.5 + 0.3
+
+        # Servidor volta na mesma porta: reconecta e as leituras seguem chegando
+        url, parar = iniciar_em_thread(porta=porta, intervalo_push_seg=0.2)
+        antes = len(recebidos)
+        assert esperar(lambda: assinatura.conectada and len(recebidos) > antes + 1)
+    finally:
+        assinatura.parar()
+        parar()
+
+
+def test_polling_rest_enquanto_websocket_cai(mock_tb, esperar, monkeypatch, backoff_curto):
+    client = _client()
+    ingestor = Ingestor(client, intervalo_seg=0.1, usar_websocket=True)
+    # WebSocket inalcançável: o Ingestor tem de seguir pelo REST
+    monkeypatch.setattr(ingestor._assinatura, "_url", lambda: "ws://127.0.0.1:1/ws")
+    coletas_antes = _contador("coletas_rest_total")
+    ingestor.iniciar()
+    try:
+        assert esperar(lambda: ingestor.get_snapshot(espera_max_seg=0) is not None)
+        assert esperar(lambda: _contador("coletas_rest_total") >= coletas_antes + 2)
+        assert not ingestor._assinatura.conectada
+        assert ingestor.get_idade_seg() < 5
+    finally:
+        ingestor.parar()
+
+
+def test_push_ativo_suspende_o_polling(mock_tb, esperar):
+    client = _client()
+    ingestor = Ingestor(client, intervalo_seg=0.1, usar_websocket=True)
+    ingestor.iniciar()
+    try:
+        assert esperar(lambda: ingestor._push_ativo())
+        coletas = _contador("coletas_rest_total")
+        push = _contador("leituras_push_total")
+        time.sleep(0.6)
+        assert _contador("coletas_rest_total") == coletas
+        assert _contador("leituras_push_total") > push
+        # As leituras ao vivo já entraram no histórico local (balde marcado no
+        # meio do minuto, que pode estar à frente do relógio)
+        ate = int(time.time() * 1000) + 60 * 1000
+        assert client._store.get_leituras(client._device, 0, ate)
+    finally:
+        ingestor.parar()
+
+
+def test_semeadura_cortada_pelo_limite_fica_com_as_leituras_mais_recentes(
+    mock_tb, monkeypatch
+):
+    client = _client()
+    original = SensorClient._requisitar_time_series_
+    # Janela de 15 min (15 leituras no mock) com limite de 5 pontos por requisição
+    monkeypatch.setattr(
+        SensorClient,
+        "_requisitar_time_series_",
+        lambda self, *args, **kwargs: original(self, *args, **{**kwargs, "limite": 5}),
+    )
+    agora = int(time.time() * 1000)
+
+    ultimo = client._semear_tendencia_(agora)
+
+    ts, _ = client.get_leituras_recentes()
+    assert len(ts) == 5 and list(ts) == sorted(ts)
+    assert int(ultimo["ts"]) == ts[-1] > agora - 60 * 1000
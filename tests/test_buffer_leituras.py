@@ -0,0 +1,56 @@
+import uuid
+
+import numpy as np
+
+from src.services.Leitura import BufferLeituras, get_buffer
+
+MINUTO = 60 * 1000
+T0 = 1704164400000
+
+
+def _buffer(n, capacidade=5):
+    buffer = BufferLeituras(capacidade)
+    for i in range(n):
+        buffer.adicionar(T0 + i * MINUTO, float(i))
+    return buffer
+
+
+def test_ao_dar_a_volta_guarda_so_as_ultimas_em_ordem():
+    buffer = _buffer(12)
+    ts, valores = buffer.ultimas()
+
+    assert len(buffer) == 5
+    assert valores.tolist() == [7.0, 8.0, 9.0, 10.0, 11.0]
+    assert np.all(np.diff(ts) == MINUTO)
+    assert buffer.ultimas(2)[1].tolist() == [10.0, 11.0]
+    # Pedir mais do que há devolve o que há
+    assert buffer.ultimas(50)[1].tolist() == valores.tolist()
+
+
+def test_buffer_parcial_e_vazio():
+    assert _buffer(3).ultimas()[1].tolist() == [0.0, 1.0, 2.0]
+    ts, valores = BufferLeituras(5).ultimas()
+    assert len(ts) == len(valores) == 0
+
+
+def test_fora_de_ordem_e_ignorada_mesmo_logo_apos_a_volta():
+    # Capacidade cheia: a próxima escrita é na posição 0 e a última na 4
+    buffer = _buffer(5)
+    assert not buffer.adicionar(T0 + 4 * MINUTO, 99.0)
+    assert not buffer.adicionar(T0, 99.0)
+    assert buffer.adicionar(T0 + 5 * MINUTO, 5.0)
+    assert not buffer.adicionar(T0 + 5 * MINUTO, 99.0)
+    assert buffer.ultimas()[1].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_copia_devolvida_nao_muda_com_novas_leituras():
+    buffer = _buffer(5)
+    _, valores = buffer.ultimas()
+    buffer.adicionar(T0 + 5 * MINUTO, 5.0)
+    assert valores.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_um_buffer_por_dispositivo():
+    device = f"dev-{uuid.uuid4().hex[:8]}"
+    assert get_buffer(device) is get_buffer(device)
+    assert get_buffer(device) is not get_buffer(device + "-outro")
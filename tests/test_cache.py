@@ -0,0 +1,42 @@
+import time
+
+from src.utils.cache import CacheLRU
+
+
+def test_despeja_os_menos_usados_ate_caber_em_bytes():
+    cache = CacheLRU(10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    # Ler "a" o torna o mais recente: quem sai para caber "c" é "b"
+    assert cache.get("a") == b"1234"
+    cache.put("c", b"12345")
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (b"1234", None, b"12345")
+    assert cache.bytes_usados == 9 and len(cache) == 2
+
+
+def test_valor_maior_que_o_cache_nao_despeja_nada():
+    cache = CacheLRU(10)
+    cache.put("a", b"123")
+    cache.put("grande", b"x" * 11)
+    assert cache.get("grande") is None
+    assert cache.get("a") == b"123"
+
+
+def test_substituir_chave_recontabiliza_os_bytes():
+    cache = CacheLRU(10)
+    cache.put("a", b"12345678")
+    cache.put("a", b"12")
+    cache.put("b", b"12345678")
+    assert cache.get("a") == b"12" and cache.bytes_usados == 10
+
+
+def test_entrada_expirada_conta_como_miss_e_libera_os_bytes():
+    cache = CacheLRU(100)
+    cache.put("curta", b"1234", ttl=0.05)
+    cache.put("longa", b"1234")
+    time.sleep(0.1)
+
+    assert cache.get("curta") is None
+    assert cache.get("longa") == b"1234"
+    assert cache.estatisticas() == {"hits": 1, "misses": 1, "itens": 1, "bytes": 4}
@@ -0,0 +1,105 @@
+import time
+import uuid
+
+import numpy as np
+
+from src.services.HistoricoStore import RESOLUCOES_MS
+from src.services.SensorClient import SensorClient
+from src.utils.cache_intervalos import CacheIntervalos
+
+PASSO = 10
+
+
+def _serie(a, b):
+    """Colunas (ts, valor) da série de referência em [a, b)."""
+    ts = np.arange(-(-a // PASSO) * PASSO, b, PASSO, dtype=np.int64)
+    return ts, ts * 0.5
+
+
+class _Fonte:
+    def __init__(self):
+        self.pedidos = []
+
+    def __call__(self, a, b):
+        self.pedidos.append((a, b))
+        return _serie(a, b)
+
+
+def _igual(colunas, a, b):
+    esperado = _serie(a, b)
+    return all(np.array_equal(c, e) for c, e in zip(colunas, esperado))
+
+
+def test_pedido_repetido_nao_busca_de_novo():
+    cache, fonte = CacheIntervalos(1 << 20), _Fonte()
+    assert _igual(cache.obter("d", 0, 1000, fonte), 0, 1000)
+    assert _igual(cache.obter("d", 200, 700, fonte), 200, 700)
+    assert fonte.pedidos == [(0, 1000)]
+    assert cache.estatisticas()["acertos"] == 1
+
+
+def test_janela_deslizante_busca_so_as_bordas():
+    cache, fonte = CacheIntervalos(1 << 20), _Fonte()
+    cache.obter("d", 100, 500, fonte)
+    colunas = cache.obter("d", 0, 800, fonte)
+    assert fonte.pedidos == [(100, 500), (0, 100), (500, 800)]
+    assert _igual(colunas, 0, 800)
+    # As partes viraram um segmento só
+    assert cache.estatisticas()["segmentos"] == 1
+
+
+def test_lacuna_entre_segmentos_e_preenchida():
+    cache, fonte = CacheIntervalos(1 << 20), _Fonte()
+    cache.obter("d", 0, 100, fonte)
+    cache.obter("d", 300, 400, fonte)
+    colunas = cache.obter("d", 50, 350, fonte)
+    assert fonte.pedidos[-1] == (100, 300)
+    assert _igual(colunas, 50, 350)
+    assert cache.estatisticas()["segmentos"] == 1
+
+
+def test_chaves_sao_independentes():
+    cache, fonte = CacheIntervalos(1 << 20), _Fonte()
+    cache.obter(("d1", 60), 0, 100, fonte)
+    cache.obter(("d2", 60), 0, 100, fonte)
+    assert len(fonte.pedidos) == 2
+
+
+def test_limite_de_bytes_descarta_o_menos_usado():
+    # Cada segmento de 100 ms tem 10 pontos x 2 colunas x 8 bytes = 160 bytes
+    cache, fonte = CacheIntervalos(400), _Fonte()
+    cache.obter("a", 0, 100, fonte)
+    cache.obter("b", 0, 100, fonte)
+    cache.obter("a", 0, 100, fonte)  # "a" passa a ser o mais recente
+    cache.obter("c", 0, 100, fonte)  # Estoura: sai "b"
+    assert cache.estatisticas()["bytes"] <= 400
+
+    pedidos = len(fonte.pedidos)
+    cache.obter("a", 0, 100, fonte)
+    assert len(fonte.pedidos) == pedidos
+    cache.obter("b", 0, 100, fonte)
+    assert len(fonte.pedidos) == pedidos + 1
+
+
+def test_resultado_e_copia():
+    cache, fonte = CacheIntervalos(1 << 20), _Fonte()
+    ts, valores = cache.obter("d", 0, 100, fonte)
+    valores[:] = -1
+    assert _igual(cache.obter("d", 0, 100, fonte), 0, 100)
+
+
+def test_leitura_pelo_cache_igual_ao_store(mock_tb):
+    client = SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+    agora = int(time.time() * 1000)
+    client.sincronizar_historico(agora - 4 * 86400 * 1000, agora)
+    intervalo = client._store.get_intervalo_sincronizado(client._device)
+
+    # Janelas que se sobrepõem e deslizam, em todas as resoluções
+    for resolucao in RESOLUCOES_MS:
+        for dias_atras, horas in [(3, 30), (2.5, 30), (4, 96), (1, 20)]:
+            inicio = agora - int(dias_atras * 86400 * 1000)
+            fim = inicio + horas * 3600 * 1000
+            pelo_cache = client._ler_serie_(inicio, fim, resolucao, intervalo)
+            direto = client._ler_serie_(inicio, fim, resolucao, None)
+            for a, b in zip(pelo_cache, direto):
+                np.testing.assert_array_equal(a, b)
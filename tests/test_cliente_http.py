@@ -0,0 +1,107 @@
+import json
+import threading
+import uuid
+
+from src.services.ClienteHTTP import ClienteHTTP, GerenciadorToken
+from src.services.SensorClient import SensorClient
+from src.utils.metricas import metricas
+from tools.mock_thingsboard import gerar_token
+
+
+def _logins():
+    return metricas.resumo()["contadores"].get("logins_total", 0)
+
+
+class _Resposta:
+    def __init__(self, status_code, corpo=None):
+        self.status_code = status_code
+        self.content = json.dumps(corpo or {}).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _SessaoFalsa:
+    """Login devolve um JWT novo a cada vez; GET com token revogado leva 401."""
+
+    def __init__(self, validade_seg=3600):
+        self.validade_seg = validade_seg
+        self.logins = 0
+        self.revogados = set()
+        self.tokens_usados = []
+        self._lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None):
+        with self._lock:
+            self.logins += 1
+            # Assinatura diferente a cada login: dois tokens do mesmo segundo diferem
+            token = f"{gerar_token(self.validade_seg)}{self.logins}"
+        return _Resposta(200, {"token": token})
+
+    def request(self, metodo, url, headers=None, **kwargs):
+        token = headers["Authorization"]
+        self.tokens_usados.append(token)
+        return _Resposta(401 if token in self.revogados else 200)
+
+
+def _cliente(sessao):
+    cliente = ClienteHTTP("http://telemetria")
+    cliente.sessao = sessao
+    cliente.tokens = GerenciadorToken(sessao, cliente.base_url)
+    return cliente
+
+
+def test_renovacao_forcada_faz_um_login_so(mock_tb):
+    client = SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+    antes = _logins()
+    # Sem token em cache: um login (não um para obter e outro para invalidar)
+    client._renovar_token_()
+    assert _logins() - antes == 1
+
+    # Com token em cache: também um login só
+    client._renovar_token_()
+    client._http.tokens.get_token()
+    assert _logins() - antes == 2
+
+
+def test_401_renova_o_token_e_repete_a_requisicao():
+    sessao = _SessaoFalsa()
+    cliente = _cliente(sessao)
+    token = cliente.tokens.get_token()
+    sessao.revogados.add(token)
+
+    assert cliente.get("http://telemetria/x").status_code == 200
+    assert sessao.logins == 2
+    assert sessao.tokens_usados[0] == token != sessao.tokens_usados[1]
+
+
+def test_401_simultaneos_geram_um_unico_login():
+    sessao = _SessaoFalsa()
+    cliente = _cliente(sessao)
+    sessao.revogados.add(cliente.tokens.get_token())
+
+    barreira = threading.Barrier(8)
+    status = []
+
+    def requisitar():
+        barreira.wait()
+        status.append(cliente.get("http://telemetria/x").status_code)
+
+    threads = [threading.Thread(target=requisitar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert status == [200] * 8
+    assert sessao.logins == 2  # O inicial e um só pela revogação
+
+
+def test_token_perto_de_expirar_e_renovado_antes_do_uso():
+    # Válido por 30 s: dentro da margem de renovação (60 s)
+    sessao = _SessaoFalsa(validade_seg=30)
+    cliente = _cliente(sessao)
+    primeiro = cliente.tokens.get_token()
+
+    assert cliente.tokens.get_token() != primeiro
+    assert sessao.logins == 2
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import src.services.Comandos as comandos
+from src.services.Comandos import CONFIRMADO, FALHOU, Bomba, FilaComandos
+from src.services.HistoricoStore import HistoricoStore
+
+
+class _Resposta:
+    def __init__(self, status_code, corpo):
+        self.status_code = status_code
+        self.content = corpo.encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _ClienteFalso:
+    """Responde sempre o mesmo (status, corpo) e conta os POSTs."""
+
+    def __init__(self, status_code, corpo):
+        self.resposta = _Resposta(status_code, corpo)
+        self.posts = 0
+
+    def post(self, url, json=None, timeout=None):
+        self.posts += 1
+        return self.resposta
+
+
+def _fila(tmp_path, base_url="http://127.0.0.1:1"):
+    return FilaComandos(
+        bombas=[Bomba("principal", "Bomba Principal", "ctrl")],
+        store=HistoricoStore(tmp_path / "bombas.db"),
+        base_url=base_url,
+        workers=1,
+        tentativas=3,
+        espera_seg=0.01,
+    )
+
+
+def _terminar(fila, esperar, ligar=True):
+    fila.enviar("principal", ligar)
+    assert esperar(lambda: fila.get_estado("principal")[1].terminado)
+    return fila.get_estado("principal")
+
+
+def test_confirmacao_pelo_dispositivo(tmp_path, mock_tb, esperar):
+    fila = _fila(tmp_path, mock_tb)
+    ligada, comando = _terminar(fila, esperar)
+    assert (ligada, comando.estado, comando.tentativas) == (True, CONFIRMADO, 1)
+    # Estado confirmado fica no store para as próximas instâncias
+    assert HistoricoStore(tmp_path / "bombas.db").get_estados_bombas()["principal"][0]
+
+
+@pytest.mark.parametrize("corpo", ["", "{}", '{"bomba": "principal"}', "[true]", "ok"])
+def test_resposta_sem_confirmacao_e_repetida_e_falha(
+    tmp_path, esperar, monkeypatch, corpo
+):
+    cliente = _ClienteFalso(200, corpo)
+    monkeypatch.setattr(comandos, "get_cliente_http", lambda url: cliente)
+    ligada, comando = _terminar(_fila(tmp_path), esperar)
+    assert ligada is None
+    assert (comando.estado, comando.tentativas, cliente.posts) == (FALHOU, 3, 3)
+    assert "não confirmou" in comando.erro
+
+
+@pytest.mark.parametrize("status_code, posts", [(504, 3), (500, 3), (429, 3), (400, 1)])
+def test_so_erros_transitorios_sao_repetidos(
+    tmp_path, esperar, monkeypatch, status_code, posts
+):
+    cliente = _ClienteFalso(status_code, "")
+    monkeypatch.setattr(comandos, "get_cliente_http", lambda url: cliente)
+    _, comando = _terminar(_fila(tmp_path), esperar)
+    assert (comando.estado, cliente.posts) == (FALHOU, posts)
+
+
+def test_dispositivo_que_nao_obedece_falha_sem_repetir(tmp_path, esperar, monkeypatch):
+    cliente = _ClienteFalso(200, '{"ligada": false}')
+    monkeypatch.setattr(comandos, "get_cliente_http", lambda url: cliente)
+    _, comando = _terminar(_fila(tmp_path), esperar)
+    assert (comando.estado, cliente.posts) == (FALHOU, 1)
+    assert comando.erro == "dispositivo manteve a bomba parada"
+
+
+def test_estado_informado_pelo_dispositivo_que_nao_obedece_e_gravado(
+    tmp_path, esperar, monkeypatch
+):
+    cliente = _ClienteFalso(200, '{"ligada": false}')
+    monkeypatch.setattr(comandos, "get_cliente_http", lambda url: cliente)
+    ligada, comando = _terminar(_fila(tmp_path), esperar)
+
+    # O comando falhou, mas a bomba está parada: é o que a tela deve mostrar
+    assert (ligada, comando.estado) == (False, FALHOU)
+    estado = HistoricoStore(tmp_path / "bombas.db").get_estados_bombas()["principal"]
+    assert (estado[0], estado[2]) == (False, comando.id)
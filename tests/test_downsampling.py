@@ -0,0 +1,69 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import src.ui.dashboards as dashboards
+from src.utils.downsampling import minmax_por_balde, reduzir_pontos
+
+QUINZE_MIN = 15 * 60 * 1000
+# 00:00 de Brasília
+T0 = 1704164400000
+
+
+class _SensorFalso:
+    """Devolve 30 dias em baldes de 15 min com nível estável e um vale de 1 min."""
+
+    def __init__(self, vale_em):
+        self.vale_em = vale_em
+
+    def get_historico_colunar(self, ts_inicio, ts_fim, resolucao=None):
+        ts = np.arange(30 * 96, dtype=np.int64) * QUINZE_MIN + T0
+        media = np.full(len(ts), 0.80)
+        minimo, maximo = media - 0.01, media + 0.01
+        # Um minuto a 20%: a média do balde de 15 min quase não sente
+        minimo[self.vale_em] = 0.20
+        media[self.vale_em] = (14 * 0.80 + 0.20) / 15
+        return pd.DataFrame(
+            {
+                "ts": ts,
+                "date": pd.to_datetime(ts, unit="ms", utc=True).tz_convert(
+                    "America/Sao_Paulo"
+                ),
+                "value_percent": media,
+                "value_percent_min": minimo,
+                "value_percent_max": maximo,
+            }
+        )
+
+
+def test_minmax_mantem_extremos_primeiro_e_ultimo():
+    y = np.sin(np.linspace(0, 20, 5000))
+    y[1234] = -5.0
+    indices = minmax_por_balde(y, 100)
+    assert len(indices) <= 102
+    assert {0, 1234, 4999} <= set(indices.tolist())
+
+
+def test_vale_de_um_minuto_sobrevive_a_reducao():
+    df = dashboards.create_data(
+        _SensorFalso(vale_em=1500), date(2024, 1, 2), date(2024, 2, 1)
+    )
+
+    # Pela média o vale some; pelo envelope de mínimos e máximos, não
+    por_media = reduzir_pontos(df, "date", "value_percent", dashboards.PONTOS_MAX_GRAFICO)
+    assert por_media["value_percent"].min() == 76
+    reduzido = reduzir_pontos(
+        df,
+        "date",
+        "value_percent",
+        dashboards.PONTOS_MAX_GRAFICO,
+        colunas_extremos=dashboards.COLUNAS_EXTREMOS,
+    )
+    assert len(reduzido) <= dashboards.PONTOS_MAX_GRAFICO
+    assert reduzido["value_percent"].min() == 20
+    assert reduzido["value_percent"].max() == 81
+    assert reduzido["date"].is_monotonic_increasing
+
+    fig = dashboards._montar_graph_line(df, dashboards.PONTOS_MAX_GRAFICO)
+    assert min(min(trace.y) for trace in fig.data) == 20
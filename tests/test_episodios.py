@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.services.Episodios import atualizar_indice
+from src.services.HistoricoStore import RESOLUCAO_BASE_MS, HistoricoStore
+
+MINIMO, MAXIMO = 4.0, 6.8
+# 00:00 de Brasília, com ts no meio do minuto como os baldes da API
+INICIO = 1704164400000 + RESOLUCAO_BASE_MS // 2
+
+
+def _serie(dias=3, semente=7):
+    """Ciclos de 8 h (enche, para, esvazia, para) com ruído e uma lacuna, em mA."""
+    rng = np.random.default_rng(semente)
+    minutos = np.arange(dias * 24 * 60)
+    fase = minutos % 480
+    nivel = np.select(
+        [fase < 120, fase < 240, fase < 420],
+        [10 + fase * 0.7, 94, 94 - (fase - 240) * 0.45],
+        13,
+    ) + rng.normal(0, 0.4, len(minutos))
+    # Sensor fora do ar por meia hora no segundo dia
+    fora = (minutos >= 1900) & (minutos < 1930)
+    ts = INICIO + minutos[~fora] * RESOLUCAO_BASE_MS
+    mA = MINIMO + np.clip(nivel[~fora], 0, 100) / 100 * (MAXIMO - MINIMO)
+    return ts, mA
+
+
+def _salvar(store, ts, mA):
+    baldes = [(t, v, v, v, 1) for t, v in zip(ts.tolist(), mA.tolist())]
+    store.salvar_leituras("d", baldes, int(ts[0]), int(ts[-1]))
+
+
+def _indice(store):
+    return store.get_episodios("d", 0, 2**62)
+
+
+@pytest.mark.parametrize("tamanhos", [[90], [360, 45, 1000, 7], [1440]])
+def test_indice_incremental_igual_ao_completo(tmp_path, tamanhos):
+    ts, mA = _serie()
+
+    # Chegando aos pedaços, com o índice atualizado depois de cada um
+    incremental = HistoricoStore(tmp_path / "incremental.db")
+    inicio, i = 0, 0
+    while inicio < len(ts):
+        fim = inicio + tamanhos[i % len(tamanhos)]
+        _salvar(incremental, ts[inicio:fim], mA[inicio:fim])
+        atualizar_indice(incremental, "d", MINIMO, MAXIMO)
+        inicio, i = fim, i + 1
+
+    # Tudo de uma vez, segmentado numa passada só
+    completo = HistoricoStore(tmp_path / "completo.db")
+    _salvar(completo, ts, mA)
+    atualizar_indice(completo, "d", MINIMO, MAXIMO, refazer=True)
+
+    assert len(_indice(completo)) >= 8  # A série tem ciclos de verdade
+    assert _indice(incremental) == _indice(completo)
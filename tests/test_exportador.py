@@ -0,0 +1,140 @@
+import io
+import socket
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import requests
+
+import src.services.Exportador as exportador
+from src.services.Exportador import COLUNAS, exportar, gerar_csv, iterar_blocos
+from src.services.HistoricoStore import (
+    MEIO_BALDE_BASE_MS,
+    RESOLUCAO_BASE_MS,
+    HistoricoStore,
+)
+
+MINUTO = RESOLUCAO_BASE_MS
+HORA = 60 * MINUTO
+# 00:00 de Brasília
+T0 = 1704164400000
+
+
+class _ClienteFalso:
+    """Store de verdade; a API devolve 5.0 mA por minuto e anota cada pedido."""
+
+    _local = "Lavadeira"
+    _MINIMO, _MAXIMO = 4.0, 6.8
+
+    def __init__(self, store):
+        self._store = store
+        self._device = f"dev-{uuid.uuid4().hex[:8]}"
+        self.pedidos = []
+
+    def _buscar_historico_paginado_(self, ts_inicio, ts_fim, agg="AVG"):
+        self.pedidos.append((ts_inicio, ts_fim, agg))
+        ts = np.arange(ts_inicio + MEIO_BALDE_BASE_MS, ts_fim, MINUTO, dtype=np.int64)
+        return ts, np.full(len(ts), 5.0)
+
+
+def _cliente(tmp_path, horas_no_store=2):
+    """Cliente com as primeiras horas a partir de T0 já sincronizadas (4.0 mA)."""
+    client = _ClienteFalso(HistoricoStore(tmp_path / "historico.db"))
+    ts = T0 + MEIO_BALDE_BASE_MS + np.arange(horas_no_store * 60) * MINUTO
+    baldes = [(t, 4.0, 4.0, 4.0, 1) for t in ts.tolist()]
+    client._store.salvar_leituras(client._device, baldes, T0, T0 + horas_no_store * HORA)
+    return client
+
+
+def test_blocos_cobertos_saem_do_store_e_o_resto_da_api(tmp_path):
+    client = _cliente(tmp_path)
+    blocos = list(iterar_blocos(client, T0, T0 + 4 * HORA - 1, bloco_ms=HORA))
+
+    assert [len(ts) for ts, _ in blocos] == [60, 60, 60, 60]
+    assert [valores[0] for _, valores in blocos] == [4.0, 4.0, 5.0, 5.0]
+    # Só os dois blocos fora do store foram à API, em médias de 1 min
+    assert client.pedidos == [
+        (T0 + 2 * HORA, T0 + 3 * HORA, "AVG"),
+        (T0 + 3 * HORA, T0 + 4 * HORA, "AVG"),
+    ]
+    ts = np.concatenate([ts for ts, _ in blocos])
+    assert np.all(np.diff(ts) == MINUTO)
+
+
+def test_exportacao_bruta_sempre_vai_a_api(tmp_path):
+    client = _cliente(tmp_path)
+    list(iterar_blocos(client, T0, T0 + 2 * HORA - 1, bruto=True, bloco_ms=HORA))
+    assert [agg for _, _, agg in client.pedidos] == ["NONE", "NONE"]
+
+
+def test_csv_tem_um_cabecalho_e_todas_as_linhas(tmp_path, monkeypatch):
+    monkeypatch.setattr(exportador, "BLOCO_EXPORTACAO_MS", HORA)
+    client = _cliente(tmp_path)
+    conteudo = b"".join(gerar_csv(client, T0, T0 + 3 * HORA - 1))
+
+    df = pd.read_csv(io.BytesIO(conteudo))
+    assert tuple(df.columns) == COLUNAS
+    assert len(df) == 180 and df["ts"].is_monotonic_increasing
+    # Percentual pela calibração do cliente: 4.0 mA do store, 5.0 mA da API
+    assert df["value_percent"].iloc[0] == 0.0
+    assert df["value_percent"].iloc[-1] == round(1 / 2.8, 4)
+
+    # Intervalo sem dados ainda gera um CSV válido (só o cabeçalho)
+    vazio = b"".join(gerar_csv(_ClienteSemDados(tmp_path), T0, T0 + HORA))
+    assert vazio.decode() == ",".join(COLUNAS) + "\n"
+
+
+class _ClienteSemDados(_ClienteFalso):
+    def __init__(self, tmp_path):
+        super().__init__(HistoricoStore(tmp_path / "vazio.db"))
+
+    def _buscar_historico_paginado_(self, ts_inicio, ts_fim, agg="AVG"):
+        return np.array([], dtype=np.int64), np.array([])
+
+
+def test_parquet_tem_um_row_group_por_bloco(tmp_path, monkeypatch):
+    monkeypatch.setattr(exportador, "BLOCO_EXPORTACAO_MS", HORA)
+    client = _cliente(tmp_path)
+    destino = tmp_path / "historico.parquet"
+
+    total = exportar(client, T0, T0 + 4 * HORA - 1, destino, formato="parquet")
+
+    arquivo = pq.ParquetFile(destino)
+    assert total == destino.stat().st_size
+    assert arquivo.num_row_groups == 4
+    assert arquivo.metadata.num_rows == 240
+    assert arquivo.schema_arrow.names == list(COLUNAS)
+    tabela = arquivo.read_row_group(2)
+    assert tabela.column("value_mA").to_pylist() == [5.0] * 60
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_endpoint_so_atende_link_assinado_e_valido(tmp_path, monkeypatch):
+    client = _cliente(tmp_path)
+    exportador.registrar_cliente(client)
+
+    # Sem a URL pública explícita o endpoint fica desligado
+    monkeypatch.setattr(exportador, "URL_EXPORTACAO", "")
+    assert exportador.url_exportacao(client, T0, T0 + HORA) is None
+
+    porta = exportador.iniciar_servidor_exportacao(porta=_porta_livre())
+    monkeypatch.setattr(exportador, "URL_EXPORTACAO", f"http://127.0.0.1:{porta}")
+    url = exportador.url_exportacao(client, T0, T0 + HORA - 1)
+
+    resposta = requests.get(url, timeout=10)
+    assert resposta.status_code == 200
+    assert len(pd.read_csv(io.BytesIO(resposta.content))) == 60
+
+    # Outro intervalo com a mesma assinatura, sem assinatura, ou já expirado
+    adulterado = url.replace(f"fim={T0 + HORA - 1}", f"fim={T0 + 24 * HORA}")
+    sem_assinatura = url.split("&assinatura=")[0]
+    monkeypatch.setattr(exportador, "VALIDADE_LINK_SEG", -1)
+    expirado = exportador.url_exportacao(client, T0, T0 + HORA - 1)
+    for invalido in (adulterado, sem_assinatura, expirado):
+        assert requests.get(invalido, timeout=10).status_code == 403
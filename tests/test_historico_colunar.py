@@ -0,0 +1,55 @@
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from src.services.HistoricoStore import RESOLUCAO_BASE_MS
+from src.services.SensorClient import SensorClient
+
+MINUTO = RESOLUCAO_BASE_MS
+HORA = 60 * MINUTO
+
+
+def _intervalo(client, horas=3):
+    """Últimas horas fechadas, em ms e no texto dd/mm/AAAA HH:MM de get_historico_raw."""
+    fim = (int(time.time() * 1000) // HORA - 1) * HORA
+    inicio = fim - horas * HORA
+
+    def texto(ts):
+        return datetime.fromtimestamp(ts / 1000, client._BRAZIL_TZ).strftime("%d/%m/%Y %H:%M")
+
+    return inicio, fim, texto(inicio), texto(fim)
+
+
+def test_colunar_tem_os_mesmos_pontos_do_caminho_por_dict(mock_tb):
+    client = SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+    inicio, fim, texto_inicio, texto_fim = _intervalo(client)
+
+    pontos = client.get_historico_raw(texto_inicio, texto_fim)
+    df = client.get_historico_colunar(inicio, fim, RESOLUCAO_BASE_MS)
+
+    assert len(df) == len(pontos) == 180
+    assert df["ts"].tolist() == [p["ts"] for p in pontos]
+    assert np.allclose(df["value_mA"], [p["value_mA"] for p in pontos])
+    assert np.allclose(df["value_percent"].round(2), [p["value_percent"] for p in pontos])
+    # Mesma data que o caminho por dict formatava, sem formatar string por ponto
+    assert df["date"].dt.strftime("%d/%m/%Y %H:%M:%S").tolist() == [p["date"] for p in pontos]
+
+
+def test_colunas_tipadas_e_percentual_limitado(mock_tb):
+    client = SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+    # Calibração estreita: parte do sinal do mock fica fora dela
+    client._MINIMO, client._MAXIMO = 5.0, 5.8
+    inicio, fim, _, _ = _intervalo(client, horas=6)
+
+    df = client.get_historico_colunar(inicio, fim, RESOLUCAO_BASE_MS)
+
+    assert df["ts"].dtype == np.int64 and df["value_mA"].dtype == np.float64
+    assert str(df["date"].dt.tz) == "America/Sao_Paulo"
+    assert df.attrs["resolucao_ms"] == RESOLUCAO_BASE_MS
+    for coluna in ("value_percent", "value_percent_min", "value_percent_max"):
+        assert df[coluna].between(0.0, 1.0).all()
+    assert (df["value_percent"] == 0.0).any() and (df["value_percent"] == 1.0).any()
+    assert (df["value_mA_min"] <= df["value_mA"] + 1e-9).all()
+    assert (df["value_mA"] <= df["value_mA_max"] + 1e-9).all()
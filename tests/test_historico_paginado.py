@@ -0,0 +1,95 @@
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from src.services.SensorClient import (
+    JANELA_BRUTA_MS,
+    LIMITE_PONTOS_API,
+    SensorClient,
+)
+
+MINUTO = 60 * 1000
+T0 = 1704164400000
+# Leitura bruta a cada 10 s: um pedaço bruto de 6 h tem 2160 > 1000 pontos
+PASSO_BRUTO_MS = 10 * 1000
+
+
+class _ServidorFalso:
+    """Responde como o ThingsBoard: corta em limit pontos, dos mais antigos (ASC)."""
+
+    def __init__(self, falhar_em=None):
+        self.pedidos = []
+        self.falhar_em = falhar_em
+        self.em_voo = 0
+        self.pico = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, ts_inicio, ts_fim, intervalo, agg, limite=LIMITE_PONTOS_API):
+        with self._lock:
+            self.pedidos.append((ts_inicio, ts_fim, agg))
+            self.em_voo += 1
+            self.pico = max(self.pico, self.em_voo)
+        try:
+            time.sleep(0.02)  # Deixa os pedaços se sobreporem
+            if ts_inicio == self.falhar_em:
+                return None
+            passo = PASSO_BRUTO_MS if agg == "NONE" else intervalo
+            primeiro = -(-ts_inicio // passo) * passo
+            ts = list(range(primeiro, ts_fim, passo))[:limite]
+            return {"ia": [{"ts": t, "value": str(t % 7)} for t in ts]}
+        finally:
+            with self._lock:
+                self.em_voo -= 1
+
+
+def _client(monkeypatch, servidor):
+    monkeypatch.setattr(
+        SensorClient,
+        "_requisitar_time_series_",
+        lambda self, *args, **kwargs: servidor(*args, **kwargs),
+    )
+    return SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+
+
+def test_agregado_em_pedacos_de_mil_baldes_em_paralelo(monkeypatch):
+    servidor = _ServidorFalso()
+    client = _client(monkeypatch, servidor)
+    fim = T0 + 3500 * MINUTO
+
+    ts, valores = client._buscar_historico_paginado_(T0, fim, MINUTO, "AVG", max_em_voo=4)
+
+    assert len(ts) == 3500 and np.all(np.diff(ts) == MINUTO)
+    assert valores.tolist() == (ts % 7).astype(float).tolist()
+    assert sorted(servidor.pedidos) == [
+        (T0 + i * 1000 * MINUTO, min(T0 + (i + 1) * 1000 * MINUTO, fim), "AVG")
+        for i in range(4)
+    ]
+    assert servidor.pico > 1
+
+
+def test_pedaco_bruto_cheio_e_dividido_ate_trazer_tudo(monkeypatch):
+    servidor = _ServidorFalso()
+    client = _client(monkeypatch, servidor)
+    fim = T0 + 2 * JANELA_BRUTA_MS
+
+    ts, _ = client._buscar_historico_paginado_(T0, fim, agg="NONE", max_em_voo=2)
+
+    # Nada truncado nem repetido, em ordem
+    assert len(ts) == 2 * JANELA_BRUTA_MS // PASSO_BRUTO_MS
+    assert np.all(np.diff(ts) == PASSO_BRUTO_MS)
+    # Cada janela de 6 h (2160 pontos) veio cheia e foi pedida de novo em metades
+    # (1080) e quartos (540); só os pedaços que couberam no limite entraram
+    tamanhos = sorted({b - a for a, b, _ in servidor.pedidos}, reverse=True)
+    assert tamanhos == [JANELA_BRUTA_MS, JANELA_BRUTA_MS // 2, JANELA_BRUTA_MS // 4]
+    assert len(servidor.pedidos) == 2 + 4 + 8
+    assert servidor.pico <= 2
+
+
+def test_falha_em_qualquer_pedaco_devolve_none(monkeypatch):
+    client = _client(monkeypatch, _ServidorFalso(falhar_em=T0 + 1000 * MINUTO))
+    assert client._buscar_historico_paginado_(T0, T0 + 3000 * MINUTO) is None
+
+    vazio = client._buscar_historico_paginado_(T0, T0)
+    assert len(vazio[0]) == len(vazio[1]) == 0
@@ -0,0 +1,166 @@
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+from src.services.HistoricoStore import (
+    MEIO_BALDE_BASE_MS,
+    RESOLUCAO_BASE_MS,
+    HistoricoStore,
+    inicio_balde,
+)
+from src.services.SensorClient import SensorClient, _revalidador
+
+MINUTO = RESOLUCAO_BASE_MS
+QUINZE_MIN = 15 * MINUTO
+DIA = 24 * 60 * MINUTO
+# 00:00 de Brasília (03:00 UTC): início de balde em todas as resoluções
+DIA_ALINHADO = 1704164400000
+
+
+def _store(tmp_path):
+    return HistoricoStore(tmp_path / "historico.db")
+
+
+def test_rollup_pondera_pelas_leituras_brutas(tmp_path):
+    store = _store(tmp_path)
+    t0 = DIA_ALINHADO + MEIO_BALDE_BASE_MS
+    # (ts, média, mínimo, máximo, contagem) de dois minutos
+    store.salvar_leituras(
+        "d", [(t0, 4.0, 3.0, 5.0, 3), (t0 + MINUTO, 6.0, 6.0, 6.0, 1)], t0, t0 + MINUTO
+    )
+
+    ts, media, minimo, maximo, n = store.get_serie("d", t0, t0 + MINUTO)
+    assert media.tolist() == [4.0, 6.0]
+    assert minimo.tolist() == [3.0, 6.0]
+    assert maximo.tolist() == [5.0, 6.0]
+    assert n.tolist() == [3, 1]
+
+    ts, media, minimo, maximo, n = store.get_serie("d", t0, t0 + MINUTO, QUINZE_MIN)
+    assert ts.tolist() == [DIA_ALINHADO]
+    # 3 leituras a 4.0 e 1 a 6.0, não a média dos dois minutos (5.0)
+    assert media[0] == 4.5
+    assert (minimo[0], maximo[0], n[0]) == (3.0, 6.0, 4)
+
+
+def test_leitura_ao_vivo_atualiza_base_e_rollups(tmp_path):
+    store = _store(tmp_path)
+    t0 = DIA_ALINHADO + MEIO_BALDE_BASE_MS
+    store.salvar_leituras("d", [(t0, 5.0, 5.0, 5.0, 2)], DIA_ALINHADO, t0)
+
+    # Já coberta pela sincronização: o balde do servidor conta ela
+    assert not store.registrar_leitura("d", t0 - 1000, 9.0)
+    assert store.registrar_leitura("d", t0 + 10_000, 6.5)
+    assert store.registrar_leitura("d", t0 + MINUTO, 4.5)
+
+    ts, media, minimo, maximo, n = store.get_serie("d", DIA_ALINHADO, t0 + MINUTO)
+    assert ts.tolist() == [t0, t0 + MINUTO]
+    assert media.tolist() == [5.5, 4.5]
+    assert minimo.tolist() == [5.0, 4.5]
+    assert maximo.tolist() == [6.5, 4.5]
+    assert n.tolist() == [3, 1]
+
+    ts, media, minimo, maximo, n = store.get_serie("d", DIA_ALINHADO, t0, QUINZE_MIN)
+    assert (media[0], minimo[0], maximo[0], n[0]) == (5.25, 4.5, 6.5, 4)
+
+    # A próxima sincronização traz o minuto inteiro do servidor e o substitui
+    store.salvar_leituras("d", [(t0, 5.2, 4.8, 6.5, 5)], t0, t0 + 20_000)
+    ts, media, minimo, maximo, n = store.get_serie("d", DIA_ALINHADO, t0, QUINZE_MIN)
+    assert n[0] == 6
+
+
+def test_sincronizacao_traz_minimo_maximo_e_contagem(mock_tb):
+    client = SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+    agora = int(time.time() * 1000)
+    client.sincronizar_historico(agora - 6 * 3600 * 1000, agora)
+
+    for resolucao in (MINUTO, QUINZE_MIN):
+        ts, media, minimo, maximo, n = client._store.get_serie(
+            client._device, agora - 5 * 3600 * 1000, agora - 3600 * 1000, resolucao
+        )
+        assert len(ts) > 0
+        assert np.all(minimo <= media + 1e-9) and np.all(media <= maximo + 1e-9)
+        # O mock tem uma leitura por minuto: contagem é de leituras, não de baldes
+        assert n.max() == resolucao // MINUTO
+
+
+def test_minuto_cortado_pelo_fim_da_sincronizacao_nao_duplica(mock_tb):
+    client = SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+    minuto = (int(time.time() * 1000) // MINUTO - 10) * MINUTO
+    # A primeira sincronização termina 20 s dentro do minuto: o servidor manda
+    # esse balde parcial carimbado no meio do trecho, não do minuto
+    client.sincronizar_historico(minuto - 30 * MINUTO, minuto + 20_000)
+    client.sincronizar_historico(minuto - 30 * MINUTO, minuto + 5 * MINUTO)
+
+    ts, _, _, _, n = client._store.get_serie(
+        client._device, minuto - 30 * MINUTO, minuto + 5 * MINUTO
+    )
+    assert np.all(ts % MINUTO == MEIO_BALDE_BASE_MS)
+    assert len(ts) == len(np.unique(ts)) == 35
+    # O rollup conta cada leitura do mock (uma por minuto) uma vez só
+    _, _, _, _, n_rollup = client._store.get_serie(
+        client._device, minuto - 30 * MINUTO, minuto + 5 * MINUTO, QUINZE_MIN
+    )
+    assert n_rollup.sum() == n.sum() == 35
+
+
+@pytest.mark.parametrize("dias", [30, 365])
+def test_consulta_longa_fria_vem_pronta_na_resolucao_exibida(
+    mock_tb, esperar, monkeypatch, dias
+):
+    client = SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+    pedidos = []
+    original = SensorClient._requisitar_time_series_
+
+    def contando(self, *args, **kwargs):
+        pedidos.append(args)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(SensorClient, "_requisitar_time_series_", contando)
+    agora = int(time.time() * 1000)
+
+    df = client.get_historico_colunar(agora - dias * DIA, agora)
+    resolucao = df.attrs["resolucao_ms"]
+    # 4 agregações para o trecho antigo e 4 por pedaço de 1000 min para as
+    # últimas 24 h (até 48 h, cortando no início do balde), em vez de 4 por
+    # 1000 min do intervalo inteiro (~2100 requisições em 1 ano)
+    assert len(pedidos) <= 4 + 4 * 3
+    frios = len(pedidos)
+    assert df["ts"].iloc[0] == inicio_balde(agora - dias * DIA, resolucao)
+    assert np.all(np.diff(df["ts"]) == resolucao)
+    # O mock tem uma leitura por minuto: só o balde atual está incompleto
+    assert np.all(df["amostras"].iloc[:-1] == resolucao // MINUTO)
+
+    # De novo, já no store: nada de API (nem na revalidação em segundo plano)
+    client.get_historico_colunar(agora - dias * DIA, agora)
+    assert esperar(lambda: not _revalidador.em_andamento(("historico", client._device)))
+    assert len(pedidos) == frios
+
+
+def test_rollup_do_servidor_vale_ate_a_base_cobrir_o_balde_inteiro(tmp_path):
+    store = _store(tmp_path)
+    # Dois baldes de 15 min prontos da API
+    store.salvar_rollups(
+        "d",
+        QUINZE_MIN,
+        [(DIA_ALINHADO, 5.0, 4.0, 6.0, 15), (DIA_ALINHADO + QUINZE_MIN, 5.0, 4.0, 6.0, 15)],
+        DIA_ALINHADO,
+        DIA_ALINHADO + 2 * QUINZE_MIN,
+    )
+    # A base começa no meio do primeiro balde: só tem 5 dos 15 minutos dele
+    t0 = DIA_ALINHADO + 10 * MINUTO + MEIO_BALDE_BASE_MS
+    baldes = [(t0 + i * MINUTO, 9.0, 9.0, 9.0, 1) for i in range(20)]
+    store.salvar_leituras("d", baldes, t0 - MEIO_BALDE_BASE_MS, t0 + 20 * MINUTO)
+
+    ts, media, _, _, n = store.get_serie("d", DIA_ALINHADO, t0 + 20 * MINUTO, QUINZE_MIN)
+    assert ts.tolist() == [DIA_ALINHADO, DIA_ALINHADO + QUINZE_MIN]
+    # O primeiro continua o do servidor; o segundo a base cobre inteiro
+    assert (media.tolist(), n.tolist()) == ([5.0, 9.0], [15, 15])
+
+    # Baldes que a base já cobre inteiros não são sobrescritos pela API
+    store.salvar_rollups(
+        "d", QUINZE_MIN, [(DIA_ALINHADO + QUINZE_MIN, 1.0, 1.0, 1.0, 3)], 0, 1
+    )
+    _, media, _, _, _ = store.get_serie("d", DIA_ALINHADO, t0 + 20 * MINUTO, QUINZE_MIN)
+    assert media.tolist() == [5.0, 9.0]
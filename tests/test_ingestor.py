@@ -0,0 +1,90 @@
+import threading
+import time
+import uuid
+
+from src.services.Ingestor import ESPERA_PRIMEIRA_LEITURA_SEG, Ingestor
+from src.services.Leitura import Leitura
+
+T0 = 1704164400000
+
+
+class _ClienteFalso:
+    """Devolve a Leitura de self.ts (ou falha); a primeira pode segurar até liberar."""
+
+    def __init__(self, liberar=None):
+        self._device = f"dev-{uuid.uuid4().hex[:8]}"
+        self.liberar = liberar
+        self.ts = T0
+        self.falhar = False
+        self.coletas = 0
+        self.gravadas = []
+
+    def get_dados_instantaneos(self, usar_cache=True):
+        self.coletas += 1
+        if self.liberar is not None:
+            self.liberar.wait(10)
+        if self.falhar:
+            raise ConnectionError("servidor fora")
+        return Leitura("u", "Lavadeira", self.ts, 5.0, 0.5, "Estavel", 5.0)
+
+    def gravar_no_historico(self, ts, valor):
+        self.gravadas.append(ts)
+
+
+def _ingestor(client):
+    return Ingestor(client, intervalo_seg=60, usar_websocket=False)
+
+
+def test_espera_a_primeira_coleta_e_depois_so_le_o_snapshot():
+    liberar = threading.Event()
+    client = _ClienteFalso(liberar)
+    ingestor = _ingestor(client)
+    ingestor.iniciar()
+    try:
+        threading.Timer(0.3, liberar.set).start()
+        inicio = time.monotonic()
+        snapshot = ingestor.get_snapshot()
+        # Volta assim que a thread publica, sem esgotar a espera máxima
+        assert time.monotonic() - inicio < ESPERA_PRIMEIRA_LEITURA_SEG
+        assert snapshot.dados.ts == T0 and snapshot.idade_seg() < 5
+
+        for _ in range(20):
+            assert ingestor.get_snapshot() is snapshot
+        assert client.coletas == 1
+    finally:
+        ingestor.parar()
+
+
+def test_sem_nenhuma_leitura_desiste_depois_da_espera_maxima():
+    client = _ClienteFalso(threading.Event())  # Nunca responde
+    ingestor = _ingestor(client)
+    ingestor.iniciar()
+    try:
+        inicio = time.monotonic()
+        assert ingestor.get_snapshot() is None
+        assert ESPERA_PRIMEIRA_LEITURA_SEG <= time.monotonic() - inicio < 4
+        # Com espera menor, o render segue mais cedo
+        inicio = time.monotonic()
+        assert ingestor.get_snapshot(espera_max_seg=0.1) is None
+        assert time.monotonic() - inicio < 1
+        assert ingestor.get_idade_seg() is None
+    finally:
+        client.liberar.set()
+        ingestor.parar()
+
+
+def test_falha_mantem_o_snapshot_anterior_e_leitura_repetida_grava_uma_vez():
+    client = _ClienteFalso()
+    ingestor = _ingestor(client)
+    ingestor.coletar()
+    # O polling repete a última leitura enquanto não chega outra
+    anterior = ingestor.coletar()
+    assert anterior.dados.ts == T0
+    assert client.gravadas == [T0]
+
+    client.falhar = True
+    assert ingestor.coletar() is anterior
+
+    client.falhar, client.ts = False, T0 + 60000
+    assert ingestor.coletar().dados.ts == T0 + 60000
+    assert client.gravadas == [T0, T0 + 60000]
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Roda num processo novo: no pytest outros testes já importaram tudo
+SCRIPT = """
+import sys, threading
+import src.ui.dashboards
+from src.controllers.Reservatorios import Reservatorios
+
+pesados = [m for m in ("plotly", "streamlit", "pandas", "pyarrow") if m in sys.modules]
+antes = threading.active_count()
+reservatorios = Reservatorios()
+print(pesados, threading.active_count() - antes)
+"""
+
+
+def test_importar_e_criar_sensores_nao_carrega_ui_nem_sobe_threads():
+    saida = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        check=True,
+        timeout=60,
+    ).stdout
+    # exportar/episodios/status do main.py só pagam pelo que usam
+    assert saida.strip() == "[] 0"
@@ -0,0 +1,49 @@
+import socket
+
+import requests
+
+from src.utils.metricas import Metricas, iniciar_servidor_metricas, metricas
+
+
+def test_texto_prometheus_agrupa_cada_familia():
+    registro = Metricas()
+    registro.incrementar("logins_total")
+    registro.incrementar("logins_total", 2)
+    registro.registrar_tempo("rpc_bomba", 0.5)
+    registro.registrar_tempo("rpc_bomba", 1.5)
+    registro.registrar_tempo("historico", 0.25)
+    registro.registrar_coletor("cache", lambda: {"hits": 7})
+
+    assert registro.formato_prometheus() == (
+        "telemetria_cache_hits 7.0\n"
+        "telemetria_logins_total 3.0\n"
+        "# TYPE telemetria_etapa_segundos summary\n"
+        'telemetria_etapa_segundos_count{etapa="historico"} 1\n'
+        'telemetria_etapa_segundos_sum{etapa="historico"} 0.25\n'
+        'telemetria_etapa_segundos_count{etapa="rpc_bomba"} 2\n'
+        'telemetria_etapa_segundos_sum{etapa="rpc_bomba"} 2.0\n'
+        "# TYPE telemetria_etapa_max_segundos gauge\n"
+        'telemetria_etapa_max_segundos{etapa="historico"} 0.25\n'
+        'telemetria_etapa_max_segundos{etapa="rpc_bomba"} 1.5\n'
+    )
+
+
+def test_coletor_que_falha_nao_derruba_a_exposicao():
+    registro = Metricas()
+    registro.incrementar("coletas_rest_total")
+    registro.registrar_coletor("quebrado", lambda: 1 / 0)
+    assert registro.formato_prometheus().startswith("telemetria_coletas_rest_total 1.0\n")
+
+
+def test_endpoint_metrics():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        porta = s.getsockname()[1]
+    porta = iniciar_servidor_metricas(porta)
+    metricas.incrementar("teste_scrapes_total")
+
+    resposta = requests.get(f"http://127.0.0.1:{porta}/metrics", timeout=10)
+    assert resposta.status_code == 200
+    assert resposta.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert "telemetria_teste_scrapes_total 1.0\n" in resposta.text
+    assert requests.get(f"http://127.0.0.1:{porta}/", timeout=10).status_code == 404
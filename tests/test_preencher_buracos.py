@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from benchmarks.bench_preencher_buracos import gerar_dados, preencher_buracos_laco
+from src.ui.dashboards import preencher_buracos
+
+
+def _normalizar(df):
+    """Ordem canônica para comparar (empates de data podem vir em qualquer ordem)."""
+    return (
+        df.sort_values(["date", "dia_formatado"])
+        .reset_index(drop=True)
+        .astype({"ts": "int64", "value_mA": "float64", "value_percent": "float64"})
+    )
+
+
+def _comparar(df):
+    esperado = preencher_buracos_laco(df.copy())
+    obtido = preencher_buracos(df.copy())
+    pd.testing.assert_frame_equal(_normalizar(esperado), _normalizar(obtido))
+    return obtido
+
+
+@pytest.mark.parametrize("dias", [1, 2, 7])
+def test_igual_ao_laco_por_dia(dias):
+    obtido = _comparar(gerar_dados(dias))
+    # Uma ponte por virada de dia
+    assert len(obtido) == dias * 1440 + dias - 1
+
+
+def test_frame_vazio_e_uma_linha_ficam_como_estao():
+    df = gerar_dados(1)
+    for parte in (df.iloc[:0], df.iloc[:1]):
+        assert len(_comparar(parte)) == len(parte)
+
+
+def test_buracos_no_comeco_no_fim_e_dia_inteiro_faltando():
+    df = gerar_dados(5)
+    dia = df["date"].dt.normalize()
+    dias = dia.unique()
+    # Começa no fim da tarde, pula o terceiro dia e o último tem um ponto só
+    fim_do_ultimo = (dia == dias[-1]) & (df["date"] > dias[-1])
+    df = df[(df["date"] >= dias[0] + pd.Timedelta(hours=17)) & (dia != dias[2])]
+    df = df[~fim_do_ultimo.loc[df.index]].reset_index(drop=True)
+
+    obtido = _comparar(df)
+    pontes = obtido[obtido.duplicated(subset="ts", keep=False)]
+    # Quatro dias presentes: três pontes, a do dia 2 já ligando direto ao dia 4
+    assert len(obtido) == len(df) + 3
+    assert pontes["dia_formatado"].nunique() == 4
@@ -0,0 +1,40 @@
+import threading
+import time
+import uuid
+
+from src.controllers.Reservatorios import Reservatorios
+from src.services.Dispositivos import Dispositivo
+from src.services.SensorClient import SensorClient
+
+
+def test_lote_e_ingestores_respeitam_o_limite_de_dispositivos(mock_tb, monkeypatch):
+    em_voo, pico = 0, 0
+    lock = threading.Lock()
+    original = SensorClient.get_dados_instantaneos
+
+    def contando(self, usar_cache=True):
+        nonlocal em_voo, pico
+        with lock:
+            em_voo += 1
+            pico = max(pico, em_voo)
+        try:
+            time.sleep(0.05)  # Segura a vaga para as chamadas se sobreporem
+            return original(self, usar_cache)
+        finally:
+            with lock:
+                em_voo -= 1
+
+    monkeypatch.setattr(SensorClient, "get_dados_instantaneos", contando)
+    dispositivos = [
+        Dispositivo(f"dev-{uuid.uuid4().hex[:8]}", f"R{i}") for i in range(6)
+    ]
+    reservatorios = Reservatorios(dispositivos, max_em_voo=2)
+
+    # Cada Ingestor faz a primeira coleta REST assim que sobe, junto com o lote
+    for sensor in reservatorios.sensores:
+        sensor._get_ingestor()
+    leituras = reservatorios.buscar_leituras()
+
+    assert [sensor for sensor, _ in leituras] == reservatorios.sensores
+    assert all(leitura is not None for _, leitura in leituras)
+    assert pico == 2
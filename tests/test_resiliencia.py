@@ -0,0 +1,100 @@
+import time
+import uuid
+
+import pandas as pd
+
+import src.ui.dashboards as dashboards
+from src.services.SensorClient import SensorClient, _revalidador
+from src.utils.resiliencia import CircuitBreaker
+
+DIA_MS = 86400 * 1000
+
+
+def test_circuito_abre_apos_falhas_seguidas():
+    cb = CircuitBreaker("teste", limite_falhas=3, espera_seg=60)
+    for _ in range(2):
+        assert cb.permitir()
+        cb.registrar_falha()
+    assert cb.estado == CircuitBreaker.FECHADO
+
+    assert cb.permitir()
+    cb.registrar_falha()
+    assert cb.estado == CircuitBreaker.ABERTO
+    assert not cb.permitir()
+
+
+def test_sucesso_zera_a_contagem_de_falhas():
+    cb = CircuitBreaker("teste", limite_falhas=2, espera_seg=60)
+    cb.registrar_falha()
+    cb.registrar_sucesso()
+    cb.registrar_falha()
+    assert cb.estado == CircuitBreaker.FECHADO
+
+
+def test_meio_aberto_deixa_passar_uma_sonda():
+    cb = CircuitBreaker("teste", limite_falhas=1, espera_seg=0.05)
+    cb.registrar_falha()
+    assert not cb.permitir()
+    time.sleep(0.06)
+
+    assert cb.permitir()  # A sonda
+    assert cb.estado == CircuitBreaker.MEIO_ABERTO
+    assert not cb.permitir()  # Só uma por vez
+
+    # Sonda falhou: volta a abrir e espera de novo
+    cb.registrar_falha()
+    assert cb.estado == CircuitBreaker.ABERTO
+    assert not cb.permitir()
+
+    time.sleep(0.06)
+    assert cb.permitir()
+    cb.registrar_sucesso()
+    assert cb.estado == CircuitBreaker.FECHADO
+    assert cb.permitir() and cb.permitir()
+
+
+def test_revalidacao_completa_o_intervalo_em_segundo_plano(mock_tb, esperar):
+    client = SensorClient(device=f"dev-{uuid.uuid4().hex[:8]}")
+    agora = int(time.time() * 1000)
+    inicio, fim = agora - 3 * DIA_MS, agora - DIA_MS
+    client.sincronizar_historico(inicio, inicio + DIA_MS)
+
+    # O store tem só o primeiro dia: responde já com ele e avisa a defasagem
+    parcial = client.get_historico_colunar(inicio, fim, 60 * 1000)
+    assert parcial.attrs["defasagem_seg"] > 0
+    # (o último balde de 1 min pode ter ts depois do fim sincronizado)
+    assert parcial["ts"].max() <= inicio + DIA_MS + 60 * 1000
+
+    chave = ("historico", client._device)
+    assert esperar(lambda: not _revalidador.em_andamento(chave), timeout_seg=15)
+    completo = client.get_historico_colunar(inicio, fim, 60 * 1000)
+    assert completo.attrs["defasagem_seg"] == 0
+    assert completo["ts"].max() > fim - 2 * 60 * 1000
+    assert len(completo) > len(parcial)
+
+
+def _df_falso(defasagem_seg):
+    df = pd.DataFrame({"ts": [0], "value_percent": [50.0]})
+    df.attrs["defasagem_seg"] = defasagem_seg
+    return df
+
+
+class _SensorFalso:
+    def get_device(self):
+        return "dev-falso"
+
+
+def test_dataset_incompleto_expira_logo(monkeypatch):
+    sensor = _SensorFalso()
+    monkeypatch.setattr(dashboards, "create_data", lambda s, a, b, r: _df_falso(3600))
+    dataset = dashboards.obter_dataset(
+        sensor, "2024-01-01 00:00:00", "2024-01-03 00:00:00"
+    )
+    assert dataset.ttl == dashboards.TTL_DADOS_INCOMPLETOS_SEG
+
+    # Intervalo fechado e completo não muda mais: fica até sair por LRU
+    monkeypatch.setattr(dashboards, "create_data", lambda s, a, b, r: _df_falso(0))
+    dataset = dashboards.obter_dataset(
+        sensor, "2024-02-01 00:00:00", "2024-02-03 00:00:00"
+    )
+    assert dataset.ttl is None
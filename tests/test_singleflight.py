@@ -0,0 +1,57 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.utils.singleflight import SingleFlight
+
+
+def test_chamadas_simultaneas_executam_uma_vez(esperar):
+    sf = SingleFlight()
+    liberar = threading.Event()
+    execucoes = []
+
+    def buscar():
+        execucoes.append(1)
+        liberar.wait(5)
+        return {"ia": [1, 2, 3]}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futuros = [pool.submit(sf.executar, "chave", buscar) for _ in range(8)]
+        # Todas entram antes de a primeira terminar
+        assert esperar(lambda: sf.estatisticas()["chamadas"] == 8)
+        liberar.set()
+        resultados = [f.result(timeout=5) for f in futuros]
+
+    assert len(execucoes) == 1
+    assert all(r is resultados[0] for r in resultados)
+    est = sf.estatisticas()
+    assert (est["executadas"], est["coalescidas"], est["em_voo"]) == (1, 7, 0)
+
+
+def test_chaves_diferentes_nao_coalescem():
+    sf = SingleFlight()
+    assert sf.executar("a", lambda: 1) == 1
+    assert sf.executar("b", lambda: 2) == 2
+    assert sf.estatisticas()["coalescidas"] == 0
+
+
+def test_erro_chega_a_todos_e_nao_fica_preso(esperar):
+    sf = SingleFlight()
+    liberar = threading.Event()
+
+    def falhar():
+        liberar.wait(5)
+        raise ValueError("servidor fora")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futuros = [pool.submit(sf.executar, "k", falhar) for _ in range(4)]
+        assert esperar(lambda: sf.estatisticas()["chamadas"] == 4)
+        liberar.set()
+        for futuro in futuros:
+            with pytest.raises(ValueError):
+                futuro.result(timeout=5)
+
+    # A chave foi liberada: a próxima chamada executa de novo
+    assert sf.executar("k", lambda: "ok") == "ok"
+    assert sf.estatisticas()["em_voo"] == 0
@@ -0,0 +1,50 @@
+import numpy as np
+
+from src.services.Tendencia import EstimadorTendencia
+
+MINUTO = 60 * 1000
+T0 = 1704164400000
+JANELA = 30 * MINUTO
+
+
+def _estimador(valores, capacidade=256):
+    estimador = EstimadorTendencia(JANELA, capacidade=capacidade)
+    for i, valor in enumerate(valores):
+        estimador.adicionar(T0 + i * MINUTO, valor)
+    return estimador
+
+
+def test_inclinacao_e_media_batem_com_minimos_quadrados_da_janela():
+    rng = np.random.default_rng(7)
+    valores = 10 + 0.05 * np.arange(500) + rng.normal(0, 0.2, 500)
+    # Capacidade pequena: o buffer dá várias voltas e as somas são refeitas
+    estimador = _estimador(valores, capacidade=64)
+
+    # Só os últimos 31 minutos (janela de 30 min, bordas inclusas) contam
+    janela = valores[-31:]
+    inclinacao, _ = np.polyfit(np.arange(31), janela, 1)
+    assert len(estimador) == 31
+    assert np.isclose(estimador.inclinacao(), inclinacao)
+    assert np.isclose(estimador.media(), janela.mean())
+
+
+def test_classificacao_pela_variacao_projetada_na_janela():
+    # 0.3% de 10 mA = 0.03 mA em 30 min: o limite fica em 0.001 mA/min
+    assert _estimador(10 + 0.002 * np.arange(40)).classificar()[1] == "Enchendo"
+    assert _estimador(10 - 0.002 * np.arange(40)).classificar()[1] == "Esvaziando"
+    assert _estimador(10 + 0.0005 * np.arange(40)).classificar()[1] == "Estavel"
+
+    assert EstimadorTendencia(JANELA).classificar() == (0, "Aguardando")
+    assert _estimador([12.345]).classificar() == (12.35, "Estavel")
+
+
+def test_ewma_e_leituras_fora_de_ordem():
+    estimador = EstimadorTendencia(JANELA, alfa=0.5)
+    assert estimador.adicionar(T0, 10.0)
+    assert estimador.adicionar(T0 + MINUTO, 12.0)
+    # Repetida ou mais antiga não entra na janela nem na EWMA
+    assert not estimador.adicionar(T0 + MINUTO, 50.0)
+    assert not estimador.adicionar(T0, 50.0)
+
+    assert estimador.ewma == 11.0
+    assert len(estimador) == 2 and estimador.media() == 11.0
@@ -0,0 +1,378 @@
+"""
+Servidor local que imita o ThingsBoard, para testar sem tocar na produção.
+
+Atende o login (/api/auth/login), a consulta REST de telemetria
+(/api/plugins/telemetry/DEVICE/<id>/values/timeseries: último valor ou
+histórico com agg/interval/limit) e o WebSocket de telemetria
+(/api/ws/plugins/telemetry), empurrando uma leitura sintética de 'ia'
+para os assinantes a cada --intervalo segundos. Também recebe os alertas
+do TELEMETRIA_ALERTAS_WEBHOOK em /webhook/alertas (só imprime e guarda).
+
+O RPC two-way (/api/plugins/rpc/twoway/<id>) faz o papel do dispositivo
+que aciona as bombas: aplica setPump, guarda o estado e responde com ele.
+O "id" do comando torna o RPC idempotente (repetido, só devolve a mesma
+resposta). --falhas-rpc é a fração de RPCs que respondem 504 (metade
+delas depois de aplicar o comando, como uma resposta perdida no caminho).
+
+O histórico é sintético (uma leitura a cada --passo segundos) ou lido de
+um CSV gravado (--arquivo, colunas ts,value). --latencia e --variacao
+atrasam cada resposta REST, para simular a rede até o servidor real.
+
+Uso: python -m tools.mock_thingsboard --porta 8080 --intervalo 2 --latencia 50
+Depois aponte BASE_URL=http://localhost:8080 no .env.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import threading
+import time
+
+import numpy as np
+import tornado.web
+import tornado.websocket
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import PeriodicCallback
+from tornado.netutil import bind_sockets
+
+VALIDADE_TOKEN_SEG = 3600
+PASSO_SERIE_SEG = 60
+
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(json.dumps(dados).encode()).rstrip(b"=").decode()
+
+
+def gerar_token(validade_seg=VALIDADE_TOKEN_SEG):
+    """JWT falso (sem assinatura válida), mas com 'exp' legível como o real."""
+    payload = {"sub": "mock@local", "exp": int(time.time()) + validade_seg}
+    return f"{_b64({'alg': 'HS512'})}.{_b64(payload)}.mock"
+
+
+def valor_sintetico(ts_ms):
+    """Nível em mA que enche e esvazia num ciclo de 6h, com ruído."""
+    fase = 2 * math.pi * (ts_ms / 1000) / (6 * 3600)
+    return round(5.4 + 1.2 * math.sin(fase) + random.uniform(-0.02, 0.02), 3)
+
+
+def nivel_deterministico(ts_ms):
+    """
+    Mesma curva de valor_sintetico, em lote e com ruído que depende só do ts:
+    consultas repetidas do mesmo intervalo devolvem os mesmos valores.
+    """
+    ts = np.asarray(ts_ms, dtype=np.int64)
+    fase = 2 * np.pi * (ts / 1000) / (6 * 3600)
+    ruido = (np.sin(ts * 12.9898) * 43758.5453) % 1.0  # 0 a 1, repetível
+    return np.round(5.4 + 1.2 * np.sin(fase) + 0.04 * (ruido - 0.5), 3)
+
+
+class SerieSintetica:
+    """Uma leitura a cada passo_seg, em qualquer intervalo de tempo."""
+
+    def __init__(self, passo_seg=PASSO_SERIE_SEG):
+        self._passo = int(passo_seg * 1000)
+
+    def pontos(self, inicio, fim):
+        """(ts, valor) das leituras em [inicio, fim)."""
+        primeiro = -(-inicio // self._passo) * self._passo
+        ts = np.arange(primeiro, fim, self._passo, dtype=np.int64)
+        return ts, nivel_deterministico(ts)
+
+    def ultimo(self, agora):
+        return agora, float(nivel_deterministico(agora))
+
+
+class SerieGravada:
+    """Série lida de um CSV (cabeçalho ts,value; ts em ms)."""
+
+    def __init__(self, arquivo):
+        tabela = np.loadtxt(arquivo, delimiter=",", skiprows=1, ndmin=2)
+        ordem = np.argsort(tabela[:, 0])
+        self._ts = tabela[ordem, 0].astype(np.int64)
+        self._valores = tabela[ordem, 1]
+
+    def pontos(self, inicio, fim):
+        a, b = np.searchsorted(self._ts, [inicio, fim], side="left")
+        return self._ts[a:b], self._valores[a:b]
+
+    def ultimo(self, agora):
+        i = max(int(np.searchsorted(self._ts, agora, side="right")) - 1, 0)
+        return int(self._ts[i]), float(self._valores[i])
+
+
+def agregar(ts, valores, inicio, fim, intervalo, agg):
+    """
+    Agrupa em baldes de intervalo ms a partir de inicio. Como no ThingsBoard,
+    o ts do balde é o meio dele, e o último balde é cortado em fim: se parcial,
+    sai num ts diferente do meio do balde inteiro.
+    """
+    if len(ts) == 0 or agg == "NONE":
+        return ts, valores
+    balde = (ts - inicio) // intervalo
+    baldes, comeco = np.unique(balde, return_index=True)
+    if agg == "MIN":
+        agregado = np.minimum.reduceat(valores, comeco)
+    elif agg == "MAX":
+        agregado = np.maximum.reduceat(valores, comeco)
+    else:
+        soma = np.add.reduceat(valores, comeco)
+        contagem = np.diff(np.append(comeco, len(valores)))
+        agregado = {"SUM": soma, "COUNT": contagem}.get(agg, soma / contagem)
+    comeco_balde = inicio + baldes * intervalo
+    fim_balde = np.minimum(comeco_balde + intervalo, fim)
+    return comeco_balde + (fim_balde - comeco_balde) // 2, agregado
+
+
+class LoginHandler(tornado.web.RequestHandler):
+    def post(self):
+        self.write({"token": gerar_token(), "refreshToken": gerar_token()})
+
+
+class TimeseriesHandler(tornado.web.RequestHandler):
+    """
+    Imita GET .../values/timeseries: sem startTs devolve o último valor; com
+    startTs/endTs devolve o histórico (agg, interval, limit e orderBy).
+    """
+
+    async def get(self, device):
+        config = self.settings["mock"]
+        atraso = config["latencia_ms"] + random.uniform(0, config["variacao_ms"])
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+
+        token = self.request.headers.get("X-Authorization") or self.request.headers.get(
+            "Authorization", ""
+        )
+        if not token.startswith("Bearer "):
+            self.set_status(401)
+            self.write({"status": 401, "message": "Authentication failed"})
+            return
+
+        serie = config["serie"]
+        if self.get_argument("startTs", None) is None:
+            ts, valor = serie.ultimo(int(time.time() * 1000))
+            self.write({"ia": [{"ts": int(ts), "value": str(valor)}]})
+            return
+
+        inicio = int(self.get_argument("startTs"))
+        fim = int(self.get_argument("endTs"))
+        intervalo = max(int(self.get_argument("interval", "0") or 0), 1)
+        limite = int(self.get_argument("limit", "100"))
+        agg = self.get_argument("agg", "NONE").upper()
+
+        ts, valores = serie.pontos(inicio, fim)
+        ts, valores = agregar(ts, valores, inicio, fim, intervalo, agg)
+        if self.get_argument("orderBy", "DESC").upper() == "DESC":
+            ts, valores = ts[::-1], valores[::-1]
+        ts, valores = ts[:limite], valores[:limite]
+
+        self.write(
+            {
+                "ia": [
+                    {"ts": int(t), "value": str(round(float(v), 4))}
+                    for t, v in zip(ts, valores)
+                ]
+            }
+        )
+
+
+class WebhookAlertasHandler(tornado.web.RequestHandler):
+    """Destino falso para o webhook de alertas: guarda os últimos recebidos."""
+
+    recebidos = []
+
+    def post(self):
+        alerta = json.loads(self.request.body)
+        WebhookAlertasHandler.recebidos = (WebhookAlertasHandler.recebidos + [alerta])[-100:]
+        print(f"Alerta recebido: {alerta.get('mensagem')}")
+        self.write({"ok": True})
+
+
+class RpcHandler(tornado.web.RequestHandler):
+    """Imita POST /api/plugins/rpc/twoway/<device> com um controlador de bombas."""
+
+    bombas = {}  # (device, bomba) -> ligada
+    respostas = {}  # id do comando -> resposta já dada
+
+    async def post(self, device):
+        config = self.settings["mock"]
+        atraso = config["latencia_ms"] + random.uniform(0, config["variacao_ms"])
+        if atraso > 0:
+            await asyncio.sleep(atraso / 1000)
+
+        token = self.request.headers.get("X-Authorization") or self.request.headers.get(
+            "Authorization", ""
+        )
+        if not token.startswith("Bearer "):
+            self.set_status(401)
+            self.write({"status": 401, "message": "Authentication failed"})
+            return
+
+        corpo = json.loads(self.request.body)
+        params = corpo.get("params") or {}
+        if corpo.get("method") != "setPump" or "bomba" not in params:
+            self.set_status(400)
+            self.write({"status": 400, "message": "Unsupported RPC"})
+            return
+
+        id_comando = params.get("id")
+        if id_comando in RpcHandler.respostas:
+            self.write(RpcHandler.respostas[id_comando])
+            return
+
+        falhar = random.random() < config["falhas_rpc"]
+        if falhar and random.random() < 0.5:
+            self.set_status(504)  # Dispositivo não respondeu a tempo
+            return
+
+        RpcHandler.bombas[(device, params["bomba"])] = bool(params.get("ligar"))
+        resposta = {"bomba": params["bomba"], "ligada": bool(params.get("ligar"))}
+        if id_comando:
+            RpcHandler.respostas[id_comando] = resposta
+        print(f"RPC {device}: {params['bomba']} ligada={resposta['ligada']}")
+        if falhar:
+            self.set_status(504)  # Aplicou, mas a resposta se perdeu
+            return
+        self.write(resposta)
+
+
+class TelemetriaWSHandler(tornado.websocket.WebSocketHandler):
+    """Imita a assinatura tsSubCmds (LATEST_TELEMETRY) do ThingsBoard."""
+
+    assinantes = {}  # handler -> cmdId
+
+    def open(self):
+        if not self.get_argument("token", None):
+            self.close(code=1008, reason="token ausente")
+
+    def on_message(self, mensagem):
+        comando = json.loads(mensagem)
+        for sub in comando.get("tsSubCmds", []):
+            TelemetriaWSHandler.assinantes[self] = sub["cmdId"]
+            # Como o servidor real, manda o valor atual logo após assinar
+            self.enviar_leitura(int(time.time() * 1000))
+
+    def on_close(self):
+        TelemetriaWSHandler.assinantes.pop(self, None)
+
+    def enviar_leitura(self, ts_ms):
+        self.write_message(
+            {
+                "subscriptionId": TelemetriaWSHandler.assinantes[self],
+                "errorCode": 0,
+                "errorMsg": None,
+                "data": {"ia": [[ts_ms, str(valor_sintetico(ts_ms))]]},
+                "latestValues": {"ia": ts_ms},
+            }
+        )
+
+    @classmethod
+    def publicar(cls):
+        ts_ms = int(time.time() * 1000)
+        for handler in list(cls.assinantes):
+            try:
+                handler.enviar_leitura(ts_ms)
+            except tornado.websocket.WebSocketClosedError:
+                # Conexão de um servidor anterior (parado sem on_close)
+                cls.assinantes.pop(handler, None)
+
+
+def criar_app(serie=None, latencia_ms=0, variacao_ms=0, falhas_rpc=0.0):
+    mock = {
+        "serie": serie or SerieSintetica(),
+        "latencia_ms": latencia_ms,
+        "variacao_ms": variacao_ms,
+        "falhas_rpc": falhas_rpc,
+    }
+    return tornado.web.Application(
+        [
+            (r"/api/auth/login", LoginHandler),
+            (
+                r"/api/plugins/telemetry/DEVICE/([^/]+)/values/timeseries",
+                TimeseriesHandler,
+            ),
+            (r"/api/plugins/rpc/twoway/([^/]+)", RpcHandler),
+            (r"/api/ws/plugins/telemetry", TelemetriaWSHandler),
+            (r"/webhook/alertas", WebhookAlertasHandler),
+        ],
+        mock=mock,
+    )
+
+
+async def _servir(sockets, intervalo_push_seg, pronto=None, parar=None, **config):
+    servidor = HTTPServer(criar_app(**config))
+    servidor.add_sockets(sockets)
+    push = PeriodicCallback(TelemetriaWSHandler.publicar, intervalo_push_seg * 1000)
+    push.start()
+    if pronto is not None:
+        pronto.set()
+    await (parar.wait() if parar is not None else asyncio.Event().wait())
+    push.stop()
+    servidor.stop()
+    # Derruba as conexões abertas, como um servidor que caiu de verdade
+    for handler in list(TelemetriaWSHandler.assinantes):
+        handler.close()
+    TelemetriaWSHandler.assinantes.clear()
+    await servidor.close_all_connections()
+
+
+def iniciar_em_thread(porta=0, intervalo_push_seg=1.0, **config):
+    """
+    Sobe o servidor numa thread (porta 0 = livre). Retorna (url_base, parar),
+    onde parar() encerra o servidor. config vai para criar_app (serie,
+    latencia_ms, variacao_ms, falhas_rpc).
+    """
+    sockets = bind_sockets(porta, "127.0.0.1")
+    porta = sockets[0].getsockname()[1]
+    pronto = threading.Event()
+    estado = {}
+
+    def rodar():
+        async def principal():
+            estado["loop"] = asyncio.get_running_loop()
+            estado["parar"] = asyncio.Event()
+            await _servir(
+                sockets, intervalo_push_seg, pronto, estado["parar"], **config
+            )
+
+        asyncio.run(principal())
+
+    threading.Thread(target=rodar, name="MockThingsBoard", daemon=True).start()
+    pronto.wait()
+
+    def parar():
+        estado["loop"].call_soon_threadsafe(estado["parar"].set)
+
+    return f"http://127.0.0.1:{porta}", parar
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ThingsBoard falso para testes")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--intervalo", type=float, default=2.0, help="push (s)")
+    parser.add_argument("--passo", type=float, default=PASSO_SERIE_SEG, help="série (s)")
+    parser.add_argument("--arquivo", help="CSV gravado (ts,value) no lugar da série")
+    parser.add_argument("--latencia", type=float, default=0, help="atraso REST (ms)")
+    parser.add_argument("--variacao", type=float, default=0, help="atraso extra (ms)")
+    parser.add_argument("--falhas-rpc", type=float, default=0, help="fração com 504")
+    args = parser.parse_args()
+
+    serie = SerieGravada(args.arquivo) if args.arquivo else SerieSintetica(args.passo)
+    print(f"Mock ThingsBoard em http://localhost:{args.porta}")
+    asyncio.run(
+        _servir(
+            bind_sockets(args.porta),
+            args.intervalo,
+            serie=serie,
+            latencia_ms=args.latencia,
+            variacao_ms=args.variacao,
+            falhas_rpc=args.falhas_rpc,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()